@@ -1,12 +1,25 @@
 """
 Utility functions for logging activities
 """
+import datetime
 import pytz
+from django.utils import timezone
 from .models import ActivityLog
 
 # IST timezone for time formatting
 IST = pytz.timezone('Asia/Kolkata')
 
+# IST has no DST, so a fixed offset converts without a pytz lookup per row
+IST_OFFSET = datetime.timezone(datetime.timedelta(hours=5, minutes=30))
+
+# Columns read by the activity feed fast path
+ACTIVITY_FEED_FIELDS = (
+    'id', 'actor_id', 'actor_name', 'actor_photo_url', 'actor_photo_variants',
+    'target_user_id', 'target_user__name',
+    'activity_type', 'category', 'title', 'description',
+    'related_model', 'related_id', 'extra_data', 'created_at',
+)
+
 
 def get_client_ip(request):
     """Get client IP address from request"""
@@ -18,6 +31,19 @@ def get_client_ip(request):
     return ip
 
 
+def get_actor_snapshot(actor):
+    """Return (name, photo_url) to denormalize onto an activity row"""
+    if not actor:
+        return '', ''
+    photo_url = ''
+    try:
+        if actor.photo:
+            photo_url = actor.photo.url
+    except Exception:
+        pass
+    return actor.name, photo_url
+
+
 def log_activity(
     actor,
     activity_type,
@@ -29,7 +55,8 @@ def log_activity(
     related_id=None,
     extra_data=None,
     ip_address=None,
-    request=None
+    request=None,
+    commit=True
 ):
     """
     Log an activity to the ActivityLog model
@@ -46,13 +73,20 @@ def log_activity(
         extra_data: Additional JSON data (optional)
         ip_address: IP address (optional)
         request: Django request object to extract IP (optional)
+        commit: Save the row; pass False to get an unsaved instance for bulk_create
     """
     # Get IP from request if not provided
     if request and not ip_address:
         ip_address = get_client_ip(request)
 
-    return ActivityLog.objects.create(
+    actor_name, actor_photo_url = get_actor_snapshot(actor)
+    actor_photo_variants = (getattr(actor, 'photo_variants', None) or {}) if actor_photo_url else {}
+
+    log = ActivityLog(
         actor=actor,
+        actor_name=actor_name,
+        actor_photo_url=actor_photo_url,
+        actor_photo_variants=actor_photo_variants,
         target_user=target_user,
         activity_type=activity_type,
         category=category,
@@ -63,6 +97,60 @@ def log_activity(
         extra_data=extra_data,
         ip_address=ip_address
     )
+    if commit:
+        log.save()
+    return log
+
+
+def format_time_ago(seconds, local_time):
+    """Human readable age of an activity"""
+    if seconds < 60:
+        return 'Just now'
+    elif seconds < 3600:
+        return f'{int(seconds / 60)}m ago'
+    elif seconds < 86400:
+        return f'{int(seconds / 3600)}h ago'
+    elif seconds < 604800:
+        return f'{int(seconds / 86400)}d ago'
+    return local_time.strftime('%d %b')
+
+
+def serialize_activity_rows(rows, now=None, avatar=None):
+    """
+    Serialize ActivityLog .values() rows for the timeline.
+
+    Produces the same payload as ActivityLogSerializer but reads the actor
+    snapshot columns and computes the IST timestamps in a single pass with
+    one shared `now`, instead of per-row method fields. `avatar` picks an
+    actor photo variant ('sm', 'md') where the row has one.
+    """
+    now = now or timezone.now()
+    data = []
+    append = data.append
+    for row in rows:
+        created_at = row['created_at']
+        local_time = created_at.astimezone(IST_OFFSET)
+        append({
+            'id': row['id'],
+            'actor': row['actor_id'],
+            'actor_name': row['actor_name'] or 'System',
+            'actor_photo': (
+                (avatar and (row['actor_photo_variants'] or {}).get(avatar)) or row['actor_photo_url'] or None
+            ),
+            'target_user': row['target_user_id'],
+            'target_user_name': row['target_user__name'],
+            'activity_type': row['activity_type'],
+            'category': row['category'],
+            'title': row['title'],
+            'description': row['description'],
+            'related_model': row['related_model'],
+            'related_id': row['related_id'],
+            'extra_data': row['extra_data'],
+            'created_at': local_time.isoformat(),
+            'time_ago': format_time_ago((now - created_at).total_seconds(), local_time),
+            'formatted_time': local_time.strftime('%I:%M %p'),
+        })
+    return data
 
 
 # Convenience functions for common activities
@@ -113,7 +201,7 @@ def log_leave_applied(user, leave_request, request=None):
     )
 
 
-def log_leave_reviewed(reviewer, leave_request, status, request=None):
+def log_leave_reviewed(reviewer, leave_request, status, request=None, commit=True):
     """Log leave approval/rejection"""
     activity_type = 'leave_approved' if status == 'approved' else 'leave_rejected'
     status_text = 'approved' if status == 'approved' else 'rejected'
@@ -127,7 +215,8 @@ def log_leave_reviewed(reviewer, leave_request, status, request=None):
         description=f'{leave_request.leave_type.name}: {leave_request.start_date} to {leave_request.end_date}',
         related_model='LeaveRequest',
         related_id=leave_request.id,
-        request=request
+        request=request,
+        commit=commit
     )
 
 
@@ -145,7 +234,7 @@ def log_regularization_applied(user, regularization, request=None):
     )
 
 
-def log_regularization_reviewed(reviewer, regularization, status, request=None):
+def log_regularization_reviewed(reviewer, regularization, status, request=None, commit=True):
     """Log regularization approval/rejection"""
     activity_type = 'regularization_approved' if status == 'approved' else 'regularization_rejected'
     status_text = 'approved' if status == 'approved' else 'rejected'
@@ -159,7 +248,8 @@ def log_regularization_reviewed(reviewer, regularization, status, request=None):
         description=f'{regularization.request_type} for {regularization.date}',
         related_model='RegularizationRequest',
         related_id=regularization.id,
-        request=request
+        request=request,
+        commit=commit
     )
 
 
@@ -252,7 +342,7 @@ def log_wfh_applied(user, wfh_request, request=None):
     )
 
 
-def log_wfh_reviewed(reviewer, wfh_request, status, request=None):
+def log_wfh_reviewed(reviewer, wfh_request, status, request=None, commit=True):
     """Log WFH approval/rejection"""
     activity_type = 'wfh_approved' if status == 'approved' else 'wfh_rejected'
     status_text = 'approved' if status == 'approved' else 'rejected'
@@ -266,7 +356,8 @@ def log_wfh_reviewed(reviewer, wfh_request, status, request=None):
         description=f'Date: {wfh_request.date}',
         related_model='WFHRequest',
         related_id=wfh_request.id,
-        request=request
+        request=request,
+        commit=commit
     )
 
 
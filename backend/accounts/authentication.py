@@ -0,0 +1,107 @@
+"""
+JWT authentication without a user query per request.
+
+simplejwt's JWTAuthentication loads the whole User row on every request,
+although most views only need the user's id, role and the few fields that
+drive attendance rules. Here:
+
+- ClaimsRefreshToken.for_user() embeds those fields (USER_CONTEXT_FIELDS)
+  in the token as the 'ctx' claim, together with the user's data version
+  (config.versions, 'users' domain) at the time of issue as 'uv'.
+- ClaimsJWTAuthentication builds request.user from a user context cached
+  per user and version. On a miss, the token's claims are used when the
+  token's version is still current, so nothing is queried; otherwise (the
+  user changed after the token was issued, or an older token) the fields
+  are read once and cached.
+- request.user is a real User instance with only those fields loaded.
+  Reading any other field loads the rest of the row in one query (see
+  User.refresh_from_db), so views that need the full row still get it.
+
+Any write to a user moves their version, so a changed role, shift or
+deactivation is picked up on the next request.
+"""
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from config.cache import Namespace
+from config.versions import version_tag
+
+from .models import User
+
+# Fields served from the token / cache; everything else loads on first access
+USER_CONTEXT_FIELDS = (
+    'id', 'role', 'is_admin', 'is_staff', 'is_active',
+    'weekly_off', 'shift_id', 'is_permanent_wfh',
+)
+USER_DOMAINS = ('users',)
+
+USER_CONTEXT_CACHE_TIMEOUT = 5 * 60
+
+# Keys embed the user's data version, so L1 can't serve a stale context
+user_context_cache = Namespace(
+    'user_context', ttl=USER_CONTEXT_CACHE_TIMEOUT, l1_ttl=USER_CONTEXT_CACHE_TIMEOUT, versioned=False
+)
+
+
+def user_context(user):
+    """The USER_CONTEXT_FIELDS of a user as a list, in order"""
+    return [getattr(user, field) for field in USER_CONTEXT_FIELDS]
+
+
+def user_version(user_id):
+    return version_tag(USER_DOMAINS, user_id)
+
+
+def add_user_claims(token, user):
+    """Embed the user context and its current version in a token"""
+    token['ctx'] = user_context(user)
+    token['uv'] = user_version(user.pk)
+    return token
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """Refresh token whose access tokens carry the user context"""
+
+    @classmethod
+    def for_user(cls, user):
+        return add_user_claims(super().for_user(user), user)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that serves request.user from claims and cache"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        version = user_version(user_id)
+        key = f'{user_id}:{version}'
+        context = user_context_cache.get(key)
+        if context is None:
+            claims = validated_token.get('ctx')
+            if validated_token.get('uv') == version and claims and len(claims) == len(USER_CONTEXT_FIELDS):
+                context = claims
+            else:
+                context = (
+                    User.objects.filter(pk=user_id).values_list(*USER_CONTEXT_FIELDS).first()
+                )
+                if context is None:
+                    raise AuthenticationFailed(_("User not found"), code="user_not_found")
+                context = list(context)
+            user_context_cache.set(key, context)
+
+        if not context[USER_CONTEXT_FIELDS.index('is_active')]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        # from_db() wants the loaded fields in model field order
+        data = dict(zip(USER_CONTEXT_FIELDS, context))
+        loaded = [field.attname for field in User._meta.concrete_fields if field.attname in data]
+        user = User.from_db(DEFAULT_DB_ALIAS, loaded, [data[name] for name in loaded])
+        user._partial_row = True
+        return user
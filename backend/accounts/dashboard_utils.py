@@ -0,0 +1,211 @@
+"""
+Admin dashboard counters.
+
+All stats are computed in one aggregated query and cached per IST day as
+individual counter keys, so punch/leave/employee events can adjust them
+with incr instead of recounting. Anything that can't be expressed as
+a simple delta just invalidates the day and the next read recomputes.
+"""
+from collections import Counter
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Count, IntegerField, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from config.cache import Namespace
+from .activity_utils import IST
+from .models import User
+
+# Counters kept in cache (today_absent is derived on read)
+DASHBOARD_COUNTERS = (
+    'total_employees',
+    'today_present',
+    'today_on_leave',
+    'pending_leave_requests',
+    'approved_today',
+    'leaves_this_month',
+)
+
+# Counters keyed by day live until the day is over; a short ceiling keeps
+# stale values from surviving a missed hook for long
+DASHBOARD_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Counters are incremented in place, so they live in the shared tier only
+dashboard_cache = Namespace('dashboard_stats', ttl=DASHBOARD_CACHE_TIMEOUT, l1_ttl=0, versioned=False)
+
+
+def get_india_date():
+    """Get current date in India timezone (IST)"""
+    return timezone.now().astimezone(IST).date()
+
+
+def _counter_key(day, name):
+    return f'{day.isoformat()}:{name}'
+
+
+def _scalar_count(queryset):
+    """Wrap a queryset as a COUNT(*) scalar subquery"""
+    counted = (
+        queryset.order_by()
+        .annotate(_group=Value(1, output_field=IntegerField()))
+        .values('_group')
+        .annotate(_count=Count('pk'))
+        .values('_count')
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def compute_dashboard_stats(day=None):
+    """Compute all dashboard counters in a single SQL query"""
+    from attendance.models import Attendance
+    from leaves.models import LeaveRequest
+
+    day = day or get_india_date()
+    month_start = day.replace(day=1)
+    if day.month == 12:
+        next_month = date(day.year + 1, 1, 1)
+    else:
+        next_month = date(day.year, day.month + 1, 1)
+
+    # Users table drives the row; attendance and leave counts ride along as
+    # scalar subqueries so the whole dashboard is one round trip
+    rows = (
+        User.objects.order_by()
+        .annotate(_group=Value(1, output_field=IntegerField()))
+        .values('_group')
+        .annotate(
+            total_employees=Count('pk', filter=Q(role='employee', is_active=True)),
+            today_present=_scalar_count(
+                Attendance.objects.filter(date=day, punch_in__isnull=False)
+            ),
+            today_on_leave=_scalar_count(
+                Attendance.objects.filter(date=day, status='on_leave')
+            ),
+            pending_leave_requests=_scalar_count(
+                LeaveRequest.objects.filter(status='pending')
+            ),
+            approved_today=_scalar_count(
+                LeaveRequest.objects.filter(status='approved', reviewed_on__date=day)
+            ),
+            leaves_this_month=_scalar_count(
+                LeaveRequest.objects.filter(
+                    status='approved',
+                    start_date__gte=month_start,
+                    start_date__lt=next_month
+                )
+            ),
+        )
+        .values(*DASHBOARD_COUNTERS)[:1]
+    )
+    for row in rows:
+        return row
+    return dict.fromkeys(DASHBOARD_COUNTERS, 0)
+
+
+def with_derived_stats(stats):
+    """Add fields derived from the raw counters"""
+    stats = dict(stats)
+    stats['today_absent'] = (
+        stats['total_employees'] - stats['today_present'] - stats['today_on_leave']
+    )
+    return stats
+
+
+def get_dashboard_stats(refresh=False):
+    """Return today's dashboard stats, computing and caching them on a miss"""
+    day = get_india_date()
+    keys = {name: _counter_key(day, name) for name in DASHBOARD_COUNTERS}
+
+    if not refresh:
+        cached = dashboard_cache.get_many(keys.values())
+        if len(cached) == len(keys):
+            return with_derived_stats({name: cached[key] for name, key in keys.items()})
+
+    stats = compute_dashboard_stats(day)
+    dashboard_cache.set_many({keys[name]: stats[name] for name in DASHBOARD_COUNTERS})
+    return with_derived_stats(stats)
+
+
+def bump_dashboard_counter(name, delta=1, day=None):
+    """
+    Adjust a cached counter in place.
+
+    If the counter isn't cached there is nothing to keep in sync - the next
+    read recomputes it from the database.
+    """
+    day = day or get_india_date()
+    try:
+        dashboard_cache.incr(_counter_key(day, name), delta)
+    except ValueError:
+        pass
+
+
+def invalidate_dashboard_stats(day=None):
+    """Drop cached counters so the next read recomputes them"""
+    day = day or get_india_date()
+    dashboard_cache.delete_many([_counter_key(day, name) for name in DASHBOARD_COUNTERS])
+
+
+# Event hooks
+
+def record_punch_in(previous_status=None):
+    """First punch in of the day"""
+    bump_dashboard_counter('today_present')
+    if previous_status == 'on_leave':
+        bump_dashboard_counter('today_on_leave', -1)
+
+
+def record_leave_applied():
+    """New pending leave request"""
+    bump_dashboard_counter('pending_leave_requests')
+
+
+def record_leave_withdrawn():
+    """Pending leave request cancelled by the employee"""
+    bump_dashboard_counter('pending_leave_requests', -1)
+
+
+def record_leaves_reviewed(leave_requests, new_status):
+    """
+    Pending leave requests approved or rejected.
+
+    The deltas are summed and applied once the review commits, so a batch
+    costs a few incr calls instead of several per request, none of them
+    made while the requests are locked, and a rolled back review leaves
+    the counters alone.
+    """
+    today = get_india_date()
+    deltas = Counter(pending_leave_requests=-len(leave_requests))
+    recount = False
+    if new_status == 'approved':
+        for leave_request in leave_requests:
+            if leave_request.start_date <= today <= leave_request.end_date:
+                # Today's attendance rows change too - recount rather than guess
+                recount = True
+            deltas['approved_today'] += 1
+            if (leave_request.start_date.year, leave_request.start_date.month) == (today.year, today.month):
+                deltas['leaves_this_month'] += 1
+
+    def apply():
+        if recount:
+            invalidate_dashboard_stats(today)
+            return
+        for name, delta in deltas.items():
+            if delta:
+                bump_dashboard_counter(name, delta, today)
+
+    transaction.on_commit(apply)
+
+
+def record_employee_added(employee):
+    """Employee created"""
+    if employee.role == 'employee' and employee.is_active:
+        bump_dashboard_counter('total_employees')
+
+
+def record_employee_deactivated(employee):
+    """Active employee deactivated"""
+    if employee.role == 'employee':
+        bump_dashboard_counter('total_employees', -1)
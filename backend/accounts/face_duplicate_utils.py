@@ -0,0 +1,121 @@
+"""
+Duplicate face detection (buddy punching).
+
+Two active accounts with near-identical enrolled faces usually mean one
+person enrolled twice, or enrolled a colleague's face to punch for them.
+detect_duplicate_faces() compares every enrolled descriptor with every
+other one and records close pairs as FaceDuplicateFlag rows for admins to
+review.
+
+All-pairs distances are computed tile by tile (block_size x block_size
+over the upper triangle) with the same |a|^2 + |b|^2 - 2 a.b expansion as
+the kiosk index, so memory stays at a few tiles whatever the headcount and
+each tile is one BLAS matrix product.
+"""
+import logging
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .face_index_utils import enrolled_users, load_descriptor_rows
+from .models import FaceDuplicateFlag
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOCK_SIZE = 2048
+
+
+def find_duplicate_pairs(matrix, threshold, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Yield (i, j, distance) for every pair of rows with i < j closer than threshold.
+
+    Only a few block_size x block_size tiles are in memory at a time.
+    """
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    sq_norms = np.einsum('ij,ij->i', matrix, matrix)
+    limit = threshold * threshold
+    count = len(matrix)
+
+    for row_start in range(0, count, block_size):
+        rows = matrix[row_start:row_start + block_size]
+        row_norms = sq_norms[row_start:row_start + block_size]
+        for col_start in range(row_start, count, block_size):
+            cols = matrix[col_start:col_start + block_size]
+            sq_dist = row_norms[:, None] + sq_norms[None, col_start:col_start + block_size] - 2 * (rows @ cols.T)
+            if col_start == row_start:
+                # Diagonal tile: keep each pair once and skip self-distances
+                sq_dist[np.tril_indices(len(rows), m=len(cols))] = np.inf
+            for i, j in zip(*np.nonzero(sq_dist < limit)):
+                yield row_start + int(i), col_start + int(j), float(np.sqrt(max(sq_dist[i, j], 0.0)))
+
+
+def detect_duplicate_faces(threshold=None, block_size=DEFAULT_BLOCK_SIZE, dry_run=False):
+    """
+    Flag active users whose enrolled faces are closer than `threshold`.
+
+    New pairs become pending flags. Pairs flagged before get their distance
+    and last_seen_at refreshed; dismissed pairs stay dismissed. Returns
+    {'users', 'pairs', 'new', 'seconds'}.
+    """
+    threshold = threshold if threshold is not None else settings.FACE_DUPLICATE_THRESHOLD
+    started = time.perf_counter()
+
+    user_ids, matrix = load_descriptor_rows(enrolled_users())
+    pairs = {}
+    for i, j, distance in find_duplicate_pairs(matrix, threshold, block_size):
+        a, b = sorted((int(user_ids[i]), int(user_ids[j])))
+        pairs[(a, b)] = distance
+
+    new_flags = []
+    if pairs and not dry_run:
+        now = timezone.now()
+        with transaction.atomic():
+            existing = {
+                (flag.user_a_id, flag.user_b_id): flag
+                for flag in FaceDuplicateFlag.objects.select_for_update().filter(
+                    user_a_id__in={a for a, _ in pairs}
+                ).only('id', 'user_a_id', 'user_b_id')
+            }
+            seen = []
+            for (a, b), distance in pairs.items():
+                flag = existing.get((a, b))
+                if flag is None:
+                    new_flags.append(FaceDuplicateFlag(
+                        user_a_id=a, user_b_id=b, distance=distance, last_seen_at=now
+                    ))
+                else:
+                    flag.distance = distance
+                    flag.last_seen_at = now
+                    seen.append(flag)
+            FaceDuplicateFlag.objects.bulk_create(new_flags, batch_size=1000)
+            FaceDuplicateFlag.objects.bulk_update(seen, ['distance', 'last_seen_at'], batch_size=1000)
+
+    seconds = time.perf_counter() - started
+    logger.info(
+        "Duplicate face scan: %s user(s), %s pair(s) under %s, %s new, %.1fs",
+        len(user_ids), len(pairs), threshold, len(new_flags), seconds
+    )
+    return {'users': len(user_ids), 'pairs': len(pairs), 'new': len(new_flags), 'seconds': seconds}
+
+
+def verified_punch_counts(flags, days=30):
+    """{user_id: face-verified punches in the last `days` days} for users in these flags"""
+    from django.db.models import Count
+    from attendance.models import Attendance
+    from .dashboard_utils import get_india_date
+
+    user_ids = {flag.user_a_id for flag in flags} | {flag.user_b_id for flag in flags}
+    if not user_ids:
+        return {}
+    since = get_india_date() - timedelta(days=days)
+    return dict(
+        Attendance.objects.filter(user_id__in=user_ids, date__gte=since, face_verified=True)
+        .order_by()
+        .values('user_id')
+        .annotate(count=Count('id'))
+        .values_list('user_id', 'count')
+    )
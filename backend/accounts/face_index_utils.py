@@ -0,0 +1,232 @@
+"""
+1:N face identification for the shared kiosk.
+
+Every active user's enrolled descriptor is held in one contiguous float32
+matrix per worker. Identifying a live descriptor is a nearest-neighbour
+search over that matrix:
+
+    |m - v|^2 = |m|^2 - 2 m.v + |v|^2
+
+with |m|^2 precomputed, so a search is one matrix-vector product and an
+argpartition. From CLUSTER_MIN_SIZE rows a coarse k-means layer narrows the
+search to the rows of the few nearest centroids first.
+
+The index is built lazily on first use. Changes are published through the
+cache: face_index_changed() bumps a version counter and records which user
+changed under that version. Before each search a worker compares versions
+and reloads only the changed users (one query); if it has fallen too far
+behind, or the counter was lost, it rebuilds from scratch.
+"""
+import random
+import threading
+from collections import namedtuple
+
+import numpy as np
+from django.db import transaction
+
+from config.cache import Namespace
+
+from .face_utils import DESCRIPTOR_LENGTH, unpack_descriptor
+
+FACE_INDEX_VERSION_KEY = 'version'
+FACE_INDEX_CHANGE_KEY = 'change:{}'
+FACE_INDEX_CHANGE_TIMEOUT = 60 * 60 * 24
+
+# The index keeps its own version counter, read from the shared tier every time
+face_index_cache = Namespace('face_index', ttl=FACE_INDEX_CHANGE_TIMEOUT, l1_ttl=0, versioned=False)
+# Workers further behind than this rebuild instead of replaying changes
+MAX_INCREMENTAL_CHANGES = 500
+
+# Coarse clustering prefilter
+CLUSTER_MIN_SIZE = 5000
+CLUSTER_PROBES = 8
+KMEANS_ITERATIONS = 10
+
+# Immutable view of the index; searches read one snapshot, updates swap it
+Snapshot = namedtuple('Snapshot', 'matrix user_ids sq_norms centroids cluster_rows')
+
+
+def _empty_snapshot():
+    return _make_snapshot(np.empty((0, DESCRIPTOR_LENGTH), dtype=np.float32), np.empty(0, dtype=np.int64))
+
+
+def _make_snapshot(matrix, user_ids, centroids=None, cluster=True):
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    sq_norms = np.einsum('ij,ij->i', matrix, matrix)
+    if centroids is None and cluster and len(user_ids) >= CLUSTER_MIN_SIZE:
+        centroids = _kmeans(matrix, int(np.sqrt(len(user_ids))))
+    if centroids is None or not len(user_ids):
+        return Snapshot(matrix, user_ids, sq_norms, None, None)
+
+    assignments = _nearest_rows(centroids, matrix)
+    order = np.argsort(assignments, kind='stable')
+    bounds = np.searchsorted(assignments[order], np.arange(len(centroids) + 1))
+    cluster_rows = [order[bounds[i]:bounds[i + 1]] for i in range(len(centroids))]
+    return Snapshot(matrix, user_ids, sq_norms, centroids, cluster_rows)
+
+
+def _nearest_rows(centroids, matrix):
+    """Index of the nearest centroid for every row"""
+    c_norms = np.einsum('ij,ij->i', centroids, centroids)
+    return np.argmin(c_norms[None, :] - 2 * (matrix @ centroids.T), axis=1)
+
+
+def _kmeans(matrix, k, seed=0):
+    """Plain Lloyd's k-means; good enough for a search prefilter"""
+    rng = np.random.default_rng(seed)
+    centroids = matrix[rng.choice(len(matrix), size=k, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assignments = _nearest_rows(centroids, matrix)
+        counts = np.bincount(assignments, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, matrix)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+def load_descriptor_rows(queryset):
+    """(user_ids, matrix) for users of the queryset with a valid descriptor"""
+    ids, vectors = [], []
+    for user_id, packed in queryset.values_list('id', 'face_descriptor'):
+        try:
+            vectors.append(unpack_descriptor(packed))
+        except ValueError:
+            continue
+        ids.append(user_id)
+    matrix = np.vstack(vectors) if vectors else np.empty((0, DESCRIPTOR_LENGTH), dtype=np.float32)
+    return np.array(ids, dtype=np.int64), matrix
+
+
+def enrolled_users():
+    from .models import User
+    return User.objects.filter(is_active=True, face_descriptor__isnull=False)
+
+
+class FaceIndex:
+    """In-memory nearest-neighbour index over enrolled face descriptors"""
+
+    def __init__(self):
+        self.snapshot = None
+        self.version = None
+        self.lock = threading.Lock()
+
+    def load(self, user_ids, matrix, cluster=True):
+        """Replace the whole index (also used by the benchmark)"""
+        self.snapshot = _make_snapshot(matrix, np.asarray(user_ids, dtype=np.int64), cluster=cluster)
+
+    def rebuild(self):
+        self.load(*load_descriptor_rows(enrolled_users()))
+
+    def refresh_users(self, user_ids):
+        """Reload the given users only; inactive or unenrolled users drop out"""
+        ids, vectors = load_descriptor_rows(enrolled_users().filter(pk__in=user_ids))
+        snapshot = self.snapshot or _empty_snapshot()
+        keep = ~np.isin(snapshot.user_ids, list(user_ids))
+        matrix = np.concatenate([snapshot.matrix[keep], vectors])
+        all_ids = np.concatenate([snapshot.user_ids[keep], ids])
+        # Centroids are kept; new rows go to their nearest one until the next rebuild
+        self.snapshot = _make_snapshot(matrix, all_ids, snapshot.centroids)
+
+    def sync(self):
+        """Catch up with changes published by any worker"""
+        current = face_index_cache.get(FACE_INDEX_VERSION_KEY)
+        if current is None:
+            # Never set or evicted - start from an unguessable value so old
+            # version numbers can't be mistaken for the new ones
+            face_index_cache.add(FACE_INDEX_VERSION_KEY, random.getrandbits(48), None)
+            current = face_index_cache.get(FACE_INDEX_VERSION_KEY)
+        if current == self.version and self.snapshot is not None:
+            return
+
+        with self.lock:
+            if current == self.version and self.snapshot is not None:
+                return
+            behind = None if self.version is None or current is None else current - self.version
+            changed = {}
+            if behind is not None and 0 < behind <= MAX_INCREMENTAL_CHANGES and self.snapshot is not None:
+                keys = [FACE_INDEX_CHANGE_KEY.format(v) for v in range(self.version + 1, current + 1)]
+                changed = face_index_cache.get_many(keys)
+            if changed and len(changed) == behind:
+                self.refresh_users(set(changed.values()))
+            else:
+                self.rebuild()
+            self.version = current
+
+    def search(self, vector):
+        """
+        Nearest two enrolled users to `vector`.
+
+        Returns [(user_id, distance), ...] closest first (at most two).
+        """
+        snapshot = self.snapshot or _empty_snapshot()
+        if not len(snapshot.user_ids):
+            return []
+
+        rows = None
+        if snapshot.centroids is not None:
+            nearest = np.argsort(_nearest_centroid_distances(snapshot.centroids, vector))[:CLUSTER_PROBES]
+            rows = np.concatenate([snapshot.cluster_rows[i] for i in nearest])
+            if not len(rows):
+                rows = None
+
+        matrix = snapshot.matrix if rows is None else snapshot.matrix[rows]
+        sq_norms = snapshot.sq_norms if rows is None else snapshot.sq_norms[rows]
+        sq_dist = sq_norms - 2 * (matrix @ vector) + float(vector @ vector)
+
+        count = min(2, len(sq_dist))
+        best = np.argpartition(sq_dist, count - 1)[:count]
+        best = best[np.argsort(sq_dist[best])]
+        positions = best if rows is None else rows[best]
+        return [
+            (int(snapshot.user_ids[position]), float(np.sqrt(max(sq_dist[index], 0.0))))
+            for position, index in zip(positions, best)
+        ]
+
+    def identify(self, vector, threshold, margin):
+        """
+        The enrolled user matching `vector`, if exactly one does.
+
+        Returns (user_id, distance). user_id is None when the closest face
+        is over `threshold`, or when the runner-up is also under it and
+        within `margin` of the closest (too close to call).
+        """
+        self.sync()
+        matches = self.search(vector)
+        if not matches:
+            return None, None
+        user_id, distance = matches[0]
+        if distance >= threshold:
+            return None, distance
+        if len(matches) > 1:
+            runner_up = matches[1][1]
+            if runner_up < threshold and runner_up - distance < margin:
+                return None, distance
+        return user_id, distance
+
+
+def _nearest_centroid_distances(centroids, vector):
+    diff = centroids - vector
+    return np.einsum('ij,ij->i', diff, diff)
+
+
+face_index = FaceIndex()
+
+
+def face_index_changed(*user_ids):
+    """
+    Publish that these users' descriptors or active status changed.
+
+    Workers pick the change up on their next identification. Runs after the
+    current transaction commits so they read the new rows.
+    """
+    def publish():
+        for user_id in set(user_ids):
+            try:
+                version = face_index_cache.incr(FACE_INDEX_VERSION_KEY)
+            except ValueError:
+                face_index_cache.add(FACE_INDEX_VERSION_KEY, random.getrandbits(48), None)
+                version = face_index_cache.incr(FACE_INDEX_VERSION_KEY)
+            face_index_cache.set(FACE_INDEX_CHANGE_KEY.format(version), user_id, FACE_INDEX_CHANGE_TIMEOUT)
+
+    transaction.on_commit(publish)
@@ -1,71 +1,314 @@
-from PIL import Image
+"""
+Compression for profile and document photos.
+
+Uploads are not compressed inside the request. queue_image() copies the
+raw upload to a local staging directory and returns; once the request's
+transaction commits, a background thread hands the staged file to a small
+process pool (Pillow holds the GIL through most of a decode and encode, so
+threads would not spread the work), saves the compressed JPEG to the
+default storage (Cloudinary) and attaches it to the row with an UPDATE.
+
+JPEGs are decoded in draft mode: libjpeg scales by 1/2, 1/4 or 1/8 while
+decoding, so a 12 MP phone photo is never fully decoded just to become a
+400px profile picture. Profile photos also get square avatar variants
+(AVATAR_SIZES) cut from the same decoded image; list payloads pick one with
+?avatar=sm|md instead of sending the full photo URL for every row.
+
+Staging time, worker CPU time, storage upload time and end-to-end
+processing time are recorded under image_upload.* in the request metrics
+registry.
+"""
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import InMemoryUploadedFile
-import sys
+from django.db import connection, transaction
+from PIL import Image, ImageOps, features
 
+from config.versions import VersionedQuerySet
 
-def compress_image(image_file, max_size=(800, 800), quality=70):
+logger = logging.getLogger(__name__)
+
+# (max_size, quality) per kind of image
+IMAGE_PRESETS = {
+    'profile': ((400, 400), 75),
+    # Slightly larger for readability
+    'document': ((1000, 1000), 80),
+}
+
+# Preset for each photo field (User fields; requests use requested_<field>)
+PHOTO_PRESETS = {
+    'photo': 'profile',
+    'aadhaar_photo': 'document',
+    'pan_photo': 'document',
+}
+
+# Avatar variants generated with profile photos: size key -> square edge in px
+AVATAR_SIZES = {
+    'sm': 48,
+    'md': 96,
+}
+AVATAR_FORMAT = 'WEBP' if features.check('webp') else 'JPEG'
+AVATAR_EXTENSION = {'WEBP': 'webp', 'JPEG': 'jpg'}[AVATAR_FORMAT]
+AVATAR_QUALITY = 80
+
+# Photo fields that get avatar variants, and where their URLs are stored
+AVATAR_FIELDS = {
+    'photo': 'photo_variants',
+}
+
+ImageJob = namedtuple(
+    'ImageJob', 'model pk user_id field_name variants_field path name preset queued_at on_attached'
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def compress_image_data(data, max_size=(800, 800), quality=70):
     """
-    Compress and resize an image to reduce file size.
+    Resize and re-encode image bytes as JPEG.
+
+    Returns (jpeg_bytes, cpu_seconds).
+    """
+    started = time.process_time()
+    img = open_scaled_image(data, max_size)
+    return _encode(img, 'JPEG', quality), time.process_time() - started
+
+
+def open_scaled_image(data, max_size):
+    """Decode image bytes as RGB/L no larger than max_size"""
+    img = Image.open(BytesIO(data))
+    if img.format == 'JPEG':
+        # Let the decoder downscale; thumbnail() finishes with LANCZOS
+        img.draft('RGB', max_size)
+
+    # Convert to RGB if necessary (for PNG with transparency)
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+
+    img.thumbnail(max_size, Image.Resampling.LANCZOS)
+    return img
+
+
+def _encode(img, image_format, quality):
+    output = BytesIO()
+    img.save(output, format=image_format, quality=quality, optimize=True)
+    return output.getvalue()
+
+
+def avatar_variant_data(img):
+    """{size key: encoded square avatar} cut from an opened image"""
+    return {
+        key: _encode(ImageOps.fit(img, (size, size), Image.Resampling.LANCZOS), AVATAR_FORMAT, AVATAR_QUALITY)
+        for key, size in AVATAR_SIZES.items()
+    }
+
+
+def save_avatar_variants(field, name, variants):
+    """Store variant bytes next to the photo; returns {size key: URL}"""
+    stem = jpeg_name(name).rsplit('.', 1)[0]
+    urls = {}
+    for key, data in variants.items():
+        stored = field.storage.save(
+            field.generate_filename(None, f"{stem}_{key}.{AVATAR_EXTENSION}"), ContentFile(data)
+        )
+        urls[key] = field.storage.url(stored)
+    return urls
+
+
+def avatar_size_param(request):
+    """The ?avatar= size requested, if it is one that is generated"""
+    if request is None:
+        return None
+    size = request.query_params.get('avatar')
+    return size if size in AVATAR_SIZES else None
+
+
+def pick_avatar(photo_url, variants, size):
+    """Variant URL for `size` if there is one, else the full photo URL"""
+    if size and variants:
+        return variants.get(size) or photo_url
+    return photo_url
+
+
+def jpeg_name(original_name):
+    """Upload name with a .jpg extension"""
+    original_name = os.path.basename(original_name or 'image.jpg')
+    return f"{original_name.rsplit('.', 1)[0]}.jpg"
+
 
-    Args:
-        image_file: Django uploaded file
-        max_size: Maximum dimensions (width, height)
-        quality: JPEG quality (1-100)
+def compress_image(image_file, max_size=(800, 800), quality=70):
+    """
+    Compress and resize an uploaded image in the calling thread.
 
-    Returns:
-        Compressed InMemoryUploadedFile
+    Returns a compressed InMemoryUploadedFile, or the original file if it
+    could not be compressed.
     """
     if not image_file:
         return image_file
 
     try:
-        # Open image
-        img = Image.open(image_file)
-
-        # Convert to RGB if necessary (for PNG with transparency)
-        if img.mode in ('RGBA', 'P'):
-            img = img.convert('RGB')
-
-        # Calculate new size maintaining aspect ratio
-        img.thumbnail(max_size, Image.Resampling.LANCZOS)
-
-        # Save to BytesIO
-        output = BytesIO()
-        img.save(output, format='JPEG', quality=quality, optimize=True)
-        output.seek(0)
-
-        # Get original filename and create new filename
-        original_name = image_file.name if hasattr(image_file, 'name') else 'image.jpg'
-        if '.' in original_name:
-            name_without_ext = original_name.rsplit('.', 1)[0]
-        else:
-            name_without_ext = original_name
-        new_name = f"{name_without_ext}.jpg"
-
-        # Create new InMemoryUploadedFile
-        compressed_file = InMemoryUploadedFile(
-            output,
-            'ImageField',
-            new_name,
-            'image/jpeg',
-            sys.getsizeof(output),
-            None
-        )
-
-        return compressed_file
-
+        image_file.seek(0)
+        data, _ = compress_image_data(image_file.read(), max_size, quality)
     except Exception as e:
-        print(f"Image compression failed: {e}")
-        # Return original file if compression fails
+        logger.warning(f"Image compression failed: {e}")
         return image_file
 
+    return InMemoryUploadedFile(
+        BytesIO(data), 'ImageField', jpeg_name(getattr(image_file, 'name', None)),
+        'image/jpeg', len(data), None
+    )
+
 
 def compress_profile_photo(image_file):
     """Compress profile photo - smaller size"""
-    return compress_image(image_file, max_size=(400, 400), quality=75)
+    return compress_image(image_file, *IMAGE_PRESETS['profile'])
 
 
 def compress_document_photo(image_file):
     """Compress document photos (Aadhaar, PAN) - slightly larger for readability"""
-    return compress_image(image_file, max_size=(1000, 1000), quality=80)
+    return compress_image(image_file, *IMAGE_PRESETS['document'])
+
+
+def _compress_staged(path, max_size, quality, avatars=False):
+    """Pool worker: compress a staged file; returns (jpeg, avatar variants, cpu_seconds)"""
+    started = time.process_time()
+    with open(path, 'rb') as staged:
+        img = open_scaled_image(staged.read(), max_size)
+    data = _encode(img, 'JPEG', quality)
+    variants = avatar_variant_data(img) if avatars else {}
+    return data, variants, time.process_time() - started
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn, not fork: the web worker has threads and open DB connections
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_PIPELINE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        _executor = None
+
+
+def stage_upload(upload):
+    """Copy an upload to the staging directory; returns the staged path"""
+    os.makedirs(settings.IMAGE_STAGING_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=settings.IMAGE_STAGING_DIR, suffix='.upload')
+    with os.fdopen(fd, 'wb') as staged:
+        for chunk in upload.chunks():
+            staged.write(chunk)
+    return path
+
+
+def queue_image(instance, field_name, upload, preset, variants_field=None, on_attached=None):
+    """
+    Compress `upload` off-request and attach it to instance.<field_name>.
+
+    With variants_field, avatar variants are generated too and their URLs
+    stored in that JSON field. The saved instance keeps its current file
+    until the compressed one is ready. on_attached(stored_name, variant_urls)
+    runs after the row is updated.
+    """
+    from config.instrumentation import registry
+
+    started = time.perf_counter()
+    # The user whose data changes: the user row itself, or the row's owner
+    user_id = instance.pk if isinstance(instance, get_user_model()) else getattr(instance, 'user_id', None)
+    job = ImageJob(
+        type(instance), instance.pk, user_id, field_name, variants_field, stage_upload(upload),
+        os.path.basename(upload.name or 'image'), preset, started, on_attached
+    )
+    registry.record_value('image_upload.stage_ms', (time.perf_counter() - started) * 1000)
+
+    if settings.IMAGE_PIPELINE_INLINE:
+        transaction.on_commit(lambda: _run_job(job, inline=True))
+    else:
+        transaction.on_commit(lambda: _process_in_background(job))
+
+
+def _process_in_background(job):
+    def run():
+        try:
+            _run_job(job, inline=False)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+
+
+def _compress(job, inline):
+    """Compress in the pool, or in this thread if inline or the pool is unusable"""
+    max_size, quality = IMAGE_PRESETS[job.preset]
+    args = (job.path, max_size, quality, job.variants_field is not None)
+    if not inline:
+        try:
+            return _get_executor().submit(_compress_staged, *args).result()
+        except (BrokenProcessPool, RuntimeError) as e:
+            # A worker died (e.g. OOM) or could not start; use a fresh pool next time
+            logger.warning(f"Image pool unavailable, compressing in thread: {e}")
+            _reset_executor()
+    return _compress_staged(*args)
+
+
+def _run_job(job, inline):
+    from config.instrumentation import registry
+
+    try:
+        try:
+            data, variants, cpu_seconds = _compress(job, inline)
+            name = jpeg_name(job.name)
+            registry.record_value('image_upload.cpu_ms', cpu_seconds * 1000)
+        except Exception as e:
+            # Keep the original, as the synchronous path does
+            logger.warning(f"Image compression failed for {job.model.__name__} {job.pk}: {e}")
+            with open(job.path, 'rb') as staged:
+                data = staged.read()
+            name = job.name
+            variants = {}
+
+        field = job.model._meta.get_field(job.field_name)
+        saving = time.perf_counter()
+        stored = field.storage.save(field.generate_filename(None, name), ContentFile(data))
+        variant_urls = save_avatar_variants(field, name, variants)
+        registry.record_value('image_upload.storage_ms', (time.perf_counter() - saving) * 1000)
+
+        updates = {job.field_name: stored}
+        if job.variants_field:
+            updates[job.variants_field] = variant_urls
+        rows = job.model.objects.filter(pk=job.pk)
+        if isinstance(rows, VersionedQuerySet):
+            # Only this user's cached data (auth context etc.) is affected
+            rows = rows.touching(job.user_id)
+        rows.update(**updates)
+        if job.on_attached:
+            job.on_attached(stored, variant_urls)
+        registry.record_value('image_upload.process_ms', (time.perf_counter() - job.queued_at) * 1000)
+    except Exception as e:
+        logger.error(f"Image processing failed for {job.model.__name__} {job.pk}: {e}", exc_info=True)
+    finally:
+        try:
+            os.remove(job.path)
+        except OSError:
+            pass
@@ -0,0 +1,89 @@
+"""
+Management command to benchmark activity feed serialization.
+Compares ActivityLogSerializer (per-row method fields) against the
+values-dict fast path used by the timeline endpoint.
+
+Sample rows are created inside a transaction that is rolled back, so the
+command is safe to run against a dev database.
+
+Usage:
+    python manage.py benchmark_activity_feed
+    python manage.py benchmark_activity_feed --rows 100 --repeat 50
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from accounts.models import User, ActivityLog
+from accounts.serializers import ActivityLogSerializer
+from accounts.activity_utils import (
+    ACTIVITY_FEED_FIELDS, get_actor_snapshot, serialize_activity_rows
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-row activity feed serialization cost (before/after)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help='Rows per page (default 100)')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed iterations (default 20)')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+        try:
+            with transaction.atomic():
+                self.run(rows, repeat)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, rows, repeat):
+        actor = User.objects.filter(is_active=True).first()
+        if actor is None:
+            actor = User.objects.create_user(mobile='9000000000', name='Benchmark User')
+        actor_name, actor_photo_url = get_actor_snapshot(actor)
+
+        ActivityLog.objects.bulk_create([
+            ActivityLog(
+                actor=actor,
+                actor_name=actor_name,
+                actor_photo_url=actor_photo_url,
+                target_user=actor,
+                activity_type='punch_in',
+                category='attendance',
+                title=f'{actor.name} punched in',
+                description='Benchmark row',
+            )
+            for _ in range(rows)
+        ])
+
+        ids = list(ActivityLog.objects.order_by('-created_at').values_list('id', flat=True)[:rows])
+
+        # Materialize both inputs up front so only serialization is timed
+        instances = list(
+            ActivityLog.objects.select_related('actor', 'target_user').filter(id__in=ids)
+        )
+        value_rows = list(ActivityLog.objects.filter(id__in=ids).values(*ACTIVITY_FEED_FIELDS))
+
+        before = self.time_per_row(lambda: ActivityLogSerializer(instances, many=True).data, len(instances), repeat)
+        after = self.time_per_row(lambda: serialize_activity_rows(value_rows), len(value_rows), repeat)
+
+        self.stdout.write(f'Rows per page: {len(instances)}, iterations: {repeat}')
+        self.stdout.write(f'  ModelSerializer:  {before:8.2f} us/row')
+        self.stdout.write(f'  Values fast path: {after:8.2f} us/row')
+        if after:
+            self.stdout.write(self.style.SUCCESS(f'Speedup: {before / after:.1f}x'))
+
+    def time_per_row(self, fn, count, repeat):
+        fn()  # warm up
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        elapsed = time.perf_counter() - start
+        return elapsed / (repeat * max(count, 1)) * 1_000_000
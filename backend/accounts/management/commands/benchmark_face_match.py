@@ -0,0 +1,117 @@
+"""
+Management command to benchmark server-side face verification.
+Compares parsing a JSON text descriptor (the old storage format) and
+computing the distance in pure Python on every punch against the cached
+float32 vector path used by PunchInView, and times validation of the live
+descriptor sent by the app. Then times 1:N kiosk identification over an
+in-memory index of --index-size synthetic employees, exact and with the
+clustering prefilter.
+
+No database rows are touched; users are unsaved instances.
+
+Usage:
+    python manage.py benchmark_face_match
+    python manage.py benchmark_face_match --users 1000 --repeat 20000
+    python manage.py benchmark_face_match --index-size 50000
+"""
+
+import json
+import math
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from accounts.models import User
+from accounts.face_utils import DESCRIPTOR_LENGTH, pack_descriptor, parse_descriptor, verify_face
+from accounts.face_index_utils import FaceIndex
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-punch face descriptor verification cost (before/after)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500, help='Enrolled users (default 500)')
+        parser.add_argument('--repeat', type=int, default=10000, help='Timed verifications (default 10000)')
+        parser.add_argument('--index-size', type=int, default=10000,
+                            help='Enrolled employees for the 1:N identification run (default 10000)')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        users = []
+        json_descriptors = []
+        live = []  # as they arrive in the request body
+        for pk in range(1, options['users'] + 1):
+            descriptor = [rng.uniform(-0.25, 0.25) for _ in range(DESCRIPTOR_LENGTH)]
+            packed = pack_descriptor(parse_descriptor(descriptor))
+            users.append(User(pk=pk, mobile=f'9{pk:09d}', face_descriptor=packed))
+            json_descriptors.append(json.dumps(descriptor))
+            live.append([value + rng.uniform(-0.02, 0.02) for value in descriptor])
+        repeat = options['repeat']
+
+        def naive(index):
+            enrolled = json.loads(json_descriptors[index])
+            return math.sqrt(sum((a - b) ** 2 for a, b in zip(enrolled, live[index])))
+
+        vectors = [parse_descriptor(descriptor) for descriptor in live]
+
+        def cached(index):
+            return verify_face(users[index], vectors[index])
+
+        parse = self.time_per_call(lambda index: parse_descriptor(live[index]), len(users), repeat)
+        before = self.time_per_call(naive, len(users), repeat)
+        after = self.time_per_call(cached, len(users), repeat)
+
+        self.stdout.write(f'Users: {len(users)}, verifications: {repeat}')
+        self.stdout.write(f'  Validate live descriptor:   {parse:8.2f} us')
+        self.stdout.write(f'  JSON parse + Python math:   {before:8.2f} us')
+        self.stdout.write(f'  Cached float32 vector:      {after:8.2f} us')
+        self.stdout.write(self.style.SUCCESS(
+            f'Added to punch-in: {parse + after:.2f} us per request, speedup {before / after:.1f}x'
+        ))
+
+        self.benchmark_identify(options['index_size'], min(repeat, 1000))
+
+    def benchmark_identify(self, size, repeat):
+        rng = np.random.default_rng(42)
+        # Descriptors are roughly unit length with small per-dimension values
+        matrix = rng.normal(0, 0.09, size=(size, DESCRIPTOR_LENGTH)).astype(np.float32)
+        user_ids = np.arange(1, size + 1)
+        picks = rng.integers(0, size, size=repeat)
+        probes = matrix[picks] + rng.normal(0, 0.01, size=(repeat, DESCRIPTOR_LENGTH)).astype(np.float32)
+
+        exact = FaceIndex()
+        exact.load(user_ids, matrix, cluster=False)
+        start = time.perf_counter()
+        clustered = FaceIndex()
+        clustered.load(user_ids, matrix)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        results = {}
+        for label, index in (('exact', exact), ('clustered', clustered)):
+            index.search(probes[0])  # warm up
+            start = time.perf_counter()
+            found = [index.search(probe)[0][0] for probe in probes]
+            elapsed = (time.perf_counter() - start) / repeat * 1000
+            hits = sum(user_id == user_ids[pick] for user_id, pick in zip(found, picks))
+            results[label] = (elapsed, hits / repeat * 100)
+
+        self.stdout.write(f'1:N identification, {size} employees, {repeat} searches')
+        self.stdout.write(f'  Exact matrix search:        {results["exact"][0]:8.3f} ms  ({results["exact"][1]:.1f}% correct)')
+        if clustered.snapshot.centroids is not None:
+            self.stdout.write(
+                f'  Clustered prefilter:        {results["clustered"][0]:8.3f} ms  '
+                f'({results["clustered"][1]:.1f}% correct, {len(clustered.snapshot.centroids)} clusters, '
+                f'built in {build_ms:.0f} ms)'
+            )
+        else:
+            self.stdout.write('  Clustered prefilter:        off below the clustering size')
+
+    def time_per_call(self, fn, count, repeat):
+        for index in range(count):
+            fn(index)  # warm up (fills the descriptor cache)
+        start = time.perf_counter()
+        for i in range(repeat):
+            fn(i % count)
+        elapsed = time.perf_counter() - start
+        return elapsed / repeat * 1_000_000
@@ -0,0 +1,56 @@
+"""
+Management command to flag accounts whose enrolled faces are near-identical
+(one person enrolled twice, or a colleague's face enrolled for buddy punching).
+Flags are listed for admins at /api/auth/face-duplicates/.
+
+Usage:
+    python manage.py detect_duplicate_faces
+    python manage.py detect_duplicate_faces --threshold 0.35 --dry-run
+    python manage.py detect_duplicate_faces --block-size 4096
+
+Linux Cron (weekly, Sunday night):
+    0 2 * * 0 cd /path/to/backend && /path/to/venv/bin/python manage.py detect_duplicate_faces
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.face_duplicate_utils import DEFAULT_BLOCK_SIZE, detect_duplicate_faces
+
+
+class Command(BaseCommand):
+    help = 'Flag pairs of active accounts with near-duplicate enrolled faces'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            help='Flag pairs closer than this distance (default FACE_DUPLICATE_THRESHOLD)'
+        )
+        parser.add_argument(
+            '--block-size',
+            type=int,
+            default=DEFAULT_BLOCK_SIZE,
+            help=f'Rows per distance tile; memory grows with its square (default {DEFAULT_BLOCK_SIZE})'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report pairs without saving flags'
+        )
+
+    def handle(self, *args, **options):
+        if options['block_size'] < 1:
+            raise CommandError('--block-size must be positive')
+        if options['threshold'] is not None and options['threshold'] <= 0:
+            raise CommandError('--threshold must be positive')
+
+        result = detect_duplicate_faces(
+            threshold=options['threshold'],
+            block_size=options['block_size'],
+            dry_run=options['dry_run'],
+        )
+
+        prefix = '[DRY RUN] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Scanned {result['users']} enrolled employee(s) in {result['seconds']:.1f}s: "
+            f"{result['pairs']} near-duplicate pair(s), {result['new']} new flag(s)"
+        ))
@@ -0,0 +1,49 @@
+"""
+Management command to generate avatar variants for profile photos uploaded
+before variants existed. New uploads get them from the image pipeline.
+
+Usage:
+    python manage.py generate_avatar_variants
+    python manage.py generate_avatar_variants --all   # regenerate existing variants too
+"""
+from django.core.management.base import BaseCommand
+
+from accounts.image_utils import (
+    AVATAR_SIZES, IMAGE_PRESETS, avatar_variant_data, open_scaled_image, save_avatar_variants
+)
+from accounts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Generate small avatar variants for existing profile photos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Regenerate variants for users that already have them'
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.exclude(photo='').exclude(photo__isnull=True)
+        if not options['all']:
+            users = users.filter(photo_variants={})
+
+        field = User._meta.get_field('photo')
+        max_size, _ = IMAGE_PRESETS['profile']
+        done = failed = 0
+        for user_id, name in users.values_list('id', 'photo').iterator():
+            try:
+                with field.storage.open(name) as photo:
+                    img = open_scaled_image(photo.read(), max_size)
+                urls = save_avatar_variants(field, name, avatar_variant_data(img))
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"User {user_id}: {e}")
+                continue
+            User.objects.filter(pk=user_id).touching(user_id).update(photo_variants=urls)
+            done += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {', '.join(AVATAR_SIZES)} avatars for {done} user(s), {failed} failed"
+        ))
@@ -0,0 +1,46 @@
+# Generated manually for ActivityLog actor snapshot fields
+
+from django.db import migrations, models
+
+
+def backfill_actor_snapshot(apps, schema_editor):
+    """Copy actor name/photo onto existing activity rows"""
+    ActivityLog = apps.get_model('accounts', 'ActivityLog')
+    User = apps.get_model('accounts', 'User')
+
+    actors = User.objects.filter(
+        id__in=ActivityLog.objects.filter(actor__isnull=False).values('actor_id')
+    ).only('id', 'name', 'photo')
+
+    for actor in actors.iterator():
+        photo_url = ''
+        try:
+            if actor.photo:
+                photo_url = actor.photo.url
+        except Exception:
+            pass
+        ActivityLog.objects.filter(actor_id=actor.id).update(
+            actor_name=actor.name,
+            actor_photo_url=photo_url
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_user_is_permanent_wfh'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activitylog',
+            name='actor_name',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='activitylog',
+            name='actor_photo_url',
+            field=models.CharField(blank=True, max_length=500),
+        ),
+        migrations.RunPython(backfill_actor_snapshot, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_activitylog_actor_snapshot'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('system', 'System'), ('leave_applied', 'Leave Applied'), ('leave_approved', 'Leave Approved'), ('leave_rejected', 'Leave Rejected'), ('regularization_applied', 'Regularization Applied'), ('regularization_approved', 'Regularization Approved'), ('regularization_rejected', 'Regularization Rejected'), ('profile_update_requested', 'Profile Update Requested'), ('profile_update_approved', 'Profile Update Approved'), ('profile_update_rejected', 'Profile Update Rejected'), ('wfh_applied', 'WFH Applied'), ('wfh_approved', 'WFH Approved'), ('wfh_rejected', 'WFH Rejected'), ('holiday', 'Holiday'), ('comp_off_expired', 'Comp Off Expired')], default='system', max_length=30),
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated manually: JSON text face descriptors -> packed float32 bytes
+
+import json
+import struct
+
+from django.db import migrations, models
+
+# Frozen copy of the version 1 layout in accounts/face_utils.py
+PACKED_V1 = struct.Struct('<B128f')
+
+
+def pack(text):
+    try:
+        values = json.loads(text)
+        if len(values) != 128:
+            return None
+        return PACKED_V1.pack(1, *(float(value) for value in values))
+    except (TypeError, ValueError, struct.error):
+        return None
+
+
+def unpack(data):
+    data = bytes(data)
+    if len(data) != PACKED_V1.size or data[0] != 1:
+        return None
+    return json.dumps(list(PACKED_V1.unpack(data)[1:]))
+
+
+def convert(apps, model_name, source, target, fn):
+    Model = apps.get_model('accounts', model_name)
+    rows = Model.objects.exclude(**{f'{source}__isnull': True}).only('id', source)
+    changed = []
+    for row in rows.iterator():
+        setattr(row, target, fn(getattr(row, source)) if getattr(row, source) else None)
+        changed.append(row)
+    Model.objects.bulk_update(changed, [target], batch_size=500)
+
+
+def pack_descriptors(apps, schema_editor):
+    convert(apps, 'User', 'face_descriptor', 'face_descriptor_packed', pack)
+    convert(apps, 'ProfileUpdateRequest', 'requested_face_descriptor', 'requested_face_descriptor_packed', pack)
+
+
+def unpack_descriptors(apps, schema_editor):
+    convert(apps, 'User', 'face_descriptor_packed', 'face_descriptor', unpack)
+    convert(apps, 'ProfileUpdateRequest', 'requested_face_descriptor_packed', 'requested_face_descriptor', unpack)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_notification_comp_off_expired'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='face_descriptor_packed',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='profileupdaterequest',
+            name='requested_face_descriptor_packed',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.RunPython(pack_descriptors, unpack_descriptors),
+        migrations.RemoveField(
+            model_name='user',
+            name='face_descriptor',
+        ),
+        migrations.RemoveField(
+            model_name='profileupdaterequest',
+            name='requested_face_descriptor',
+        ),
+        migrations.RenameField(
+            model_name='user',
+            old_name='face_descriptor_packed',
+            new_name='face_descriptor',
+        ),
+        migrations.RenameField(
+            model_name='profileupdaterequest',
+            old_name='requested_face_descriptor_packed',
+            new_name='requested_face_descriptor',
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='face_descriptor',
+            field=models.BinaryField(blank=True, help_text='128-dimensional face descriptor, packed float32 (see accounts/face_utils.py)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='profileupdaterequest',
+            name='requested_face_descriptor',
+            field=models.BinaryField(blank=True, help_text='Packed face descriptor to be saved on approval', null=True),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_pack_face_descriptors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FaceDuplicateFlag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance', models.FloatField(help_text='Euclidean distance between the enrolled descriptors')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('dismissed', 'Dismissed')], default='pending', max_length=20)),
+                ('review_remarks', models.TextField(blank=True)),
+                ('reviewed_on', models.DateTimeField(blank=True, null=True)),
+                ('detected_at', models.DateTimeField(auto_now_add=True)),
+                ('last_seen_at', models.DateTimeField(help_text='Last detection run that still found the pair')),
+            ],
+            options={
+                'db_table': 'face_duplicate_flags',
+                'ordering': ['distance'],
+            },
+        ),
+        migrations.AddField(
+            model_name='faceduplicateflag',
+            name='reviewed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reviewed_face_duplicates', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='faceduplicateflag',
+            name='user_a',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='face_duplicate_flags_a', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='faceduplicateflag',
+            name='user_b',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='face_duplicate_flags_b', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='faceduplicateflag',
+            index=models.Index(fields=['status', 'distance'], name='face_duplic_status_512bb9_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='faceduplicateflag',
+            constraint=models.UniqueConstraint(fields=('user_a', 'user_b'), name='unique_face_duplicate_pair'),
+        ),
+    ]
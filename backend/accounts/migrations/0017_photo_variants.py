@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_face_duplicate_flag'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activitylog',
+            name='actor_photo_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='profileupdaterequest',
+            name='requested_photo_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='photo_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -5,8 +5,10 @@ from django.utils import timezone
 import random
 import string
 
+from config.versions import VersionedQuerySet
 
-class UserManager(BaseUserManager):
+
+class UserManager(BaseUserManager.from_queryset(VersionedQuerySet)):
     def create_user(self, mobile, password=None, **extra_fields):
         if not mobile:
             raise ValueError('Mobile number is required')
@@ -45,6 +47,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(blank=True, null=True)
     name = models.CharField(max_length=100)
     photo = models.ImageField(upload_to='profile_photos/', blank=True, null=True)
+    # Small avatar URLs generated with the photo, e.g. {'sm': url, 'md': url}
+    photo_variants = models.JSONField(default=dict, blank=True)
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='employee')
     department = models.CharField(max_length=100, blank=True)
     designation = models.CharField(max_length=100, blank=True)
@@ -85,10 +89,10 @@ class User(AbstractBaseUser, PermissionsMixin):
     address = models.TextField(blank=True)
 
     # Face Recognition
-    face_descriptor = models.TextField(
+    face_descriptor = models.BinaryField(
         blank=True,
         null=True,
-        help_text="128-dimensional face descriptor for face recognition (JSON array)"
+        help_text="128-dimensional face descriptor, packed float32 (see accounts/face_utils.py)"
     )
 
     is_active = models.BooleanField(default=True)
@@ -106,6 +110,16 @@ class User(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return f"{self.name} ({self.mobile})"
 
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        # Users built from token claims (accounts/authentication.py) load the
+        # rest of their row at once the first time a missing field is read
+        if fields and getattr(self, '_partial_row', False):
+            deferred = self.get_deferred_fields()
+            if deferred.issuperset(fields):
+                fields = list(deferred)
+                self._partial_row = False
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
 
 class OTP(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='otps')
@@ -147,6 +161,7 @@ class Notification(models.Model):
         ('wfh_approved', 'WFH Approved'),
         ('wfh_rejected', 'WFH Rejected'),
         ('holiday', 'Holiday'),
+        ('comp_off_expired', 'Comp Off Expired'),
     )
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
@@ -248,6 +263,11 @@ class ActivityLog(models.Model):
         help_text="User affected by this action"
     )
 
+    # Actor snapshot taken at write time so the timeline never joins users
+    actor_name = models.CharField(max_length=100, blank=True)
+    actor_photo_url = models.CharField(max_length=500, blank=True)
+    actor_photo_variants = models.JSONField(default=dict, blank=True)
+
     activity_type = models.CharField(max_length=30, choices=ACTIVITY_TYPES)
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
     title = models.CharField(max_length=200)
@@ -305,11 +325,12 @@ class ProfileUpdateRequest(models.Model):
 
     # Photo uploads
     requested_photo = models.ImageField(upload_to='profile_update_requests/photos/', blank=True, null=True)
+    requested_photo_variants = models.JSONField(default=dict, blank=True)
     requested_aadhaar_photo = models.ImageField(upload_to='profile_update_requests/aadhaar/', blank=True, null=True)
     requested_pan_photo = models.ImageField(upload_to='profile_update_requests/pan/', blank=True, null=True)
 
     # Face descriptor (saved with photo, applied on approval)
-    requested_face_descriptor = models.TextField(blank=True, null=True, help_text="Face descriptor to be saved on approval")
+    requested_face_descriptor = models.BinaryField(blank=True, null=True, help_text="Packed face descriptor to be saved on approval")
 
     # Track what fields are being changed
     changed_fields = models.TextField(help_text="Comma-separated list of fields being changed")
@@ -328,3 +349,38 @@ class ProfileUpdateRequest(models.Model):
 
     def __str__(self):
         return f"Profile Update Request - {self.user.name} ({self.status})"
+
+
+class FaceDuplicateFlag(models.Model):
+    """Two accounts whose enrolled faces are near-identical (possible buddy punching)"""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('confirmed', 'Confirmed'),
+        ('dismissed', 'Dismissed'),
+    )
+
+    # Stored with user_a.id < user_b.id so each pair has one row
+    user_a = models.ForeignKey(User, on_delete=models.CASCADE, related_name='face_duplicate_flags_a')
+    user_b = models.ForeignKey(User, on_delete=models.CASCADE, related_name='face_duplicate_flags_b')
+    distance = models.FloatField(help_text="Euclidean distance between the enrolled descriptors")
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    review_remarks = models.TextField(blank=True)
+    reviewed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='reviewed_face_duplicates')
+    reviewed_on = models.DateTimeField(null=True, blank=True)
+
+    detected_at = models.DateTimeField(auto_now_add=True)
+    last_seen_at = models.DateTimeField(help_text="Last detection run that still found the pair")
+
+    class Meta:
+        db_table = 'face_duplicate_flags'
+        ordering = ['distance']
+        constraints = [
+            models.UniqueConstraint(fields=['user_a', 'user_b'], name='unique_face_duplicate_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'distance']),
+        ]
+
+    def __str__(self):
+        return f"Face duplicate {self.user_a_id} / {self.user_b_id} ({self.distance:.3f})"
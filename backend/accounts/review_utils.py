@@ -0,0 +1,154 @@
+"""
+Bulk approve/reject engine for employee requests (WFH, leave, regularization).
+
+Reviewing requests one by one costs a save, a notification insert, an
+activity log insert and an email thread per request. The engine instead:
+
+- locks the pending requests and flips their status with one UPDATE
+- runs the request type's side effects for the whole batch (apply_batch)
+- bulk_creates the notifications and activity logs
+- sends all emails from a single background thread after commit
+
+Subclasses say which model they review and how to build the notification,
+activity log and email for one request (each optional: None skips it);
+apply_batch is the hook for request types whose approval changes other
+tables.
+"""
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from .activity_utils import get_client_ip
+from .models import ActivityLog, Notification
+from .utils import send_emails_async
+
+REVIEW_STATUSES = ('approved', 'rejected')
+
+# Largest batch a single review call accepts
+MAX_BULK_REVIEW = 1000
+
+
+def parse_review_ids(data, field):
+    """
+    The request ids in data[field] as (ids, error).
+
+    ids are distinct ints in the order given; error is a message for a 400
+    response when the list is missing, malformed or longer than
+    MAX_BULK_REVIEW.
+    """
+    id_list = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+    try:
+        ids = id_list.run_validation(data.get(field, serializers.empty))
+    except serializers.ValidationError:
+        return None, f"{field} must be a non-empty list of ids"
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > MAX_BULK_REVIEW:
+        return None, f"At most {MAX_BULK_REVIEW} requests can be reviewed at once"
+    return ids, None
+
+
+class BulkReviewEngine:
+    """Approve or reject many pending requests of one model at once"""
+    model = None
+    # Relations needed by notifications, logs and emails
+    related = ('user',)
+    # email_function(obj, status, remarks), set per instance so it isn't bound
+    email_function = None
+
+    def __init__(self, reviewer, new_status, remarks='', request=None):
+        if new_status not in REVIEW_STATUSES:
+            raise ValueError("status must be 'approved' or 'rejected'")
+        self.reviewer = reviewer
+        self.new_status = new_status
+        self.remarks = remarks or ''
+        self.ip_address = get_client_ip(request) if request else None
+
+    def pending(self, ids):
+        return (
+            self.model.objects
+            .select_for_update(of=('self',))
+            .select_related(*self.related)
+            .filter(id__in=ids, status='pending')
+            .order_by('id')
+        )
+
+    def review(self, ids):
+        """Review the pending requests among `ids`; returns the reviewed objects"""
+        ids = list(ids)
+        if len(ids) > MAX_BULK_REVIEW:
+            raise ValueError(f"At most {MAX_BULK_REVIEW} requests can be reviewed at once")
+        reviewed_on = timezone.now()
+
+        with transaction.atomic():
+            objects = list(self.pending(ids))
+            if not objects:
+                return []
+
+            self.model.objects.filter(id__in=[obj.id for obj in objects]).update(
+                status=self.new_status,
+                reviewed_by=self.reviewer,
+                reviewed_on=reviewed_on,
+                review_remarks=self.remarks,
+                updated_at=reviewed_on,
+            )
+            for obj in objects:
+                obj.status = self.new_status
+                obj.reviewed_by = self.reviewer
+                obj.reviewed_on = reviewed_on
+                obj.review_remarks = self.remarks
+                obj.updated_at = reviewed_on
+
+            self.apply_batch(objects)
+
+            notifications = [self.notification(obj) for obj in objects]
+            Notification.objects.bulk_create(
+                [notification for notification in notifications if notification is not None]
+            )
+            try:
+                with transaction.atomic():
+                    logs = [log for log in map(self.activity_log, objects) if log is not None]
+                    for log in logs:
+                        log.ip_address = self.ip_address
+                    ActivityLog.objects.bulk_create(logs)
+            except Exception:
+                pass  # Don't fail the review if logging fails
+
+            emails = [
+                (obj, self.new_status, self.remarks)
+                for obj in objects if obj.user.email
+            ]
+            if self.email_function and emails:
+                email_function = self.email_function
+                transaction.on_commit(lambda: send_emails_async(email_function, emails))
+
+        return objects
+
+    def apply_batch(self, objects):
+        """Side effects of the new status for the whole batch (inside the transaction)"""
+
+    def notification(self, obj):
+        """Unsaved Notification for the employee, or None for no notification"""
+        return None
+
+    def activity_log(self, obj):
+        """Unsaved ActivityLog for the review, or None for no log entry"""
+        return None
+
+
+class WFHBulkReview(BulkReviewEngine):
+    """Bulk WFH approval - no side effects beyond the status change"""
+
+    def __init__(self, *args, **kwargs):
+        from attendance.models import WFHRequest
+        from .email_utils import send_wfh_status_email
+        self.model = WFHRequest
+        self.email_function = send_wfh_status_email
+        super().__init__(*args, **kwargs)
+
+    def notification(self, obj):
+        from .utils import wfh_status_notification
+        return wfh_status_notification(obj, self.new_status, commit=False)
+
+    def activity_log(self, obj):
+        from .activity_utils import log_wfh_reviewed
+        return log_wfh_reviewed(self.reviewer, obj, self.new_status, commit=False)
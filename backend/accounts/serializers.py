@@ -1,12 +1,58 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
-from .models import User, OTP, Notification, ProfileUpdateRequest, ActivityLog
+from django.core.exceptions import ObjectDoesNotExist
+from .models import User, OTP, Notification, ProfileUpdateRequest, ActivityLog, FaceDuplicateFlag
+
+
+class FaceDescriptorField(serializers.Field):
+    """Accepts a descriptor as JSON text or a list of 128 numbers and stores it packed"""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('write_only', True)
+        kwargs.setdefault('required', False)
+        kwargs.setdefault('allow_null', True)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if data in ('', None):
+            return None
+        from .face_utils import pack_descriptor, parse_descriptor
+        try:
+            return pack_descriptor(parse_descriptor(data))
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+
+def has_face_descriptor(obj):
+    """Use the list views' face_enrolled annotation so the bytes aren't loaded"""
+    enrolled = getattr(obj, 'face_enrolled', None)
+    if enrolled is not None:
+        return enrolled
+    return bool(obj.face_descriptor)
+
+
+def shift_name(obj):
+    """Name of the user's shift; None if unassigned or deleted under a stale row"""
+    try:
+        return obj.shift.name if obj.shift_id else None
+    except ObjectDoesNotExist:
+        return None
+
+
+def avatar_photo_url(obj, request=None):
+    """Photo URL, or the avatar variant asked for with ?avatar=sm|md"""
+    if not obj.photo:
+        return None
+    from .image_utils import avatar_size_param, pick_avatar
+    # Always return the URL directly - Cloudinary handles full URLs
+    return pick_avatar(obj.photo.url, obj.photo_variants, avatar_size_param(request))
 
 
 class UserSerializer(serializers.ModelSerializer):
     weekly_off_display = serializers.SerializerMethodField()
     photo_url = serializers.SerializerMethodField()
     shift_name = serializers.SerializerMethodField()
+    has_face_descriptor = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -14,7 +60,7 @@ class UserSerializer(serializers.ModelSerializer):
             'id', 'mobile', 'email', 'name', 'role',
             'department', 'designation', 'weekly_off', 'weekly_off_display',
             'shift', 'shift_name', 'is_permanent_wfh',
-            'date_joined', 'is_active', 'is_admin', 'photo_url', 'face_descriptor'
+            'date_joined', 'is_active', 'is_admin', 'photo_url', 'has_face_descriptor'
         ]
         read_only_fields = ['id', 'date_joined', 'shift']
 
@@ -23,13 +69,13 @@ class UserSerializer(serializers.ModelSerializer):
         return days[obj.weekly_off] if obj.weekly_off is not None else 'Sunday'
 
     def get_photo_url(self, obj):
-        if obj.photo:
-            # Always return the URL directly - Cloudinary handles full URLs
-            return obj.photo.url
-        return None
+        return avatar_photo_url(obj, self.context.get('request'))
 
     def get_shift_name(self, obj):
-        return obj.shift.name if obj.shift else None
+        return shift_name(obj)
+
+    def get_has_face_descriptor(self, obj):
+        return has_face_descriptor(obj)
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
@@ -40,6 +86,9 @@ class UserProfileSerializer(serializers.ModelSerializer):
     pan_photo_url = serializers.SerializerMethodField()
     has_pending_update = serializers.SerializerMethodField()
     shift_name = serializers.SerializerMethodField()
+    # Written here, read only from the face descriptor endpoint
+    face_descriptor = FaceDescriptorField()
+    has_face_descriptor = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -59,7 +108,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
             # Address
             'address',
             # Face Recognition
-            'face_descriptor',
+            'face_descriptor', 'has_face_descriptor',
             # Status
             'has_pending_update'
         ]
@@ -70,10 +119,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
         return days[obj.weekly_off] if obj.weekly_off is not None else 'Sunday'
 
     def get_photo_url(self, obj):
-        if obj.photo:
-            # Always return the URL directly - Cloudinary handles full URLs
-            return obj.photo.url
-        return None
+        return avatar_photo_url(obj, self.context.get('request'))
 
     def get_aadhaar_photo_url(self, obj):
         if obj.aadhaar_photo:
@@ -89,28 +135,30 @@ class UserProfileSerializer(serializers.ModelSerializer):
         return ProfileUpdateRequest.objects.filter(user=obj, status='pending').exists()
 
     def get_shift_name(self, obj):
-        return obj.shift.name if obj.shift else None
+        return shift_name(obj)
 
-    def validate_photo(self, value):
-        """Compress profile photo on upload"""
-        if value:
-            from .image_utils import compress_profile_photo
-            return compress_profile_photo(value)
-        return value
+    def get_has_face_descriptor(self, obj):
+        return has_face_descriptor(obj)
 
-    def validate_aadhaar_photo(self, value):
-        """Compress aadhaar photo on upload"""
-        if value:
-            from .image_utils import compress_document_photo
-            return compress_document_photo(value)
-        return value
+    def update(self, instance, validated_data):
+        """Save the row now; uploaded photos are compressed and attached once ready"""
+        from .image_utils import AVATAR_FIELDS, PHOTO_PRESETS, queue_image
 
-    def validate_pan_photo(self, value):
-        """Compress pan photo on upload"""
-        if value:
-            from .image_utils import compress_document_photo
-            return compress_document_photo(value)
-        return value
+        uploads = {
+            field: validated_data.pop(field)
+            for field in PHOTO_PRESETS if validated_data.get(field)
+        }
+        for field, variants_field in AVATAR_FIELDS.items():
+            if field in validated_data:
+                # Photo cleared: its avatars go with it
+                validated_data[variants_field] = {}
+        instance = super().update(instance, validated_data)
+        for field, upload in uploads.items():
+            queue_image(
+                instance, field, upload, PHOTO_PRESETS[field],
+                variants_field=AVATAR_FIELDS.get(field)
+            )
+        return instance
 
 
 class UserCreateSerializer(serializers.ModelSerializer):
@@ -305,33 +353,12 @@ class ProfileUpdateRequestCreateSerializer(serializers.Serializer):
     aadhaar_photo = serializers.ImageField(required=False)
     pan_photo = serializers.ImageField(required=False)
 
-    # Face descriptor (saved directly without approval)
-    face_descriptor = serializers.CharField(required=False, allow_blank=True)
+    # Face descriptor (saved with the photo, applied on approval)
+    face_descriptor = FaceDescriptorField()
 
     # Reason for update
     reason = serializers.CharField(required=False, allow_blank=True)
 
-    def validate_photo(self, value):
-        """Compress profile photo"""
-        if value:
-            from .image_utils import compress_profile_photo
-            return compress_profile_photo(value)
-        return value
-
-    def validate_aadhaar_photo(self, value):
-        """Compress aadhaar photo"""
-        if value:
-            from .image_utils import compress_document_photo
-            return compress_document_photo(value)
-        return value
-
-    def validate_pan_photo(self, value):
-        """Compress pan photo"""
-        if value:
-            from .image_utils import compress_document_photo
-            return compress_document_photo(value)
-        return value
-
 
 class ActivityLogSerializer(serializers.ModelSerializer):
     """Serializer for Activity Log"""
@@ -352,12 +379,19 @@ class ActivityLogSerializer(serializers.ModelSerializer):
         ]
 
     def get_actor_name(self, obj):
+        if obj.actor_name:
+            return obj.actor_name
         return obj.actor.name if obj.actor else 'System'
 
     def get_actor_photo(self, obj):
+        if obj.actor_photo_url:
+            from .image_utils import avatar_size_param, pick_avatar
+            return pick_avatar(
+                obj.actor_photo_url, obj.actor_photo_variants, avatar_size_param(self.context.get('request'))
+            )
         try:
             if obj.actor and obj.actor.photo:
-                return obj.actor.photo.url
+                return avatar_photo_url(obj.actor, self.context.get('request'))
         except Exception:
             pass
         return None
@@ -396,3 +430,37 @@ class ActivityLogSerializer(serializers.ModelSerializer):
             return local_time.strftime('%I:%M %p')
         except Exception:
             return ''
+
+
+class FaceDuplicateFlagSerializer(serializers.ModelSerializer):
+    """Flag with both accounts; pass verified_punches ({user_id: count}) in context"""
+    users = serializers.SerializerMethodField()
+    reviewed_by_name = serializers.CharField(source='reviewed_by.name', read_only=True, allow_null=True)
+
+    class Meta:
+        model = FaceDuplicateFlag
+        fields = [
+            'id', 'users', 'distance', 'status', 'review_remarks',
+            'reviewed_by', 'reviewed_by_name', 'reviewed_on',
+            'detected_at', 'last_seen_at'
+        ]
+
+    def get_users(self, obj):
+        punches = self.context.get('verified_punches', {})
+        return [
+            {
+                'id': user.id,
+                'name': user.name,
+                'mobile': user.mobile,
+                'department': user.department,
+                'is_active': user.is_active,
+                'photo_url': user.photo.url if user.photo else None,
+                'verified_punches_30d': punches.get(user.id, 0),
+            }
+            for user in (obj.user_a, obj.user_b)
+        ]
+
+
+class FaceDuplicateReviewSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=['confirmed', 'dismissed'])
+    review_remarks = serializers.CharField(required=False, allow_blank=True)
@@ -3,8 +3,12 @@ Signals for Accounts app - sends email and in-app notifications when profile upd
 """
 from django.db.models.signals import pre_save, post_save
 from django.dispatch import receiver
-from .models import ProfileUpdateRequest, Notification
+from .models import ProfileUpdateRequest, Notification, User
 from .email_utils import send_profile_update_status_email
+from config.versions import track_model
+
+# Data version for caches built from user rows (shift, role, weekly off...)
+track_model(User, 'users', user_field='id')
 
 
 @receiver(pre_save, sender=ProfileUpdateRequest)
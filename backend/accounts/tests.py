@@ -1,3 +1,249 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.utils import timezone
+
+from attendance.models import Attendance, Shift, WFHRequest
+from attendance.views import BulkWFHReviewView
+from config.cache import clear_all
+from config.testing import BudgetedAPITestCase
+from . import face_index_utils
+from .dashboard_utils import get_india_date
+from .face_index_utils import (
+    FACE_INDEX_CHANGE_KEY, FACE_INDEX_VERSION_KEY, FaceIndex, face_index_cache, face_index_changed,
+)
+from .face_utils import pack_descriptor, verify_face
+from .models import ActivityLog, Notification, User
+from .review_utils import MAX_BULK_REVIEW, BulkReviewEngine, parse_review_ids
+from .views import AdminDashboardStatsView, TodayEmployeeStatusView
+
+
+def make_admin(mobile='9000000000'):
+    return User.objects.create_user(mobile=mobile, name='Admin', role='admin', is_admin=True)
+
+
+def make_employee(mobile, name='Employee', **fields):
+    return User.objects.create_user(mobile=mobile, name=name, **fields)
+
+
+class ParseReviewIdsTests(SimpleTestCase):
+    def test_distinct_ints_in_order(self):
+        self.assertEqual(parse_review_ids({'ids': [3, '1', 3, 2]}, 'ids'), ([3, 1, 2], None))
+
+    def test_rejects_missing_empty_and_malformed_lists(self):
+        for data in ({}, {'ids': []}, {'ids': 'x'}, {'ids': ['a']}, {'ids': [0]}):
+            ids, error = parse_review_ids(data, 'ids')
+            self.assertIsNone(ids)
+            self.assertEqual(error, "ids must be a non-empty list of ids")
+
+    def test_rejects_more_than_the_cap(self):
+        ids, error = parse_review_ids({'ids': list(range(1, MAX_BULK_REVIEW + 2))}, 'ids')
+        self.assertIsNone(ids)
+        self.assertIn(str(MAX_BULK_REVIEW), error)
+
+
+class SilentWFHReview(BulkReviewEngine):
+    model = WFHRequest
+
+
+class BulkReviewEngineTests(TestCase):
+    def test_notification_and_log_are_optional(self):
+        admin = make_admin()
+        wfh = WFHRequest.objects.create(user=make_employee('9000000251'), date=get_india_date(), reason='Rain')
+
+        reviewed = SilentWFHReview(admin, 'approved').review([wfh.id])
+
+        self.assertEqual([obj.id for obj in reviewed], [wfh.id])
+        wfh.refresh_from_db()
+        self.assertEqual((wfh.status, wfh.reviewed_by), ('approved', admin))
+        self.assertFalse(Notification.objects.exists())
+        self.assertFalse(ActivityLog.objects.exists())
+
+
+class VerifyFaceTests(SimpleTestCase):
+    def setUp(self):
+        self.enrolled = np.random.RandomState(1).uniform(-0.2, 0.2, 128).astype(np.float32)
+        self.user = User(pk=1, face_descriptor=pack_descriptor(self.enrolled))
+
+    def test_close_capture_matches(self):
+        matched, distance = verify_face(self.user, self.enrolled + np.float32(0.01))
+        self.assertTrue(matched)
+        self.assertGreater(distance, 0)
+
+    def test_replayed_descriptor_is_rejected(self):
+        matched, distance = verify_face(self.user, self.enrolled.copy())
+        self.assertFalse(matched)
+        self.assertEqual(distance, 0)
+
+
+class FaceIndexSyncTests(TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        clear_all()
+        vectors = np.random.RandomState(2).uniform(-0.2, 0.2, (3, 128)).astype(np.float32)
+        self.first_face, self.second_face, self.new_face = vectors
+        self.first = make_employee('9000000501', face_descriptor=pack_descriptor(self.first_face))
+        self.second = make_employee('9000000502', face_descriptor=pack_descriptor(self.second_face))
+        self.index = FaceIndex()
+        self.index.sync()
+
+    def sync(self):
+        """Sync, returning which of rebuild / refresh_users ran"""
+        with mock.patch.object(self.index, 'rebuild', wraps=self.index.rebuild) as rebuild, \
+                mock.patch.object(self.index, 'refresh_users', wraps=self.index.refresh_users) as refresh:
+            self.index.sync()
+        return rebuild, refresh
+
+    def change(self, user, **fields):
+        User.objects.filter(pk=user.pk).update(**fields)
+        face_index_changed(user.pk)
+
+    def test_first_sync_builds_the_index(self):
+        self.assertEqual(self.index.search(self.first_face)[0][0], self.first.pk)
+        self.assertEqual(self.index.search(self.second_face)[0][0], self.second.pk)
+
+    def test_unchanged_index_reloads_nothing(self):
+        rebuild, refresh = self.sync()
+
+        rebuild.assert_not_called()
+        refresh.assert_not_called()
+
+    def test_changed_users_are_reloaded_alone(self):
+        self.change(self.second, face_descriptor=pack_descriptor(self.new_face))
+
+        rebuild, refresh = self.sync()
+
+        rebuild.assert_not_called()
+        refresh.assert_called_once_with({self.second.pk})
+        user_id, distance = self.index.search(self.new_face)[0]
+        self.assertEqual(user_id, self.second.pk)
+        self.assertAlmostEqual(distance, 0, places=3)
+
+    def test_deactivated_users_drop_out(self):
+        self.change(self.first, is_active=False)
+
+        self.sync()
+
+        self.assertEqual([user_id for user_id, _ in self.index.search(self.first_face)], [self.second.pk])
+
+    def test_workers_too_far_behind_rebuild(self):
+        self.change(self.first, face_descriptor=pack_descriptor(self.new_face))
+        self.change(self.second, is_active=False)
+
+        with mock.patch.object(face_index_utils, 'MAX_INCREMENTAL_CHANGES', 1):
+            rebuild, refresh = self.sync()
+
+        rebuild.assert_called_once_with()
+        refresh.assert_not_called()
+        self.assertEqual([user_id for user_id, _ in self.index.search(self.new_face)], [self.first.pk])
+
+    def test_lost_changes_rebuild(self):
+        self.change(self.second, face_descriptor=pack_descriptor(self.new_face))
+        face_index_cache.delete(FACE_INDEX_CHANGE_KEY.format(face_index_cache.get(FACE_INDEX_VERSION_KEY)))
+
+        rebuild, refresh = self.sync()
+
+        rebuild.assert_called_once_with()
+        refresh.assert_not_called()
+        self.assertEqual(self.index.search(self.new_face)[0][0], self.second.pk)
+
+
+class DashboardTests(BudgetedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = make_admin()
+        self.employees = [make_employee(f'900000010{index}', f'Employee {index}') for index in range(3)]
+        Attendance.objects.create(
+            user=self.employees[0], date=get_india_date(), punch_in=timezone.now() - timedelta(minutes=5)
+        )
+        Attendance.objects.create(user=self.employees[1], date=get_india_date(), status='on_leave')
+        self.login(self.admin)
+
+    def test_dashboard_stats(self):
+        response = self.call('get', '/api/auth/dashboard-stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinBudget(response, AdminDashboardStatsView)
+        self.assertEqual(response.data['total_employees'], 3)
+        self.assertEqual(response.data['today_present'], 1)
+        self.assertEqual(response.data['today_on_leave'], 1)
+        self.assertEqual(response.data['today_absent'], 1)
+
+        # Served from the cached counters
+        response = self.call('get', '/api/auth/dashboard-stats/')
+        self.assertEqual(response.data['total_employees'], 3)
+
+    def test_today_board(self):
+        response = self.call('get', '/api/auth/today-employee-status/')
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinBudget(response, TodayEmployeeStatusView)
+        statuses = {row['id']: row['status'] for row in response.data['employees']}
+        self.assertEqual(statuses, {
+            self.employees[0].id: 'present',
+            self.employees[1].id: 'on_leave',
+            self.employees[2].id: 'not_punched',
+        })
+
+    def test_employees_are_forbidden(self):
+        self.login(self.employees[0])
+        self.assertEqual(self.call('get', '/api/auth/dashboard-stats/').status_code, 403)
+
+
+class BulkWFHReviewTests(BudgetedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = make_admin()
+        day = get_india_date() + timedelta(days=3)
+        self.requests = [
+            WFHRequest.objects.create(user=make_employee(f'900000020{index}'), date=day, reason='Plumber')
+            for index in range(3)
+        ]
+        self.login(self.admin)
+
+    def test_approves_pending_requests_within_budget(self):
+        ids = [wfh.id for wfh in self.requests]
+        response = self.call('post', '/api/attendance/wfh/bulk-review/', {'wfh_ids': ids, 'status': 'approved'})
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinBudget(response, BulkWFHReviewView)
+        self.assertEqual(response.data['updated_count'], 3)
+        self.assertEqual(WFHRequest.objects.filter(status='approved', reviewed_by=self.admin).count(), 3)
+        self.assertEqual(Notification.objects.filter(notification_type='wfh_approved').count(), 3)
+
+        # Already reviewed requests are left alone
+        response = self.call('post', '/api/attendance/wfh/bulk-review/', {'wfh_ids': ids, 'status': 'rejected'})
+        self.assertEqual(response.data['updated_count'], 0)
+
+    def test_rejects_oversized_batches(self):
+        response = self.call('post', '/api/attendance/wfh/bulk-review/', {
+            'wfh_ids': list(range(1, MAX_BULK_REVIEW + 2)), 'status': 'approved'
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(WFHRequest.objects.exclude(status='pending').exists())
+
+
+class ClaimsAuthenticationTests(BudgetedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.employee = make_employee('9000000301')
+        self.login(self.employee)
+
+    def test_changed_user_is_picked_up(self):
+        self.assertEqual(self.call('get', '/api/attendance/today/').status_code, 200)
+
+        User.objects.filter(pk=self.employee.pk).touching(self.employee.pk).update(is_active=False)
+
+        self.assertEqual(self.call('get', '/api/attendance/today/').status_code, 401)
+
+    def test_deleted_shift_is_picked_up(self):
+        shift = Shift.objects.create(name='Early')
+        User.objects.filter(pk=self.employee.pk).touching(self.employee.pk).update(shift=shift)
+        response = self.call('get', '/api/auth/profile/')
+        self.assertEqual(response.data['shift_name'], 'Early')
+
+        shift.delete()
+
+        response = self.call('get', '/api/auth/profile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['shift'])
+        self.assertIsNone(response.data['shift_name'])
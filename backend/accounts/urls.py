@@ -2,7 +2,7 @@ from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
     AdminSignupView, LoginView, OTPRequestView, OTPVerifyView,
-    ProfileView, ChangePasswordView, EmployeeListView, EmployeeDetailView,
+    ProfileView, FaceDescriptorView, ChangePasswordView, EmployeeListView, EmployeeDetailView,
     CheckAdminExistsView, AdminDashboardStatsView, TodayEmployeeStatusView,
     NotificationListView, UnreadNotificationCountView, MarkNotificationReadView,
     MarkAllNotificationsReadView, ClearNotificationsView,
@@ -10,7 +10,9 @@ from .views import (
     ActivityLogListView,
     # Profile Update Request Views
     ProfileUpdateRequestView, MyProfileUpdateRequestsView, CancelProfileUpdateRequestView,
-    AllProfileUpdateRequestsView, ReviewProfileUpdateRequestView
+    AllProfileUpdateRequestsView, ReviewProfileUpdateRequestView,
+    # Duplicate faces
+    FaceDuplicateReportView, FaceDuplicateReviewView
 )
 
 urlpatterns = [
@@ -26,6 +28,7 @@ urlpatterns = [
 
     # Profile
     path('profile/', ProfileView.as_view(), name='profile'),
+    path('profile/face-descriptor/', FaceDescriptorView.as_view(), name='face-descriptor'),
     path('change-password/', ChangePasswordView.as_view(), name='change-password'),
 
     # Profile Update Requests (Employee)
@@ -41,6 +44,10 @@ urlpatterns = [
     path('employees/', EmployeeListView.as_view(), name='employee-list'),
     path('employees/<int:pk>/', EmployeeDetailView.as_view(), name='employee-detail'),
 
+    # Admin - Duplicate faces (detect_duplicate_faces)
+    path('face-duplicates/', FaceDuplicateReportView.as_view(), name='face-duplicates'),
+    path('face-duplicates/<int:pk>/review/', FaceDuplicateReviewView.as_view(), name='face-duplicate-review'),
+
     # Admin - Dashboard Stats
     path('dashboard-stats/', AdminDashboardStatsView.as_view(), name='dashboard-stats'),
     path('today-employee-status/', TodayEmployeeStatusView.as_view(), name='today-employee-status'),
@@ -20,15 +20,40 @@ def send_email_async(email_func, *args, **kwargs):
     thread.start()
 
 
-def create_notification(user, title, message, notification_type='system', related_id=None):
-    """Create a notification for a user"""
-    return Notification.objects.create(
+def send_emails_async(email_func, calls):
+    """Send a batch of emails from one background thread (calls: list of args tuples)"""
+    import logging
+    logger = logging.getLogger(__name__)
+
+    def run():
+        sent = 0
+        for args in calls:
+            try:
+                email_func(*args)
+                sent += 1
+            except Exception as e:
+                logger.error(f"Email sending failed: {e}", exc_info=True)
+        logger.info(f"Sent {sent}/{len(calls)} emails via {email_func.__name__}")
+
+    if not calls:
+        return
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+
+
+def create_notification(user, title, message, notification_type='system', related_id=None, commit=True):
+    """Create a notification for a user (commit=False returns it unsaved for bulk_create)"""
+    notification = Notification(
         user=user,
         title=title,
         message=message,
         notification_type=notification_type,
         related_id=related_id
     )
+    if commit:
+        notification.save()
+    return notification
 
 
 def notify_admins(title, message, notification_type='system', related_id=None):
@@ -63,21 +88,27 @@ def notify_leave_applied(leave_request):
     send_email_async(send_leave_applied_email, leave_request)
 
 
-def notify_leave_status(leave_request, status, remarks=''):
-    """Notify employee when their leave request is approved/rejected"""
-    from .email_utils import send_leave_status_email
-
+def leave_status_notification(leave_request, status, commit=True):
+    """In-app notification for a reviewed leave request"""
     notification_type = 'leave_approved' if status == 'approved' else 'leave_rejected'
     status_text = 'approved' if status == 'approved' else 'rejected'
 
-    # In-app notification
-    create_notification(
+    return create_notification(
         user=leave_request.user,
         title=f"Leave Request {status_text.title()}",
         message=f"Your {leave_request.leave_type.name} leave request from {leave_request.start_date} to {leave_request.end_date} has been {status_text}.",
         notification_type=notification_type,
-        related_id=leave_request.id
+        related_id=leave_request.id,
+        commit=commit
     )
+
+
+def notify_leave_status(leave_request, status, remarks=''):
+    """Notify employee when their leave request is approved/rejected"""
+    from .email_utils import send_leave_status_email
+
+    # In-app notification
+    leave_status_notification(leave_request, status)
     # Email notification (async)
     send_email_async(send_leave_status_email, leave_request, status, remarks)
 
@@ -97,21 +128,27 @@ def notify_regularization_applied(regularization):
     send_email_async(send_regularization_applied_email, regularization)
 
 
-def notify_regularization_status(regularization, status, remarks=''):
-    """Notify employee when their regularization request is approved/rejected"""
-    from .email_utils import send_regularization_status_email
-
+def regularization_status_notification(regularization, status, commit=True):
+    """In-app notification for a reviewed regularization request"""
     notification_type = 'regularization_approved' if status == 'approved' else 'regularization_rejected'
     status_text = 'approved' if status == 'approved' else 'rejected'
 
-    # In-app notification
-    create_notification(
+    return create_notification(
         user=regularization.user,
         title=f"Regularization {status_text.title()}",
         message=f"Your attendance regularization request for {regularization.date} has been {status_text}.",
         notification_type=notification_type,
-        related_id=regularization.id
+        related_id=regularization.id,
+        commit=commit
     )
+
+
+def notify_regularization_status(regularization, status, remarks=''):
+    """Notify employee when their regularization request is approved/rejected"""
+    from .email_utils import send_regularization_status_email
+
+    # In-app notification
+    regularization_status_notification(regularization, status)
     # Email notification (async)
     send_email_async(send_regularization_status_email, regularization, status, remarks)
 
@@ -165,21 +202,27 @@ def notify_wfh_applied(wfh_request):
     send_email_async(send_wfh_applied_email, wfh_request)
 
 
-def notify_wfh_status(wfh_request, status, remarks=''):
-    """Notify employee when their WFH request is approved/rejected"""
-    from .email_utils import send_wfh_status_email
-
+def wfh_status_notification(wfh_request, status, commit=True):
+    """In-app notification for a reviewed WFH request"""
     notification_type = 'wfh_approved' if status == 'approved' else 'wfh_rejected'
     status_text = 'approved' if status == 'approved' else 'rejected'
 
-    # In-app notification
-    create_notification(
+    return create_notification(
         user=wfh_request.user,
         title=f"WFH Request {status_text.title()}",
         message=f"Your Work From Home request for {wfh_request.date} has been {status_text}.",
         notification_type=notification_type,
-        related_id=wfh_request.id
+        related_id=wfh_request.id,
+        commit=commit
     )
+
+
+def notify_wfh_status(wfh_request, status, remarks=''):
+    """Notify employee when their WFH request is approved/rejected"""
+    from .email_utils import send_wfh_status_email
+
+    # In-app notification
+    wfh_status_notification(wfh_request, status)
     # Email notification (async)
     send_email_async(send_wfh_status_email, wfh_request, status, remarks)
 
@@ -1,17 +1,18 @@
 from rest_framework import status, generics, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.utils import timezone
 
-from .models import User, OTP, Notification, ProfileUpdateRequest, ActivityLog
+from config.instrumentation import InstrumentedViewMixin
+from .authentication import ClaimsRefreshToken
+from .models import User, OTP, Notification, ProfileUpdateRequest, ActivityLog, FaceDuplicateFlag
 from .serializers import (
     UserSerializer, UserProfileSerializer, UserCreateSerializer, AdminSignupSerializer,
     LoginSerializer, OTPRequestSerializer, OTPVerifySerializer,
     ChangePasswordSerializer, NotificationSerializer,
     ProfileUpdateRequestSerializer, ProfileUpdateRequestCreateSerializer,
-    ActivityLogSerializer
+    ActivityLogSerializer, FaceDuplicateFlagSerializer, FaceDuplicateReviewSerializer
 )
 from .utils import notify_profile_update_applied, notify_profile_update_status
 from .activity_utils import (
@@ -39,7 +40,7 @@ class AdminSignupView(APIView):
         serializer = AdminSignupSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            refresh = RefreshToken.for_user(user)
+            refresh = ClaimsRefreshToken.for_user(user)
             return Response({
                 "message": "Admin created successfully",
                 "user": UserSerializer(user, context={'request': request}).data,
@@ -58,7 +59,7 @@ class LoginView(APIView):
         serializer = LoginSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.validated_data['user']
-            refresh = RefreshToken.for_user(user)
+            refresh = ClaimsRefreshToken.for_user(user)
             return Response({
                 "message": "Login successful",
                 "user": UserSerializer(user, context={'request': request}).data,
@@ -105,7 +106,7 @@ class OTPVerifyView(APIView):
             otp_obj.is_used = True
             otp_obj.save()
 
-            refresh = RefreshToken.for_user(user)
+            refresh = ClaimsRefreshToken.for_user(user)
             return Response({
                 "message": "OTP verified successfully",
                 "user": UserSerializer(user, context={'request': request}).data,
@@ -132,6 +133,9 @@ class ProfileView(APIView):
             )
             if serializer.is_valid():
                 serializer.save()
+                if 'face_descriptor' in serializer.validated_data:
+                    from .face_index_utils import face_index_changed
+                    face_index_changed(request.user.pk)
                 return Response(serializer.data)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         else:
@@ -142,6 +146,41 @@ class ProfileView(APIView):
             )
 
 
+class FaceDescriptorView(APIView):
+    """The current user's enrolled face descriptor, fetched only for face verification"""
+
+    def get(self, request):
+        from .face_utils import (
+            DESCRIPTOR_FORMAT_VERSION, descriptor_etag, get_enrolled_vector, server_verification_required
+        )
+
+        # When the server compares faces, the enrolled descriptor never leaves
+        # it: a client holding it could send it back as the live capture
+        if server_verification_required():
+            return Response(
+                {"error": "Face verification is done by the server", "verification": "server"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        packed = request.user.face_descriptor
+        vector = get_enrolled_vector(request.user)
+        if vector is None:
+            return Response(
+                {"error": "Face data not found. Please update your profile photo."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        # Revalidated on every use; unchanged descriptors come back as 304
+        etag = descriptor_etag(bytes(packed))
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(
+            {"version": DESCRIPTOR_FORMAT_VERSION, "descriptor": vector.tolist()},
+            headers=headers
+        )
+
+
 class ChangePasswordView(APIView):
     def post(self, request):
         serializer = ChangePasswordSerializer(
@@ -160,7 +199,15 @@ class EmployeeListView(generics.ListCreateAPIView):
     serializer_class = UserSerializer
 
     def get_queryset(self):
-        return User.objects.filter(role='employee').select_related('shift').order_by('name')
+        from django.db.models import Q
+        # Descriptors aren't part of the list payload, so don't load them
+        return (
+            User.objects.filter(role='employee')
+            .select_related('shift')
+            .defer('face_descriptor')
+            .annotate(face_enrolled=Q(face_descriptor__isnull=False))
+            .order_by('name')
+        )
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -171,6 +218,8 @@ class EmployeeListView(generics.ListCreateAPIView):
         serializer = UserCreateSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
+            from .dashboard_utils import record_employee_added
+            record_employee_added(user)
             # Log activity
             try:
                 log_employee_added(request.user, user, request)
@@ -200,6 +249,17 @@ class EmployeeDetailView(generics.RetrieveUpdateDestroyAPIView):
         instance.refresh_from_db()
         changed_fields = [field for field, value in old_data.items() if getattr(instance, field) != value]
 
+        if 'is_active' in changed_fields:
+            from .dashboard_utils import record_employee_added, record_employee_deactivated
+            if was_active:
+                record_employee_deactivated(instance)
+            else:
+                record_employee_added(instance)
+
+        if 'is_active' in changed_fields or 'face_descriptor' in request.data:
+            from .face_index_utils import face_index_changed
+            face_index_changed(instance.pk)
+
         if changed_fields:
             try:
                 # Check if employee was deactivated
@@ -218,8 +278,14 @@ class EmployeeDetailView(generics.RetrieveUpdateDestroyAPIView):
             log_employee_deactivated(self.request.user, instance, self.request)
         except Exception:
             pass
+        user_id = instance.pk
         instance.delete()
 
+        from .dashboard_utils import invalidate_dashboard_stats
+        from .face_index_utils import face_index_changed
+        invalidate_dashboard_stats()
+        face_index_changed(user_id)
+
 
 class CheckAdminExistsView(APIView):
     permission_classes = [permissions.AllowAny]
@@ -232,141 +298,28 @@ class CheckAdminExistsView(APIView):
 class AdminDashboardStatsView(APIView):
     """Get dashboard statistics for admin"""
     permission_classes = [IsAdminUser]
+    query_budget = 2  # auth + one aggregated query on a cache miss
 
     def get(self, request):
-        from attendance.models import Attendance
-        from leaves.models import LeaveRequest
+        from .dashboard_utils import get_dashboard_stats
 
-        today = timezone.now().date()
-
-        # Employee stats
-        total_employees = User.objects.filter(role='employee', is_active=True).count()
-
-        # Today's attendance
-        today_present = Attendance.objects.filter(
-            date=today,
-            punch_in__isnull=False
-        ).count()
-
-        today_on_leave = Attendance.objects.filter(
-            date=today,
-            status='on_leave'
-        ).count()
-
-        # Leave requests stats
-        pending_leaves = LeaveRequest.objects.filter(status='pending').count()
-        approved_today = LeaveRequest.objects.filter(
-            status='approved',
-            reviewed_on__date=today
-        ).count()
-
-        # This month's stats
-        current_month = today.month
-        current_year = today.year
-
-        leaves_this_month = LeaveRequest.objects.filter(
-            status='approved',
-            start_date__month=current_month,
-            start_date__year=current_year
-        ).count()
-
-        return Response({
-            'total_employees': total_employees,
-            'today_present': today_present,
-            'today_absent': total_employees - today_present - today_on_leave,
-            'today_on_leave': today_on_leave,
-            'pending_leave_requests': pending_leaves,
-            'approved_today': approved_today,
-            'leaves_this_month': leaves_this_month
-        })
+        # ?refresh=true recomputes instead of serving the cached counters
+        refresh = request.query_params.get('refresh', '').lower() in ('1', 'true', 'yes')
+        return Response(get_dashboard_stats(refresh=refresh))
 
 
 class TodayEmployeeStatusView(APIView):
     """Get today's attendance status for all employees"""
     permission_classes = [IsAdminUser]
+    query_budget = 4  # auth + employees + attendance + shifts
 
     def get(self, request):
-        from attendance.models import Attendance
-        import pytz
-
-        # IST timezone
-        ist = pytz.timezone('Asia/Kolkata')
-        today = timezone.now().astimezone(ist).date()
-
-        # Get all active employees
-        employees = User.objects.filter(
-            role='employee', is_active=True
-        ).select_related('shift').order_by('name')
-
-        # Get today's attendance records
-        today_attendance = {
-            att.user_id: att
-            for att in Attendance.objects.filter(date=today).select_related('user')
-        }
+        from attendance.board_utils import get_today_board
 
-        # Format time helper - convert to IST
-        def format_time(dt):
-            if not dt:
-                return None
-            # Convert to IST timezone
-            dt_ist = dt.astimezone(ist)
-            return dt_ist.strftime('%I:%M %p')
-
-        result = []
-        late_count = 0
-
-        for emp in employees:
-            attendance = today_attendance.get(emp.id)
-            is_late = False
-            late_by_minutes = 0
-
-            # Determine status and late calculation
-            if attendance:
-                status = attendance.status
-                punch_in = format_time(attendance.punch_in)
-                punch_out = format_time(attendance.punch_out)
-                working_hours = attendance.working_hours
-
-                # Check if late (based on shift start time and grace period from shift settings)
-                if attendance.punch_in and emp.shift:
-                    punch_in_time = attendance.punch_in.astimezone(ist).time()
-                    shift_start = emp.shift.start_time
-                    grace_minutes = emp.shift.grace_period_minutes  # Use grace period from shift settings
-                    from datetime import timedelta, datetime
-                    grace_time = (datetime.combine(today, shift_start) + timedelta(minutes=grace_minutes)).time()
-                    if punch_in_time > grace_time:
-                        is_late = True
-                        late_count += 1
-                        # Calculate late by minutes
-                        punch_dt = datetime.combine(today, punch_in_time)
-                        shift_dt = datetime.combine(today, shift_start)
-                        late_by_minutes = int((punch_dt - shift_dt).total_seconds() / 60)
-            else:
-                status = 'not_punched'
-                punch_in = None
-                punch_out = None
-                working_hours = None
-
-            result.append({
-                'id': emp.id,
-                'name': emp.name,
-                'department': emp.department,
-                'designation': emp.designation,
-                'photo_url': emp.photo.url if emp.photo else None,
-                'punch_in': punch_in,
-                'punch_out': punch_out,
-                'working_hours': working_hours,
-                'status': status,
-                'is_late': is_late,
-                'late_by_minutes': late_by_minutes,
-                'shift_name': emp.shift.name if emp.shift else None,
-                'shift_start': emp.shift.start_time.strftime('%I:%M %p') if emp.shift else None,
-            })
+        from .image_utils import avatar_size_param
 
-        return Response({
-            'employees': result,
-            'late_count': late_count
-        })
+        refresh = request.query_params.get('refresh', '').lower() in ('1', 'true', 'yes')
+        return Response(get_today_board(refresh=refresh, avatar=avatar_size_param(request)))
 
 
 # Notification Views
@@ -422,14 +375,21 @@ class ClearNotificationsView(APIView):
 
 
 # Activity Log Views
-class ActivityLogListView(generics.ListAPIView):
+class ActivityLogListView(InstrumentedViewMixin, generics.ListAPIView):
     """Get activity logs - Admin sees all, Employee sees their own"""
     serializer_class = ActivityLogSerializer
     pagination_class = None  # Disable pagination for timeline
+    query_budget = 2
 
     def list(self, request, *args, **kwargs):
         try:
-            return super().list(request, *args, **kwargs)
+            # Fast path: plain value rows + snapshot columns, no model instances
+            from .activity_utils import ACTIVITY_FEED_FIELDS, serialize_activity_rows
+            from .image_utils import avatar_size_param
+            rows = list(self.get_queryset().values(*ACTIVITY_FEED_FIELDS)[:100])
+            with self.timed_serialization():
+                data = serialize_activity_rows(rows, avatar=avatar_size_param(request))
+            return Response(data)
         except Exception as e:
             import logging
             logging.error(f"ActivityLog error: {str(e)}")
@@ -437,8 +397,7 @@ class ActivityLogListView(generics.ListAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        # Use select_related to avoid N+1 queries
-        queryset = ActivityLog.objects.select_related('actor', 'target_user').all()
+        queryset = ActivityLog.objects.all()
 
         # If not admin, only show their own activities
         if not user.is_admin:
@@ -462,11 +421,26 @@ class ActivityLogListView(generics.ListAPIView):
         if actor_id and user.is_admin:
             queryset = queryset.filter(actor_id=actor_id)
 
-        # Limit to 100 most recent activities
-        return queryset.order_by('-created_at')[:100]
+        return queryset.order_by('-created_at')
 
 
 # Profile Update Request Views
+def _apply_if_approved(request_id, user_field):
+    """Photo attached after the admin already approved: copy it to the user too"""
+    from .image_utils import AVATAR_FIELDS
+
+    def apply(stored_name, variant_urls):
+        user_id = ProfileUpdateRequest.objects.filter(
+            pk=request_id, status='approved'
+        ).values_list('user_id', flat=True).first()
+        if user_id:
+            updates = {user_field: stored_name}
+            if user_field in AVATAR_FIELDS:
+                updates[AVATAR_FIELDS[user_field]] = variant_urls
+            User.objects.filter(pk=user_id).touching(user_id).update(**updates)
+    return apply
+
+
 class ProfileUpdateRequestView(APIView):
     """Submit a profile update request (for employees)"""
     parser_classes = [MultiPartParser, FormParser]
@@ -514,18 +488,10 @@ class ProfileUpdateRequestView(APIView):
                     setattr(update_request, request_field, new_value)
                     changed_fields.append(field_name)
 
-        # Handle photo uploads
-        if 'photo' in data and data['photo']:
-            update_request.requested_photo = data['photo']
-            changed_fields.append('photo')
-
-        if 'aadhaar_photo' in data and data['aadhaar_photo']:
-            update_request.requested_aadhaar_photo = data['aadhaar_photo']
-            changed_fields.append('aadhaar_photo')
-
-        if 'pan_photo' in data and data['pan_photo']:
-            update_request.requested_pan_photo = data['pan_photo']
-            changed_fields.append('pan_photo')
+        # Photo uploads are compressed and attached after the request is saved
+        from .image_utils import AVATAR_FIELDS, PHOTO_PRESETS, queue_image
+        uploads = {field: data[field] for field in PHOTO_PRESETS if data.get(field)}
+        changed_fields.extend(uploads)
 
         # Save face_descriptor to request (will be applied on approval)
         if 'face_descriptor' in data and data['face_descriptor']:
@@ -541,6 +507,14 @@ class ProfileUpdateRequestView(APIView):
         update_request.reason = data.get('reason', '')
         update_request.save()
 
+        for field, upload in uploads.items():
+            variants_field = AVATAR_FIELDS.get(field)
+            queue_image(
+                update_request, f'requested_{field}', upload, PHOTO_PRESETS[field],
+                variants_field=f'requested_{variants_field}' if variants_field else None,
+                on_attached=_apply_if_approved(update_request.pk, field)
+            )
+
         # Notify all admins (with email)
         notify_profile_update_applied(update_request)
 
@@ -613,7 +587,8 @@ class ReviewProfileUpdateRequestView(APIView):
                 'requested_aadhaar_number', 'requested_pan_number',
                 'requested_bank_account_number', 'requested_bank_holder_name',
                 'requested_bank_name', 'requested_bank_ifsc', 'requested_address',
-                'requested_photo', 'requested_aadhaar_photo', 'requested_pan_photo',
+                'requested_photo', 'requested_photo_variants',
+                'requested_aadhaar_photo', 'requested_pan_photo',
                 'requested_face_descriptor'
             ).first()
 
@@ -668,6 +643,7 @@ class ReviewProfileUpdateRequestView(APIView):
             # Handle photo paths directly (raw strings from DB)
             if request_data.get('requested_photo'):
                 user_updates['photo'] = request_data['requested_photo']
+                user_updates['photo_variants'] = request_data['requested_photo_variants'] or {}
             if request_data.get('requested_aadhaar_photo'):
                 user_updates['aadhaar_photo'] = request_data['requested_aadhaar_photo']
             if request_data.get('requested_pan_photo'):
@@ -679,7 +655,13 @@ class ReviewProfileUpdateRequestView(APIView):
 
             # Direct database update - no file operations
             if user_updates:
-                User.objects.filter(pk=request_data['user_id']).update(**user_updates)
+                User.objects.filter(pk=request_data['user_id']).touching(
+                    request_data['user_id']
+                ).update(**user_updates)
+                if 'face_descriptor' in user_updates:
+                    # Kiosk workers pick up the new descriptor incrementally
+                    from .face_index_utils import face_index_changed
+                    face_index_changed(request_data['user_id'])
 
         # Send notification (in-app only)
         try:
@@ -706,3 +688,52 @@ class ReviewProfileUpdateRequestView(APIView):
             'message': f'Profile update request {action}',
             'request_id': pk
         })
+
+
+class FaceDuplicateReportView(generics.ListAPIView):
+    """Near-duplicate enrolled faces found by detect_duplicate_faces (admin only)"""
+    permission_classes = [IsAdminUser]
+
+    def get_queryset(self):
+        queryset = FaceDuplicateFlag.objects.select_related(
+            'user_a', 'user_b', 'reviewed_by'
+        ).defer('user_a__face_descriptor', 'user_b__face_descriptor', 'reviewed_by__face_descriptor')
+        status_filter = self.request.query_params.get('status', 'pending')
+        if status_filter != 'all':
+            queryset = queryset.filter(status=status_filter)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        from .face_duplicate_utils import verified_punch_counts
+
+        page = self.paginate_queryset(self.get_queryset())
+        flags = page if page is not None else list(self.get_queryset())
+        # One grouped query for the punch counts of every user on the page
+        context = {'request': request, 'verified_punches': verified_punch_counts(flags)}
+        data = FaceDuplicateFlagSerializer(flags, many=True, context=context).data
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+
+class FaceDuplicateReviewView(APIView):
+    """Confirm or dismiss a duplicate face flag (admin only)"""
+    permission_classes = [IsAdminUser]
+
+    def post(self, request, pk):
+        serializer = FaceDuplicateReviewSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        updated = FaceDuplicateFlag.objects.filter(pk=pk).update(
+            status=serializer.validated_data['status'],
+            review_remarks=serializer.validated_data.get('review_remarks', ''),
+            reviewed_by=request.user,
+            reviewed_on=timezone.now(),
+        )
+        if not updated:
+            return Response(
+                {"error": "Flag not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response({"message": f"Flag {serializer.validated_data['status']}"})
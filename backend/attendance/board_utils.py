@@ -0,0 +1,183 @@
+"""
+Admin "today board" - live attendance status for every active employee.
+
+The board is built from two value arrays (employees and today's attendance)
+instead of model instances. Lateness is computed from seconds-of-day in IST
+against cached shift policies, and times are formatted through a per-minute
+lookup table, so a refresh stays cheap at thousands of employees. The
+result is cached briefly (per avatar size) and dropped on punch events.
+"""
+from functools import lru_cache
+from django.utils import timezone
+
+from config.cache import Namespace
+
+from accounts.activity_utils import IST
+from accounts.image_utils import AVATAR_SIZES
+from accounts.models import User
+from .models import Attendance
+from .shift_utils import get_shift_policies
+
+TODAY_BOARD_CACHE_TIMEOUT = 60
+
+board_cache = Namespace('today_board', ttl=TODAY_BOARD_CACHE_TIMEOUT, l1_ttl=5)
+
+# IST is a fixed +05:30 offset, no DST
+IST_OFFSET_SECONDS = 5 * 3600 + 30 * 60
+SECONDS_PER_DAY = 24 * 3600
+
+# '%I:%M %p' for every minute of the day
+MINUTE_LABELS = tuple(
+    f'{(minute // 60) % 12 or 12:02d}:{minute % 60:02d} {"AM" if minute < 720 else "PM"}'
+    for minute in range(24 * 60)
+)
+
+
+def get_india_date():
+    """Get current date in India timezone (IST)"""
+    return timezone.now().astimezone(IST).date()
+
+
+def _board_cache_key(day, avatar=None):
+    return f'{day.isoformat()}:{avatar or "full"}'
+
+
+def ist_seconds_of_day(dt):
+    """Seconds since IST midnight for an aware datetime"""
+    return (dt.timestamp() + IST_OFFSET_SECONDS) % SECONDS_PER_DAY
+
+
+def _seconds(t):
+    return t.hour * 3600 + t.minute * 60 + t.second + t.microsecond / 1000000
+
+
+@lru_cache(maxsize=16384)
+def photo_url(name):
+    """Storage URL for a stored photo name (URL building is pure, so memoize)"""
+    if not name:
+        return None
+    return User._meta.get_field('photo').storage.url(name)
+
+
+def get_board_shifts():
+    """Shift policies reduced to what the board needs"""
+    shifts = {}
+    for shift_id, policy in get_shift_policies().items():
+        start = policy['start_time']
+        start_seconds = _seconds(start)
+        shifts[shift_id] = (
+            policy['name'],
+            MINUTE_LABELS[start.hour * 60 + start.minute],
+            start_seconds,
+            start_seconds + policy['grace_minutes'] * 60,
+        )
+    return shifts
+
+
+def compute_today_board(day=None, avatar=None):
+    """Build the board for a day from two value queries; `avatar` picks a photo variant"""
+    day = day or get_india_date()
+
+    employees = User.objects.filter(
+        role='employee', is_active=True
+    ).order_by('name').values_list(
+        'id', 'name', 'department', 'designation', 'photo', 'photo_variants', 'shift_id'
+    )
+    attendance = {
+        row[0]: row[1:]
+        for row in Attendance.objects.filter(date=day).values_list(
+            'user_id', 'status', 'punch_in', 'punch_out', 'working_hours'
+        )
+    }
+    shifts = get_board_shifts()
+
+    result = []
+    append = result.append
+    late_count = 0
+
+    for emp_id, name, department, designation, photo, photo_variants, shift_id in employees:
+        shift = shifts.get(shift_id)
+        is_late = False
+        late_by_minutes = 0
+        record = attendance.get(emp_id)
+
+        if record:
+            status, punch_in, punch_out, working_hours = record
+            punch_in_label = punch_out_label = None
+            if punch_in:
+                punch_in_seconds = ist_seconds_of_day(punch_in)
+                punch_in_label = MINUTE_LABELS[int(punch_in_seconds // 60)]
+                # Late only counts against an assigned shift
+                if shift and punch_in_seconds > shift[3]:
+                    is_late = True
+                    late_count += 1
+                    late_by_minutes = int((punch_in_seconds - shift[2]) / 60)
+            if punch_out:
+                punch_out_label = MINUTE_LABELS[int(ist_seconds_of_day(punch_out) // 60)]
+        else:
+            status = 'not_punched'
+            punch_in_label = punch_out_label = working_hours = None
+
+        append({
+            'id': emp_id,
+            'name': name,
+            'department': department,
+            'designation': designation,
+            'photo_url': (avatar and photo_variants and photo_variants.get(avatar)) or photo_url(photo),
+            'punch_in': punch_in_label,
+            'punch_out': punch_out_label,
+            'working_hours': working_hours,
+            'status': status,
+            'is_late': is_late,
+            'late_by_minutes': late_by_minutes,
+            'shift_name': shift[0] if shift else None,
+            'shift_start': shift[1] if shift else None,
+        })
+
+    return {
+        'employees': result,
+        'late_count': late_count
+    }
+
+
+def punch_event_data(user, attendance, event_type):
+    """Board row delta for a punch in/out, as pushed to live board clients"""
+    data = {
+        'id': user.id,
+        'name': user.name,
+        'status': attendance.status,
+    }
+    if event_type == 'punch_in':
+        shift = get_board_shifts().get(user.shift_id)
+        punch_in_seconds = ist_seconds_of_day(attendance.punch_in)
+        is_late = bool(shift) and punch_in_seconds > shift[3]
+        data.update({
+            'punch_in': MINUTE_LABELS[int(punch_in_seconds // 60)],
+            'is_late': is_late,
+            'late_by_minutes': int((punch_in_seconds - shift[2]) / 60) if is_late else 0,
+        })
+    else:
+        data.update({
+            'punch_out': MINUTE_LABELS[int(ist_seconds_of_day(attendance.punch_out) // 60)],
+            'working_hours': float(attendance.working_hours or 0),
+        })
+    return data
+
+
+def get_today_board(refresh=False, avatar=None):
+    """Cached board for today"""
+    day = get_india_date()
+    key = _board_cache_key(day, avatar)
+    if not refresh:
+        board = board_cache.get(key)
+        if board is not None:
+            return board
+    board = compute_today_board(day, avatar)
+    board_cache.set(key, board)
+    return board
+
+
+def invalidate_today_board(day=None):
+    """Drop the cached board so the next read rebuilds it"""
+    day = day or get_india_date()
+    board_cache.delete_many([_board_cache_key(day, avatar) for avatar in (None, *AVATAR_SIZES)])
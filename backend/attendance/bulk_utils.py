@@ -0,0 +1,220 @@
+"""
+Bulk attendance changes for admins.
+
+A bulk request is a list of entries, each marking a set of employees (by id
+and/or department) with one status over one date or a date range. All
+employees are validated in one query, the existing rows for every target
+(user, date) pair are loaded in one query, and the whole change is written
+with a single upsert inside one transaction. Later entries win when they
+target the same employee and date.
+
+Punch times on existing rows are kept, as the single-row bulk update
+always did, and the rules Attendance.save() applied to those rows are
+applied in memory: a row with both punches gets its working hours
+recomputed with the employee's shift, 'present' is downgraded by those
+hours (half day / absent), and weekly-off or holiday work is flagged and
+credited with comp-offs in one bulk_create.
+"""
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Attendance, compute_working_hours
+from .regularization_utils import credit_comp_offs, find_off_day_work
+from .shift_utils import get_shift_policies, get_shift_policy
+
+BULK_STATUSES = ('present', 'absent', 'half_day', 'on_leave')
+
+# Longest date range a single entry may cover
+MAX_BULK_DAYS = 31
+
+# Upper bound on employee-days per request
+MAX_BULK_ROWS = 5000
+
+UPSERT_BATCH_SIZE = 1000
+
+
+class BulkAttendanceError(Exception):
+    """Invalid bulk attendance request (reported to the client as a 400)"""
+
+
+def _parse_date(value, field):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise BulkAttendanceError(f"Invalid {field}. Use YYYY-MM-DD")
+
+
+def parse_bulk_entries(data):
+    """
+    Normalise a request body into a list of entries.
+
+    Accepts the original single-date payload
+        {"date", "user_ids", "status", "notes"}
+    or a list of entries
+        {"entries": [{"user_ids" and/or "department", "date" or
+                      "start_date"/"end_date", "status", "notes"}, ...]}
+    """
+    raw_entries = data.get('entries')
+    if raw_entries is None:
+        if not data.get('date') or not data.get('user_ids'):
+            raise BulkAttendanceError("date and user_ids are required")
+        raw_entries = [data]
+    elif not isinstance(raw_entries, list) or not raw_entries:
+        raise BulkAttendanceError("entries must be a non-empty list")
+
+    entries = []
+    for index, raw in enumerate(raw_entries, start=1):
+        if not isinstance(raw, dict):
+            raise BulkAttendanceError(f"Entry {index} must be an object")
+
+        user_ids = raw.get('user_ids') or []
+        department = raw.get('department') or ''
+        if not isinstance(user_ids, list):
+            raise BulkAttendanceError(f"Entry {index}: user_ids must be a list")
+        try:
+            user_ids = [int(user_id) for user_id in user_ids]
+        except (TypeError, ValueError):
+            raise BulkAttendanceError(f"Entry {index}: user_ids must be numbers")
+        if not user_ids and not department:
+            raise BulkAttendanceError(f"Entry {index}: user_ids or department is required")
+
+        status = raw.get('status', 'absent')
+        if status not in BULK_STATUSES:
+            raise BulkAttendanceError("Invalid status. Use: present, absent, half_day, on_leave")
+
+        if raw.get('date'):
+            start = end = _parse_date(raw['date'], 'date')
+        elif raw.get('start_date') and raw.get('end_date'):
+            start = _parse_date(raw['start_date'], 'start_date')
+            end = _parse_date(raw['end_date'], 'end_date')
+        else:
+            raise BulkAttendanceError(f"Entry {index}: date or start_date and end_date are required")
+        if end < start:
+            raise BulkAttendanceError(f"Entry {index}: end_date must be after start_date")
+        if (end - start).days + 1 > MAX_BULK_DAYS:
+            raise BulkAttendanceError(f"Entry {index}: date range can't exceed {MAX_BULK_DAYS} days")
+
+        notes = raw.get('notes', data.get('notes', ''))
+        entries.append({
+            'user_ids': user_ids,
+            'department': department,
+            'dates': [start + timedelta(days=offset) for offset in range((end - start).days + 1)],
+            'status': status,
+            'notes': f"Bulk update by admin: {notes}" if notes else "Bulk update by admin",
+        })
+    return entries
+
+
+def apply_bulk_attendance(entries):
+    """
+    Apply parsed entries in one transaction.
+
+    Returns a dict with per-employee results (same shape as the original
+    endpoint), created/updated counts and the dates touched.
+    """
+    from accounts.models import User
+
+    requested_ids = {user_id for entry in entries for user_id in entry['user_ids']}
+    departments = {entry['department'] for entry in entries if entry['department']}
+
+    lookup = Q(pk__in=requested_ids)
+    if departments:
+        lookup |= Q(department__in=departments, is_active=True)
+    employees = {
+        row['id']: row
+        for row in User.objects.filter(lookup, role='employee').values(
+            'id', 'name', 'department', 'shift_id', 'weekly_off'
+        )
+    }
+
+    # (user_id, date) -> (status, notes); later entries override earlier ones
+    targets = {}
+    for entry in entries:
+        user_ids = [user_id for user_id in entry['user_ids'] if user_id in employees]
+        if entry['department']:
+            user_ids += [
+                user_id for user_id, row in employees.items()
+                if row['department'] == entry['department']
+            ]
+        for user_id in user_ids:
+            for day in entry['dates']:
+                targets[(user_id, day)] = (entry['status'], entry['notes'])
+
+    if len(targets) > MAX_BULK_ROWS:
+        raise BulkAttendanceError(f"Too many changes in one request (max {MAX_BULK_ROWS} employee-days)")
+
+    results = [
+        {'user_id': user_id, 'user_name': employees[user_id]['name'], 'status': 'success'}
+        for user_id in sorted({user_id for user_id, _ in targets})
+    ]
+    results += [
+        {'user_id': user_id, 'status': 'failed', 'error': 'Employee not found'}
+        for user_id in sorted(requested_ids - set(employees))
+    ]
+
+    dates = sorted({day for _, day in targets})
+    if not targets:
+        return {'results': results, 'created': 0, 'updated': 0, 'dates': dates}
+
+    with transaction.atomic():
+        existing = {
+            (attendance.user_id, attendance.date): attendance
+            for attendance in Attendance.objects.filter(
+                user_id__in={user_id for user_id, _ in targets},
+                date__in=dates
+            ).only('user_id', 'date', 'punch_in', 'punch_out', 'working_hours', 'is_off_day')
+            if (attendance.user_id, attendance.date) in targets
+        }
+
+        rows = []
+        completed = []
+        policies = None
+        for (user_id, day), (status, notes) in targets.items():
+            attendance = Attendance(user_id=user_id, date=day, status=status, notes=notes)
+            current = existing.get((user_id, day))
+            if current is not None:
+                attendance.working_hours = current.working_hours
+                attendance.is_off_day = current.is_off_day
+                if current.punch_in and current.punch_out:
+                    if policies is None:
+                        policies = get_shift_policies()
+                    policy = get_shift_policy(employees[user_id]['shift_id'], policies)
+                    attendance.working_hours = compute_working_hours(current.punch_in, current.punch_out, policy)
+                    if status == 'present':
+                        attendance.status = attendance.determine_status()
+                    completed.append(attendance)
+            rows.append(attendance)
+
+        off_day_work = find_off_day_work(
+            completed, {user_id: row['weekly_off'] for user_id, row in employees.items()}
+        )
+
+        Attendance.objects.bulk_create(
+            rows,
+            batch_size=UPSERT_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['user', 'date'],
+            update_fields=['status', 'notes', 'working_hours', 'is_off_day', 'updated_at'],
+        )
+        credit_comp_offs(off_day_work)
+
+    invalidate_bulk_caches(dates)
+    return {
+        'results': results,
+        'created': len(targets) - len(existing),
+        'updated': len(existing),
+        'dates': dates,
+    }
+
+
+def invalidate_bulk_caches(dates):
+    """Drop the cached dashboard counters and board for any affected day"""
+    from accounts.dashboard_utils import get_india_date, invalidate_dashboard_stats
+    from .board_utils import invalidate_today_board
+
+    today = get_india_date()
+    if today in dates:
+        invalidate_dashboard_stats(today)
+        invalidate_today_board(today)
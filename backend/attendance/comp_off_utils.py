@@ -0,0 +1,269 @@
+"""
+Comp-off wallet.
+
+A user's comp-offs are read and spent through these helpers rather than by
+summing querysets in Python:
+
+- comp_off_summary() returns earned/available/used/expired totals from one
+  conditional aggregate
+- available_comp_off_days() is cached per user for today under the user's
+  'comp_offs' data version (config.versions), which every write to their
+  comp-offs moves; the bulk UPDATEs below name the users they touch so
+  only those balances are recomputed
+- consume_comp_offs() spends comp-offs oldest expiry first for any number
+  of claims with one locked read and one UPDATE
+- restore_comp_offs() hands the most recently used comp-offs back the
+  same way
+- expire_comp_offs() is the scheduled sweep that marks every comp-off past
+  its expiry as expired, so balance reads never have to write
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When
+from django.utils import timezone
+
+from config.cache import Namespace
+from config.versions import cached
+from .models import CompOff
+
+logger = logging.getLogger(__name__)
+
+COMP_OFF_BALANCE_CACHE_TIMEOUT = 60 * 60 * 6
+
+balance_cache = Namespace(
+    'comp_off_balance', ttl=COMP_OFF_BALANCE_CACHE_TIMEOUT, l1_ttl=COMP_OFF_BALANCE_CACHE_TIMEOUT, versioned=False
+)
+
+ZERO = Decimal('0')
+
+
+def _india_date():
+    from accounts.dashboard_utils import get_india_date
+    return get_india_date()
+
+
+def comp_off_summary(user_id, as_of=None):
+    """
+    Earned/available/used/expired comp-off days for a user in one query.
+
+    Earned comp-offs past their expiry count as expired even before the
+    status has been updated.
+    """
+    as_of = as_of or _india_date()
+    is_live = Q(status='earned') & (Q(expires_on__gte=as_of) | Q(expires_on__isnull=True))
+    totals = CompOff.objects.filter(user_id=user_id).aggregate(
+        earned=Sum('credit_days', filter=Q(status='earned')),
+        available=Sum('credit_days', filter=is_live),
+        used=Sum('credit_days', filter=Q(status='used')),
+        expired=Sum('credit_days', filter=Q(status='expired') | (Q(status='earned') & ~is_live)),
+    )
+    return {name: total or ZERO for name, total in totals.items()}
+
+
+def available_comp_off_days(user_id, as_of=None):
+    """Comp-off days a user can spend on `as_of` (cached when as_of is today)"""
+    today = _india_date()
+    as_of = as_of or today
+    if as_of != today:
+        return comp_off_summary(user_id, as_of)['available']
+
+    return cached(
+        balance_cache, f'available:{user_id}:{today}',
+        lambda: comp_off_summary(user_id, today)['available'],
+        ['comp_offs'], user_id,
+    )
+
+
+def consume_comp_offs(claims):
+    """
+    Spend comp-offs for (user_id, days, used_on) claims, oldest expiry first.
+
+    All candidate comp-offs are locked and read in one query, allocated in
+    Python in used_on order, then written back with one UPDATE. A comp-off
+    only partly needed keeps the remainder as its credit. Returns
+    {claim index: days actually covered}.
+    """
+    claims = [(index, user_id, Decimal(str(days)), used_on)
+              for index, (user_id, days, used_on) in enumerate(claims) if days > 0]
+    if not claims:
+        return {}
+
+    earliest = {}
+    for _, user_id, _, used_on in claims:
+        earliest[user_id] = min(earliest.get(user_id, used_on), used_on)
+
+    with transaction.atomic(savepoint=False):
+        return _consume_locked(claims, earliest)
+
+
+def _consume_locked(claims, earliest):
+    """Allocate and write back claims inside the caller's transaction"""
+    available = defaultdict(list)
+    for comp_off in (
+        CompOff.objects.select_for_update()
+        .filter(user_id__in=earliest.keys(), status='earned', expires_on__gte=min(earliest.values()))
+        .order_by('user_id', 'expires_on', 'id')
+        .only('id', 'user_id', 'credit_days', 'expires_on')
+    ):
+        available[comp_off.user_id].append(comp_off)
+
+    used_on_by_id = {}  # comp-off id -> used_date
+    remaining = {}      # comp-off id -> credit left after a partial use
+    covered = {}
+    for index, user_id, to_use, used_on in sorted(claims, key=lambda claim: (claim[3], claim[0])):
+        wanted = to_use
+        for comp_off in available[user_id]:
+            if to_use <= 0:
+                break
+            if comp_off.id in used_on_by_id or comp_off.expires_on < used_on:
+                continue
+            credit = remaining.get(comp_off.id, comp_off.credit_days)
+            if credit <= to_use:
+                used_on_by_id[comp_off.id] = used_on
+                remaining.pop(comp_off.id, None)
+                to_use -= credit
+            else:
+                remaining[comp_off.id] = credit - to_use
+                to_use = ZERO
+        covered[index] = wanted - to_use
+
+    touched = set(used_on_by_id) | set(remaining)
+    if not touched:
+        return covered
+
+    by_date = defaultdict(list)
+    for comp_off_id, day in used_on_by_id.items():
+        by_date[day].append(comp_off_id)
+
+    CompOff.objects.filter(id__in=touched).touching(*earliest).update(
+        status=Case(When(id__in=list(used_on_by_id), then=Value('used')), default=F('status')),
+        used_date=Case(
+            *[When(id__in=ids, then=Value(day)) for day, ids in by_date.items()],
+            default=F('used_date')
+        ),
+        credit_days=Case(
+            *[When(id=comp_off_id, then=Value(credit)) for comp_off_id, credit in remaining.items()],
+            default=F('credit_days'),
+            output_field=DecimalField(max_digits=3, decimal_places=1)
+        ),
+        updated_at=timezone.now(),
+    )
+    return covered
+
+
+def use_comp_off(user_id, comp_off_id, used_on, max_days=None, remainder_reason=''):
+    """
+    Spend one chosen comp-off, or up to max_days of it.
+
+    Returns the locked comp-off, now used with the days taken as
+    credit_days, or None if it isn't available on used_on. A remainder is
+    split off into a new earned comp-off with the same dates.
+    """
+    with transaction.atomic(savepoint=False):
+        comp_off = (
+            CompOff.objects.select_for_update()
+            .filter(pk=comp_off_id, user_id=user_id, status='earned', expires_on__gte=used_on)
+            .first()
+        )
+        if comp_off is None:
+            return None
+
+        taken = comp_off.credit_days
+        if max_days is not None:
+            taken = min(taken, Decimal(str(max_days)))
+        left = comp_off.credit_days - taken
+
+        CompOff.objects.filter(pk=comp_off.pk).touching(user_id).update(
+            status='used', used_date=used_on, credit_days=taken, updated_at=timezone.now()
+        )
+        if left > 0:
+            CompOff.objects.create(
+                user_id=user_id,
+                earned_date=comp_off.earned_date,
+                credit_days=left,
+                status='earned',
+                reason=remainder_reason,
+                expires_on=comp_off.expires_on
+            )
+    comp_off.status = 'used'
+    comp_off.used_date = used_on
+    comp_off.credit_days = taken
+    return comp_off
+
+
+def restore_comp_offs(user_id, days):
+    """Give back up to `days` of the user's most recently used comp-offs (whole rows)"""
+    days = Decimal(str(days))
+    if days <= 0:
+        return ZERO
+
+    restored = []
+    total = ZERO
+    with transaction.atomic(savepoint=False):
+        for comp_off in (
+            CompOff.objects.select_for_update()
+            .filter(user_id=user_id, status='used')
+            .order_by('-used_date', '-id')
+            .only('id', 'credit_days')
+        ):
+            if total >= days:
+                break
+            if total + comp_off.credit_days <= days:
+                restored.append(comp_off.id)
+                total += comp_off.credit_days
+
+        if restored:
+            CompOff.objects.filter(id__in=restored).touching(user_id).update(
+                status='earned', used_date=None, updated_at=timezone.now()
+            )
+    return total
+
+
+def expire_comp_offs(as_of=None):
+    """
+    Expire every earned comp-off whose expiry date is before `as_of` (today).
+
+    The (status, expires_on) index serves both the locked read and the
+    single UPDATE. Each affected user gets one notification covering all
+    of their expired comp-offs. Returns {'expired', 'days', 'users'}.
+    """
+    from accounts.models import Notification
+
+    as_of = as_of or _india_date()
+    stale = CompOff.objects.filter(status='earned', expires_on__lt=as_of)
+
+    with transaction.atomic():
+        rows = list(stale.select_for_update().values_list('user_id', 'credit_days'))
+        if not rows:
+            return {'expired': 0, 'days': ZERO, 'users': 0}
+        expired = stale.touching(*{user_id for user_id, _ in rows}).update(
+            status='expired', updated_at=timezone.now()
+        )
+
+        per_user = defaultdict(lambda: [0, ZERO])
+        for user_id, credit_days in rows:
+            per_user[user_id][0] += 1
+            per_user[user_id][1] += credit_days
+
+        Notification.objects.bulk_create([
+            Notification(
+                user_id=user_id,
+                title="Comp Off Expired",
+                message=(
+                    f"{count} comp off(s) worth {days.normalize():f} day(s) expired unused "
+                    f"before {as_of}."
+                ),
+                notification_type='comp_off_expired',
+            )
+            for user_id, (count, days) in per_user.items()
+        ], batch_size=1000)
+
+    total_days = sum((days for _, days in per_user.values()), ZERO)
+    logger.info(
+        "Expired %s comp off(s) (%s day(s)) for %s user(s) before %s",
+        expired, total_days, len(per_user), as_of
+    )
+    return {'expired': expired, 'days': total_days, 'users': len(per_user)}
@@ -0,0 +1,295 @@
+"""
+Live attendance events for the admin board.
+
+Punch views publish small deltas (employee id, time, late flag) and the
+admin board stream relays them to connected clients over Server-Sent
+Events. The API and the stream run in different processes (a WSGI web
+service and an ASGI stream service, see Procfile), so events travel
+through the shared cache:
+
+- publish_attendance_event() appends the event to a log in L2 once the
+  transaction commits: an incr() on the last id, then the event under
+  that id
+- in the stream process an EventRelay thread polls the log and hands new
+  events to the in-process broker, which fans them out to subscribers on
+  the ASGI event loop with call_soon_threadsafe
+
+A short history lets reconnecting clients resume from Last-Event-ID;
+anything older, an event missing from the log, or a subscriber that falls
+behind, gets a 'resync' event telling the client to refetch the full
+board.
+
+EventSource can't send an Authorization header and a JWT in the URL would
+end up in access logs, so the stream is opened with a stream ticket: a
+random single-use value the API issues to an admin, valid for
+STREAM_TICKET_TTL seconds.
+"""
+import asyncio
+import json
+import logging
+import secrets
+import threading
+import time
+from collections import deque
+
+from django.db import connection, transaction
+
+from config.cache import Namespace
+
+logger = logging.getLogger(__name__)
+
+# Events kept for Last-Event-ID replay
+EVENT_HISTORY_SIZE = 500
+
+# Per-subscriber buffer before the client is told to resync
+SUBSCRIBER_QUEUE_SIZE = 200
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_SECONDS = 15
+
+# How long published events stay in the shared log
+EVENT_LOG_TTL = 60 * 10
+
+# Seconds between polls of the shared log
+RELAY_POLL_SECONDS = 1
+
+# Polls to wait for an event whose id was taken but which isn't in the log
+# yet, before giving up on it (the publisher died, or it was evicted)
+MISSING_EVENT_POLLS = 5
+
+# Seconds a stream ticket can be redeemed for
+STREAM_TICKET_TTL = 30
+
+# Shared tier only: the stream process reads what the API process wrote
+event_log = Namespace('live_events', ttl=EVENT_LOG_TTL, l1_ttl=0, versioned=False)
+stream_tickets = Namespace('live_tickets', ttl=STREAM_TICKET_TTL, l1_ttl=0, versioned=False)
+
+
+class Subscription:
+    """One connected stream client"""
+
+    def __init__(self, broker, loop):
+        self.broker = broker
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def push(self, event):
+        """Thread-safe hand-off from the publishing thread"""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # Event loop already closed - client is gone
+            self.broker.unsubscribe(self)
+
+    def _put(self, event):
+        if self.overflowed:
+            return
+        if self.queue.full():
+            # Drop the backlog and leave a single resync marker
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            return
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout):
+        """Next event, None for resync, or raise asyncio.TimeoutError"""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class AttendanceEventBroker:
+    """Fan out attendance events to stream subscribers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._history = deque(maxlen=EVENT_HISTORY_SIZE)
+        self._last_id = 0
+
+    def start_at(self, event_id):
+        """Set the id of the last event already published (relay start)"""
+        with self._lock:
+            self._last_id = event_id
+
+    def publish(self, event_id, event_type, data):
+        with self._lock:
+            event = (event_id, event_type, data)
+            self._last_id = event_id
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.push(event)
+
+    def subscribe(self, loop, last_event_id=None):
+        """
+        Register a subscriber.
+
+        Returns (subscription, backlog) where backlog is the list of events
+        to replay, or None if last_event_id can't be resumed and the client
+        has to resync.
+        """
+        subscription = Subscription(self, loop)
+        with self._lock:
+            self._subscribers.add(subscription)
+            backlog = []
+            if last_event_id is not None:
+                oldest = self._history[0][0] if self._history else self._last_id + 1
+                if oldest - 1 <= last_event_id <= self._last_id:
+                    backlog = [event for event in self._history if event[0] > last_event_id]
+                else:
+                    backlog = None
+        return subscription, backlog
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def last_event_id(self):
+        return self._last_id
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+
+broker = AttendanceEventBroker()
+
+
+def publish_attendance_event(event_type, data):
+    """Append to the shared event log once the surrounding transaction commits"""
+    transaction.on_commit(lambda: append_event(event_type, data))
+
+
+def last_logged_event_id():
+    return event_log.get('last_id') or 0
+
+
+def append_event(event_type, data):
+    """Add an event to the shared log; returns its id"""
+    try:
+        event_id = event_log.incr('last_id')
+    except ValueError:
+        event_log.add('last_id', 0, None)
+        event_id = event_log.incr('last_id')
+    event_log.set(f'event:{event_id}', (event_type, data))
+    return event_id
+
+
+class EventRelay:
+    """Copies events from the shared log into a broker, from a polling thread"""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_id = 0
+        self._missing_polls = 0
+
+    def ensure_started(self):
+        """Start polling from the log's current end, once per process"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._last_id = last_logged_event_id()
+            self.broker.start_at(self._last_id)
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(RELAY_POLL_SECONDS)
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Polling live events failed: {e}", exc_info=True)
+                connection.close()
+
+    def poll(self):
+        """Publish the events logged since the last poll, in order"""
+        newest = last_logged_event_id()
+        if newest <= self._last_id:
+            return
+        if newest - self._last_id > EVENT_HISTORY_SIZE:
+            # Too far behind to replay: every client refetches the board
+            self._skip_to(newest)
+            return
+        ids = range(self._last_id + 1, newest + 1)
+        events = event_log.get_many([f'event:{event_id}' for event_id in ids])
+        for event_id in ids:
+            event = events.get(f'event:{event_id}')
+            if event is None:
+                # Its id is taken but it isn't stored yet - wait a little,
+                # then skip it and have clients resync
+                self._missing_polls += 1
+                if self._missing_polls >= MISSING_EVENT_POLLS:
+                    self._skip_to(event_id)
+                return
+            self._missing_polls = 0
+            self._last_id = event_id
+            self.broker.publish(event_id, *event)
+
+    def _skip_to(self, event_id):
+        self._missing_polls = 0
+        self._last_id = event_id
+        self.broker.publish(event_id, 'resync', {})
+
+
+relay = EventRelay(broker)
+
+
+def issue_stream_ticket(user):
+    """Single-use ticket that opens the stream as `user`"""
+    ticket = secrets.token_urlsafe(24)
+    stream_tickets.set(ticket, user.id)
+    return ticket
+
+
+def redeem_stream_ticket(ticket):
+    """User id the ticket was issued to, or None if unknown, expired or used"""
+    if not ticket:
+        return None
+    user_id = stream_tickets.get(ticket)
+    # add() is atomic, so only one redemption wins
+    if user_id is None or not stream_tickets.add(f'used:{ticket}', True):
+        return None
+    stream_tickets.delete(ticket)
+    return user_id
+
+
+def format_sse(event_id, event_type, data):
+    """Encode one Server-Sent Events message"""
+    return (
+        f'id: {event_id}\n'
+        f'event: {event_type}\n'
+        f'data: {json.dumps(data, separators=(",", ":"), default=str)}\n\n'
+    )
+
+
+async def stream_events(loop, last_event_id=None):
+    """Async generator of SSE chunks for one client"""
+    subscription, backlog = broker.subscribe(loop, last_event_id)
+    try:
+        yield 'retry: 3000\n\n'
+        if backlog is None:
+            yield format_sse(broker.last_event_id, 'resync', {})
+        else:
+            for event in backlog:
+                yield format_sse(*event)
+
+        while True:
+            try:
+                event = await subscription.get(HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            if event is None:
+                # Fell too far behind - client refetches the board
+                yield format_sse(broker.last_event_id, 'resync', {})
+                break
+            yield format_sse(*event)
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,48 @@
+"""
+Management command to expire comp offs that passed their expiry date.
+Run this once a day just after midnight IST using cron/Task Scheduler.
+
+Balance reads treat overdue comp offs as expired already; this sweep makes
+the stored status match and notifies the affected employees.
+
+Usage:
+    python manage.py expire_comp_offs
+    python manage.py expire_comp_offs --date 2025-01-01
+
+Linux Cron:
+    5 0 * * * cd /path/to/backend && /path/to/venv/bin/python manage.py expire_comp_offs
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.comp_off_utils import expire_comp_offs
+
+
+class Command(BaseCommand):
+    help = 'Expire comp offs past their expiry date and notify employees'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            type=str,
+            help='Expire comp offs expiring before this date (YYYY-MM-DD, default today IST)'
+        )
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options['date']:
+            try:
+                as_of = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Invalid --date. Use YYYY-MM-DD')
+
+        result = expire_comp_offs(as_of)
+
+        if result['expired']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Expired {result['expired']} comp off(s) ({result['days']} day(s)) "
+                f"for {result['users']} employee(s)"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('No comp offs to expire'))
@@ -2,6 +2,9 @@ from django.db import models
 from django.conf import settings
 from django.utils import timezone
 from datetime import time, timedelta, datetime
+from decimal import Decimal
+
+from config.versions import VersionedQuerySet
 
 # Default Office Configuration (used when employee has no shift assigned)
 DEFAULT_OFFICE_START = time(10, 0)   # 10:00 AM
@@ -16,6 +19,22 @@ HALF_DAY_MIN_HOURS = 4           # Minimum 4 hours for half day
 HALF_DAY_MAX_HOURS = 6           # Less than 6 hours = half day
 
 
+def compute_working_hours(punch_in, punch_out, policy):
+    """
+    Hours between punches minus the shift break when the two overlap.
+    Break times are office (IST) wall-clock times, so the punches are
+    compared in local time, not as stored (UTC).
+    """
+    if not punch_in or not punch_out:
+        return Decimal('0')
+    total_hours = (punch_out - punch_in).total_seconds() / 3600
+    punch_in_time = timezone.localtime(punch_in).time()
+    punch_out_time = timezone.localtime(punch_out).time()
+    if punch_in_time < policy['break_end'] and punch_out_time > policy['break_start']:
+        total_hours -= policy['break_duration']
+    return Decimal(str(round(max(0, total_hours), 2)))
+
+
 class Shift(models.Model):
     """
     Shift model for different employee timings
@@ -34,6 +53,8 @@ class Shift(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = VersionedQuerySet.as_manager()
+
     class Meta:
         db_table = 'shifts'
         ordering = ['start_time']
@@ -82,6 +103,8 @@ class CompOff(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = VersionedQuerySet.as_manager()
+
     class Meta:
         db_table = 'comp_offs'
         ordering = ['-earned_date']
@@ -144,6 +167,8 @@ class Attendance(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = VersionedQuerySet.as_manager()
+
     class Meta:
         db_table = 'attendance'
         unique_together = ('user', 'date')
@@ -180,25 +205,7 @@ class Attendance(models.Model):
         Calculate working hours with break deduction based on employee's shift.
         """
         if self.punch_in and self.punch_out:
-            delta = self.punch_out - self.punch_in
-            total_hours = delta.total_seconds() / 3600
-
-            # Get user's shift settings
-            shift = self.get_user_shift()
-            break_start = shift['break_start']
-            break_end = shift['break_end']
-            break_duration = shift['break_duration']
-
-            # Deduct break time if worked through break period
-            punch_in_time = self.punch_in.time()
-            punch_out_time = self.punch_out.time()
-
-            # Check if work period overlaps with break time
-            if punch_in_time < break_end and punch_out_time > break_start:
-                # There is overlap, deduct break time
-                total_hours -= break_duration
-
-            self.working_hours = round(max(0, total_hours), 2)
+            self.working_hours = compute_working_hours(self.punch_in, self.punch_out, self.get_user_shift())
             return self.working_hours
         return 0
 
@@ -379,6 +386,8 @@ class OfficeLocation(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = VersionedQuerySet.as_manager()
+
     class Meta:
         db_table = 'office_locations'
 
@@ -0,0 +1,161 @@
+"""
+Concurrency helpers for punch in/out.
+
+Mobile clients double tap and retry on flaky networks, so two punch
+requests for the same employee and day can arrive together:
+
+- lock_today_attendance() makes sure the (user, date) row exists with an
+  INSERT ... ON CONFLICT DO NOTHING and then locks it, so concurrent
+  punches are serialised on that row instead of racing to an
+  IntegrityError or running the leave adjustment twice
+- punch_in_user() is the punch-in itself (row lock, leave adjustment,
+  counters and events), shared by the employee app and the kiosk
+- idempotent() replays the stored response when a client retries with the
+  same Idempotency-Key header, and answers 409 while the first request
+  with that key is still running
+"""
+from functools import wraps
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from config.cache import Namespace
+from .models import Attendance
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_IDEMPOTENCY_KEY_LENGTH = 100
+
+# How long a response is replayed for a retried key
+IDEMPOTENCY_TIMEOUT = 60 * 10
+# Ceiling on the in-flight marker in case a worker dies mid-request
+IN_FLIGHT_TIMEOUT = 30
+
+# Shared tier only: the in-flight marker must be seen by every worker
+idempotency_cache = Namespace('idempotency', ttl=IDEMPOTENCY_TIMEOUT, l1_ttl=0, versioned=False)
+
+
+def lock_today_attendance(user, day):
+    """
+    Create the attendance row for (user, day) if missing and lock it.
+
+    Must be called inside transaction.atomic(). A row inserted here has no
+    punches and the default 'present' status.
+    """
+    Attendance.objects.bulk_create(
+        [Attendance(user=user, date=day)],
+        ignore_conflicts=True
+    )
+    return Attendance.objects.select_for_update().get(user=user, date=day)
+
+
+def punch_in_user(user, today, *, latitude=None, longitude=None, client_ip=None,
+                  is_wfh=False, face_verified=False, request=None):
+    """
+    Punch `user` in for `today`, after the caller has validated location/IP.
+
+    Returns (attendance, note): note is the leave adjustment message, or
+    (None, error) if the user already punched in today.
+    """
+    from leaves.models import LeaveRequest
+
+    # Python weekday(): Monday=0, Sunday=6 (matches our model)
+    is_off_day = (today.weekday() == user.weekly_off)
+
+    # The row for today is created if missing and locked, so a double tap
+    # waits here and then sees the first punch instead of racing it
+    with transaction.atomic():
+        attendance = lock_today_attendance(user, today)
+
+        if attendance.punch_in:
+            return None, "Already punched in today"
+        previous_status = attendance.status
+
+        # AUTO LEAVE CANCEL: Check if employee has approved leave for today
+        leave_cancelled_msg = ""
+        approved_leave = LeaveRequest.objects.filter(
+            user=user,
+            status='approved',
+            start_date__lte=today,
+            end_date__gte=today
+        ).first()
+
+        if approved_leave:
+            # Employee has approved leave but came to office - take today out
+            # of the leave (cancel, shrink or split); longer leaves are
+            # adjusted after the punch commits
+            from leaves.adjust_utils import adjust_leave_for_punch_in
+            leave_cancelled_msg = adjust_leave_for_punch_in(approved_leave, today)
+            if attendance.status == 'on_leave':
+                attendance.status = 'present'
+
+        attendance.punch_in = timezone.now()
+        attendance.punch_in_latitude = latitude
+        attendance.punch_in_longitude = longitude
+        attendance.punch_in_ip = client_ip
+        attendance.is_off_day = is_off_day
+        attendance.is_wfh = is_wfh
+        attendance.face_verified = face_verified
+        attendance.save()
+
+    from accounts.activity_utils import log_punch_in
+    from accounts.dashboard_utils import record_punch_in
+    from .board_utils import invalidate_today_board, punch_event_data
+    from .live_utils import publish_attendance_event
+    record_punch_in(previous_status)
+    invalidate_today_board(today)
+    publish_attendance_event('punch_in', punch_event_data(user, attendance, 'punch_in'))
+
+    # Log activity
+    try:
+        log_punch_in(user, attendance, request)
+    except Exception:
+        pass  # Don't fail punch in if logging fails
+
+    return attendance, leave_cancelled_msg
+
+
+def _idempotency_cache_key(request, key):
+    return f'{request.user.pk}:{request.path}:{key}'
+
+
+def idempotent(view_method):
+    """Replay responses of an APIView method for retries with the same Idempotency-Key"""
+    @wraps(view_method)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.META.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(view, request, *args, **kwargs)
+        if len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+            return Response(
+                {"error": f"Idempotency-Key can't be longer than {MAX_IDEMPOTENCY_KEY_LENGTH} characters"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        cache_key = _idempotency_cache_key(request, key)
+        stored = idempotency_cache.get(cache_key)
+        if stored is not None:
+            return Response(
+                stored['data'], status=stored['status'],
+                headers={'Idempotent-Replayed': 'true'}
+            )
+
+        in_flight_key = f'{cache_key}:in_flight'
+        if not idempotency_cache.add(in_flight_key, True, IN_FLIGHT_TIMEOUT):
+            return Response(
+                {"error": "A request with this Idempotency-Key is still being processed"},
+                status=status.HTTP_409_CONFLICT
+            )
+        try:
+            response = view_method(view, request, *args, **kwargs)
+            # Server errors aren't stored so the retry gets another go
+            if response.status_code < 500:
+                idempotency_cache.set(
+                    cache_key,
+                    {'status': response.status_code, 'data': response.data}
+                )
+        finally:
+            idempotency_cache.delete(in_flight_key)
+        return response
+    return wrapper
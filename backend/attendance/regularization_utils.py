@@ -0,0 +1,207 @@
+"""
+Regularization review helpers.
+
+RegularizationBulkReview approves or rejects any number of regularization
+requests in one transaction. On approval the attendance side effects are
+applied per batch:
+
+- every target attendance row is loaded with one query
+- punch times, working hours and status are recomputed in memory using
+  the cached shift policies (see shift_utils)
+- new rows are written with one bulk_create, changed rows with one
+  bulk_update
+- comp-offs for off-day/holiday work are credited with one bulk_create
+
+The single-request review endpoint goes through the same path.
+"""
+from datetime import datetime
+
+import pytz
+from django.db.models import Q
+from django.utils import timezone
+
+from accounts.review_utils import BulkReviewEngine
+
+from .models import (
+    Attendance, CompOff, RegularizationRequest,
+    HALF_DAY_MAX_HOURS, HALF_DAY_MIN_HOURS, compute_working_hours,
+)
+from .shift_utils import get_shift_policies, get_shift_policy
+
+IST = pytz.timezone('Asia/Kolkata')
+
+ATTENDANCE_UPDATE_FIELDS = [
+    'punch_in', 'punch_out', 'working_hours', 'status', 'is_off_day',
+    'is_auto_punch_out', 'notes', 'updated_at',
+]
+
+
+def future_punch_error(regularization, current_time):
+    """Error message if a request for today asks for a punch time still to come"""
+    for label, requested in (
+        ('punch in', regularization.requested_punch_in),
+        ('punch out', regularization.requested_punch_out),
+    ):
+        if requested and requested > current_time:
+            return (
+                f"Cannot set {label} time ({requested.strftime('%I:%M %p')}) in the future. "
+                f"Current time is {current_time.strftime('%I:%M %p')}. "
+                "Please wait until that time has passed."
+            )
+    return None
+
+
+def apply_regularizations(regularizations):
+    """
+    Write the requested punch times to attendance for approved requests.
+
+    Requests are applied in id order, so a later request for the same
+    employee and day wins for the punch it sets. Returns the dates touched.
+    """
+    if not regularizations:
+        return []
+
+    users = {}
+    for regularization in regularizations:
+        users[regularization.user_id] = regularization.user
+    dates = {regularization.date for regularization in regularizations}
+
+    rows = {
+        (attendance.user_id, attendance.date): attendance
+        for attendance in Attendance.objects.filter(user_id__in=users, date__in=dates)
+    }
+    existing = set(rows)
+
+    for regularization in sorted(regularizations, key=lambda r: r.id):
+        key = (regularization.user_id, regularization.date)
+        attendance = rows.get(key)
+        if attendance is None:
+            attendance = rows[key] = Attendance(
+                user_id=regularization.user_id, date=regularization.date
+            )
+        if regularization.requested_punch_in:
+            attendance.punch_in = IST.localize(
+                datetime.combine(regularization.date, regularization.requested_punch_in)
+            )
+        if regularization.requested_punch_out:
+            attendance.punch_out = IST.localize(
+                datetime.combine(regularization.date, regularization.requested_punch_out)
+            )
+        # Regularized rows are always present and no longer auto punched out
+        attendance.status = 'present'
+        attendance.is_auto_punch_out = False
+        attendance.notes = f"Regularized: {regularization.request_type}"
+
+    completed = [attendance for attendance in rows.values() if attendance.punch_in and attendance.punch_out]
+    policies = get_shift_policies()
+    for attendance in completed:
+        policy = get_shift_policy(users[attendance.user_id].shift_id, policies)
+        attendance.working_hours = compute_working_hours(attendance.punch_in, attendance.punch_out, policy)
+
+    off_day_work = find_off_day_work(
+        completed, {user_id: user.weekly_off for user_id, user in users.items()}
+    )
+
+    now = timezone.now()
+    for attendance in rows.values():
+        attendance.updated_at = now
+
+    new_rows = [attendance for key, attendance in rows.items() if key not in existing]
+    if new_rows:
+        Attendance.objects.bulk_create(new_rows)
+    changed = [attendance for key, attendance in rows.items() if key in existing]
+    if changed:
+        Attendance.objects.bulk_update(changed, ATTENDANCE_UPDATE_FIELDS)
+
+    credit_comp_offs(off_day_work)
+    return sorted(dates)
+
+
+def find_off_day_work(completed, weekly_offs):
+    """
+    {(user_id, date): (attendance, is_weekly_off)} for completed rows worked
+    on the employee's weekly off or a holiday long enough to earn a
+    comp-off (one holiday query). Those rows are marked is_off_day.
+    """
+    from leaves.models import Holiday
+
+    if not completed:
+        return {}
+    holidays = set(
+        Holiday.objects.filter(date__in={a.date for a in completed}).values_list('date', flat=True)
+    )
+    off_day_work = {}
+    for attendance in completed:
+        is_weekly_off = attendance.date.weekday() == weekly_offs.get(attendance.user_id)
+        if (is_weekly_off or attendance.date in holidays) and attendance.working_hours >= HALF_DAY_MIN_HOURS:
+            attendance.is_off_day = True
+            off_day_work[(attendance.user_id, attendance.date)] = (attendance, is_weekly_off)
+    return off_day_work
+
+
+def credit_comp_offs(off_day_work):
+    """Credit comp-offs for {(user_id, date): (attendance, is_weekly_off)} not already credited"""
+    if not off_day_work:
+        return
+    match = Q()
+    for user_id, day in off_day_work:
+        match |= Q(user_id=user_id, earned_date=day)
+    credited = set(
+        CompOff.objects.filter(match, status='earned').values_list('user_id', 'earned_date')
+    )
+    comp_offs = []
+    for key, (attendance, is_weekly_off) in off_day_work.items():
+        if key in credited:
+            continue
+        comp_off = CompOff(
+            user_id=attendance.user_id,
+            earned_date=attendance.date,
+            earned_hours=attendance.working_hours,
+            credit_days=1.0 if attendance.working_hours >= HALF_DAY_MAX_HOURS else 0.5,
+            reason="Weekly Off Work" if is_weekly_off else "Holiday Work",
+            attendance=attendance,
+        )
+        # bulk_create skips save(), which sets the expiry
+        comp_off.expires_on = comp_off.earned_date.replace(month=12, day=31)
+        comp_offs.append(comp_off)
+    CompOff.objects.bulk_create(comp_offs)
+
+
+class RegularizationBulkReview(BulkReviewEngine):
+    """Approve/reject regularization requests with batched attendance recomputation"""
+    model = RegularizationRequest
+    related = ('user',)
+    # Regularization status emails stay disabled (they caused worker
+    # timeouts); employees get the in-app notification only
+    email_function = None
+
+    def pending(self, ids):
+        queryset = super().pending(ids)
+        if self.new_status == 'approved':
+            # Requests for today can't set a punch time that hasn't happened yet
+            from accounts.dashboard_utils import get_india_date
+            current_time = datetime.now(tz=IST).time()
+            queryset = queryset.exclude(
+                Q(requested_punch_in__gt=current_time) | Q(requested_punch_out__gt=current_time),
+                date=get_india_date(),
+            )
+        return queryset
+
+    def apply_batch(self, objects):
+        from accounts.dashboard_utils import get_india_date, invalidate_dashboard_stats
+        from .board_utils import invalidate_today_board
+
+        if self.new_status == 'approved':
+            dates = apply_regularizations(objects)
+            for day in dates:
+                invalidate_dashboard_stats(day)
+            if get_india_date() in dates:
+                invalidate_today_board()
+
+    def notification(self, obj):
+        from accounts.utils import regularization_status_notification
+        return regularization_status_notification(obj, self.new_status, commit=False)
+
+    def activity_log(self, obj):
+        from accounts.activity_utils import log_regularization_reviewed
+        return log_regularization_reviewed(self.reviewer, obj, self.new_status, commit=False)
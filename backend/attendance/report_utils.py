@@ -0,0 +1,48 @@
+"""
+Cached monthly reports.
+
+The admin attendance report, the leave balance list and the CSV/Excel/PDF
+exports are expensive and tend to be opened by several admins at once at
+month-end. Views build them through cached_report(), which goes through
+config.single_flight: one request computes a report while concurrent
+identical ones wait for its result, and an expired report is served stale
+while it is refreshed in the background.
+
+Keys are built from the report kind, year, month and any filters with
+report_key(). Each report passes the config.versions domains it is built
+from, so any write to that data (a punch, a regularization, an admin
+edit) makes the cached copy outdated and it is recomputed on the next
+request instead of being served until REPORT_CACHE_TTL. Monthly reports
+also pass their month: attendance has month counters, so only writes to
+attendance dated in that month count, and a closed month stays cached
+(and served stale while refreshed) while today's punches come in.
+"""
+from django.conf import settings
+
+from config.cache import Namespace
+from config.single_flight import single_flight
+from config.versions import version_tag
+
+# Reports are large and read rarely per worker: keep them in L2 only
+report_cache = Namespace('reports', ttl=None, l1_ttl=0, versioned=False)
+
+ATTENDANCE_REPORT_DOMAINS = ('attendance', 'users')
+
+
+def report_key(kind, year, month=None, **filters):
+    """Cache key for a report of `kind` for year/month and filters"""
+    parts = [kind, year, month] + [f'{name}={value}' for name, value in sorted(filters.items())]
+    return ':'.join(str(part) for part in parts)
+
+
+def cached_report(key, build, domains=(), month=None):
+    """
+    build() for this report key, computed once for all concurrent callers.
+    month is the report's (year, month), if it covers one.
+    """
+    return single_flight(
+        report_cache, key, build,
+        ttl=settings.REPORT_CACHE_TTL,
+        stale_ttl=settings.REPORT_CACHE_STALE_TTL,
+        tag=version_tag(domains, month=month) if domains else None,
+    )
@@ -52,10 +52,36 @@ class AttendanceDetailSerializer(serializers.ModelSerializer):
         ]
 
 
+def parse_live_descriptor(value):
+    """Float32 vector for a live descriptor sent by the app or kiosk"""
+    if value is None:
+        return None
+    from accounts.face_utils import parse_descriptor
+    try:
+        return parse_descriptor(value)
+    except ValueError as e:
+        raise serializers.ValidationError(str(e))
+
+
 class PunchInSerializer(serializers.Serializer):
     latitude = serializers.FloatField(required=False, allow_null=True)
     longitude = serializers.FloatField(required=False, allow_null=True)
     face_verified = serializers.BooleanField(required=False, default=False)
+    # Live 128-d descriptor for server-side verification (list of floats)
+    face_descriptor = serializers.JSONField(required=False, allow_null=True)
+
+    def validate_face_descriptor(self, value):
+        return parse_live_descriptor(value)
+
+
+class KioskPunchInSerializer(serializers.Serializer):
+    face_descriptor = serializers.JSONField()
+
+    def validate_face_descriptor(self, value):
+        vector = parse_live_descriptor(value)
+        if vector is None:
+            raise serializers.ValidationError("This field may not be null.")
+        return vector
 
 
 class PunchOutSerializer(serializers.Serializer):
@@ -0,0 +1,66 @@
+"""
+Cached shift policies.
+
+Shifts change rarely but are read on every board refresh and punch, so
+their timings are kept in the cache as plain dicts keyed by shift id.
+The cache key embeds the 'shifts' data version (config.versions), which
+moves whenever a Shift is written, so an entry is never stale and L1 can
+hold it for the whole window.
+"""
+from config.cache import Namespace
+from config.versions import cached
+
+from .models import (
+    Shift, DEFAULT_OFFICE_START, DEFAULT_OFFICE_END,
+    DEFAULT_BREAK_START, DEFAULT_BREAK_END, DEFAULT_BREAK_DURATION
+)
+
+SHIFT_POLICIES_CACHE_TIMEOUT = 60 * 60
+
+shift_cache = Namespace(
+    'shift_policies', ttl=SHIFT_POLICIES_CACHE_TIMEOUT, l1_ttl=SHIFT_POLICIES_CACHE_TIMEOUT, versioned=False
+)
+
+# Policy used when an employee has no shift assigned
+DEFAULT_SHIFT_POLICY = {
+    'id': None,
+    'name': None,
+    'start_time': DEFAULT_OFFICE_START,
+    'end_time': DEFAULT_OFFICE_END,
+    'break_start': DEFAULT_BREAK_START,
+    'break_end': DEFAULT_BREAK_END,
+    'break_duration': float(DEFAULT_BREAK_DURATION),
+    'grace_minutes': 10,
+}
+
+
+def build_shift_policy(shift):
+    """Plain dict of the timings used for attendance math"""
+    return {
+        'id': shift.id,
+        'name': shift.name,
+        'start_time': shift.start_time,
+        'end_time': shift.end_time,
+        'break_start': shift.break_start,
+        'break_end': shift.break_end,
+        'break_duration': float(shift.break_duration_hours),
+        'grace_minutes': shift.grace_period_minutes,
+    }
+
+
+def get_shift_policies():
+    """Return {shift_id: policy} for all shifts, loading once per shifts version"""
+    return cached(
+        shift_cache, 'all',
+        lambda: {shift.id: build_shift_policy(shift) for shift in Shift.objects.all()},
+        ['shifts'],
+    )
+
+
+def get_shift_policy(shift_id, policies=None):
+    """Policy for a shift id, falling back to the default office timings"""
+    if shift_id is None:
+        return DEFAULT_SHIFT_POLICY
+    if policies is None:
+        policies = get_shift_policies()
+    return policies.get(shift_id, DEFAULT_SHIFT_POLICY)
@@ -1,9 +1,10 @@
 """
 Signals for Attendance app - sends email and in-app notifications when regularization status changes
 """
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.dispatch import receiver
-from .models import RegularizationRequest
+from .models import Attendance, CompOff, OfficeLocation, RegularizationRequest, Shift
+from config.versions import bump, track_model
 from accounts.email_utils import send_regularization_status_email
 from accounts.utils import create_notification
 
@@ -52,3 +53,32 @@ def send_regularization_status_change_notification(sender, instance, created, **
             #     current_status,
             #     instance.review_remarks or ''
             # )
+
+
+# Cached shift policies and comp-off balances are keyed by these versions
+track_model(Shift, 'shifts')
+track_model(OfficeLocation, 'offices')
+track_model(CompOff, 'comp_offs', user_field='user')
+# Month counters: monthly reports only recompute when their month changes
+track_model(Attendance, 'attendance', user_field='user', date_field='date')
+
+
+@receiver(post_save, sender=Shift)
+@receiver(post_delete, sender=Shift)
+def invalidate_shift_caches(sender, instance, **kwargs):
+    """Drop the cached board, which shows shift timings"""
+    from .board_utils import invalidate_today_board
+    invalidate_today_board()
+
+
+@receiver(pre_delete, sender=Shift)
+def bump_users_of_deleted_shift(sender, instance, **kwargs):
+    """
+    Deleting a shift clears users.shift_id through the delete collector,
+    which sends no user signals; move the versions of the users on it so
+    tokens and caches stop serving the old shift_id.
+    """
+    from accounts.models import User
+    user_ids = list(User.objects.filter(shift=instance).values_list('id', flat=True))
+    if user_ids:
+        bump('users', *user_ids)
@@ -1,3 +1,386 @@
-from django.test import TestCase
+import asyncio
+from datetime import date, datetime, time
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from accounts.models import User
+from config.cache import clear_all
+from config.testing import BudgetedAPITestCase, query_count
+from leaves.models import LeaveRequest, LeaveType
+from . import live_utils
+from .live_utils import AttendanceEventBroker, EventRelay, append_event, redeem_stream_ticket
+from .models import Attendance, CompOff, RegularizationRequest
+from .views import AdminBulkAttendanceView, BulkRegularizationReviewView, PunchInView, PunchOutView
+
+# A Sunday, the default weekly off
+SUNDAY = date(2026, 3, 1)
+MONDAY = date(2026, 3, 2)
+
+
+def at(day, hour, minute=0):
+    return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+
+def make_admin():
+    return User.objects.create_user(mobile='9000000000', name='Admin', role='admin', is_admin=True)
+
+
+def make_employee(mobile, name='Employee'):
+    return User.objects.create_user(mobile=mobile, name=name)
+
+
+class WorkingHoursTests(TestCase):
+    def setUp(self):
+        self.employee = make_employee('9000000401')
+
+    def test_break_is_deducted_in_office_time(self):
+        # 10:00-16:30 IST overlaps the 14:00-15:00 default break; in UTC
+        # (04:30-11:00) it wouldn't
+        attendance = Attendance.objects.create(
+            user=self.employee, date=MONDAY, punch_in=at(MONDAY, 10), punch_out=at(MONDAY, 16, 30)
+        )
+        attendance.refresh_from_db()
+        self.assertEqual((attendance.working_hours, attendance.status), (Decimal('5.5'), 'half_day'))
+
+    def test_no_break_outside_it(self):
+        attendance = Attendance.objects.create(
+            user=self.employee, date=MONDAY, punch_in=at(MONDAY, 7), punch_out=at(MONDAY, 13, 30)
+        )
+        self.assertEqual(attendance.working_hours, Decimal('6.5'))
+
+
+class PunchTests(BudgetedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.employee = make_employee('9000000501')
+        self.login(self.employee)
+
+    def test_punch_in_and_out(self):
+        response = self.call('post', '/api/attendance/punch-in/', {})
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertWithinBudget(response, PunchInView)
+        self.assertEqual(response.data['message'], "Punch in successful")
+        self.assertIsNotNone(response.data['data']['punch_in'])
+
+        response = self.call('post', '/api/attendance/punch-in/', {})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], "Already punched in today")
+
+        response = self.call('post', '/api/attendance/punch-out/', {})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertWithinBudget(response, PunchOutView)
+        self.assertIsNotNone(response.data['data']['punch_out'])
+        self.assertEqual(Attendance.objects.filter(user=self.employee).count(), 1)
+
+    def test_punch_out_needs_a_punch_in(self):
+        response = self.call('post', '/api/attendance/punch-out/', {})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], "You haven't punched in today")
+
+    def test_retry_with_the_same_idempotency_key_is_replayed(self):
+        first = self.call('post', '/api/attendance/punch-in/', {}, HTTP_IDEMPOTENCY_KEY='tap-1')
+        retry = self.call('post', '/api/attendance/punch-in/', {}, HTTP_IDEMPOTENCY_KEY='tap-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(Attendance.objects.filter(user=self.employee).count(), 1)
+
+        # A new key is a new punch
+        other = self.call('post', '/api/attendance/punch-in/', {}, HTTP_IDEMPOTENCY_KEY='tap-2')
+        self.assertEqual(other.status_code, 400)
+
+    def test_oversized_idempotency_key_is_rejected(self):
+        response = self.call('post', '/api/attendance/punch-in/', {}, HTTP_IDEMPOTENCY_KEY='k' * 101)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Attendance.objects.exists())
+
+
+class BulkRegularizationReviewTests(BudgetedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = make_admin()
+        self.employees = [make_employee(f'900000060{index}', f'Employee {index}') for index in range(2)]
+        self.requests = [
+            RegularizationRequest.objects.create(
+                user=employee, date=SUNDAY, request_type='forgot_punch',
+                requested_punch_in=time(9, 0), requested_punch_out=time(18, 0), reason='Release day',
+            )
+            for employee in self.employees
+        ]
+        self.login(self.admin)
+
+    def review(self, ids, new_status='approved'):
+        return self.call('post', '/api/attendance/regularization/bulk-review/', {
+            'regularization_ids': ids, 'status': new_status,
+        })
+
+    def test_approval_writes_attendance_and_credits_comp_offs(self):
+        response = self.review([regularization.id for regularization in self.requests])
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertWithinBudget(response, BulkRegularizationReviewView)
+        self.assertEqual(response.data['updated_count'], 2)
+        self.assertEqual(response.data['skipped_ids'], [])
+        for employee in self.employees:
+            attendance = Attendance.objects.get(user=employee, date=SUNDAY)
+            self.assertEqual(attendance.punch_in, at(SUNDAY, 9))
+            self.assertTrue(attendance.is_off_day)
+            self.assertEqual(CompOff.objects.filter(user=employee, earned_date=SUNDAY, status='earned').count(), 1)
+        # Bulk reviews don't send emails
+        self.assertEqual(mail.outbox, [])
+
+    def test_skipped_ids_are_the_validated_ids(self):
+        reviewed, already_rejected = self.requests
+        RegularizationRequest.objects.filter(pk=already_rejected.pk).update(status='rejected')
+
+        response = self.review([str(reviewed.id), already_rejected.id], 'rejected')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['skipped_ids'], [already_rejected.id])
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_malformed_ids_are_rejected(self):
+        self.assertEqual(self.review('all').status_code, 400)
+        self.assertEqual(self.review([]).status_code, 400)
+
+
+class AdminBulkAttendanceTests(BudgetedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = make_admin()
+        self.employees = [make_employee(f'900000070{index}', f'Employee {index}') for index in range(3)]
+        self.login(self.admin)
+
+    def bulk(self, data):
+        return self.call('post', '/api/attendance/admin/bulk-update/', data)
+
+    def test_marks_employees_absent(self):
+        response = self.bulk({
+            'date': str(MONDAY), 'user_ids': [employee.id for employee in self.employees], 'status': 'absent',
+        })
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertWithinBudget(response, AdminBulkAttendanceView)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(Attendance.objects.filter(date=MONDAY, status='absent').count(), 3)
+
+    def test_present_follows_the_punched_hours(self):
+        short_day, off_day = self.employees[:2]
+        Attendance.objects.create(user=short_day, date=MONDAY, punch_in=at(MONDAY, 9), punch_out=at(MONDAY, 12))
+        Attendance.objects.create(user=off_day, date=SUNDAY, punch_in=at(SUNDAY, 9), punch_out=at(SUNDAY, 18))
+        Attendance.objects.filter(user=off_day).update(status='absent', is_off_day=False)
+        CompOff.objects.all().delete()
+
+        response = self.bulk({'entries': [
+            {'date': str(MONDAY), 'user_ids': [short_day.id], 'status': 'present'},
+            {'date': str(SUNDAY), 'user_ids': [off_day.id], 'status': 'present'},
+        ]})
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertWithinBudget(response, AdminBulkAttendanceView)
+        short = Attendance.objects.get(user=short_day, date=MONDAY)
+        self.assertEqual((short.status, short.working_hours), ('absent', Decimal('3')))
+        worked = Attendance.objects.get(user=off_day, date=SUNDAY)
+        self.assertEqual(worked.status, 'present')
+        self.assertTrue(worked.is_off_day)
+        self.assertEqual(CompOff.objects.filter(user=off_day, earned_date=SUNDAY).count(), 1)
+
+    def test_keeps_the_hours_of_a_row_punched_through_the_api(self):
+        employee = self.employees[0]
+        self.login(employee)
+        for path, moment in (('punch-in', at(MONDAY, 10)), ('punch-out', at(MONDAY, 16, 30))):
+            with mock.patch('django.utils.timezone.now', return_value=moment):
+                response = self.call('post', f'/api/attendance/{path}/', {})
+            self.assertIn(response.status_code, (200, 201), response.data)
+        punched = Attendance.objects.get(user=employee, date=MONDAY)
+        self.assertEqual((punched.working_hours, punched.status), (Decimal('5.5'), 'half_day'))
+
+        self.login(self.admin)
+        response = self.bulk({'date': str(MONDAY), 'user_ids': [employee.id], 'status': 'present'})
+
+        self.assertEqual(response.status_code, 200, response.data)
+        updated = Attendance.objects.get(user=employee, date=MONDAY)
+        self.assertEqual((updated.working_hours, updated.status), (Decimal('5.5'), 'half_day'))
+        self.assertEqual((updated.punch_in, updated.punch_out), (punched.punch_in, punched.punch_out))
+
+    def test_rejects_bad_payloads(self):
+        response = self.bulk({'date': str(MONDAY), 'user_ids': [self.employees[0].id], 'status': 'holiday'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Attendance.objects.exists())
+
+
+class AttendanceReportTests(BudgetedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = make_admin()
+        self.employee = make_employee('9000000801', 'Asha')
+        Attendance.objects.create(
+            user=self.employee, date=MONDAY, punch_in=at(MONDAY, 9), punch_out=at(MONDAY, 18)
+        )
+        self.login(self.admin)
+
+    def report(self):
+        return self.call('get', '/api/attendance/report/', {'month': 3, 'year': 2026})
+
+    def test_report_is_cached_and_invalidated_by_attendance_writes(self):
+        response = self.report()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['user_name'], 'Asha')
+        self.assertEqual(response.data[0]['total_present'], 1)
+
+        cached = self.report()
+        self.assertLess(query_count(cached), query_count(response))
+        self.assertEqual(cached.data, response.data)
+
+        Attendance.objects.create(user=self.employee, date=date(2026, 3, 3), status='absent')
+
+        response = self.report()
+        self.assertEqual((response.data[0]['total_present'], response.data[0]['total_absent']), (1, 1))
+
+    def test_writes_to_other_months_keep_the_report_cached(self):
+        self.report()
+        Attendance.objects.create(user=self.employee, date=date(2026, 4, 1), status='absent')
+        Attendance.objects.filter(user=self.employee, date=date(2026, 4, 1)).delete()
+
+        cached = self.report()
+        self.assertEqual(query_count(cached), 0)
+        self.assertEqual(cached.data[0]['total_absent'], 0)
+
+        # An update() can't tell which months it touched
+        Attendance.objects.filter(user=self.employee).update(notes='Checked')
+        self.assertGreater(query_count(self.report()), 0)
+
+    def test_exports(self):
+        for path, content_type in (
+            ('/api/attendance/export/', 'text/csv'),
+            ('/api/attendance/export/excel/', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+            ('/api/attendance/export/pdf/', 'application/pdf'),
+        ):
+            response = self.call('get', path, {'month': 3, 'year': 2026})
+            self.assertEqual(response.status_code, 200, path)
+            self.assertTrue(response['Content-Type'].startswith(content_type), path)
+        csv_rows = self.call('get', '/api/attendance/export/', {'month': 3, 'year': 2026}).content.decode()
+        self.assertIn('Asha', csv_rows)
+
+    def test_employees_are_forbidden(self):
+        self.login(self.employee)
+        self.assertEqual(self.report().status_code, 403)
+
+
+class ReduceLOPTests(BudgetedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.employee = make_employee('9000000901')
+        leave_type = LeaveType.objects.create(name='Casual Leave', code='CL')
+        self.leave = LeaveRequest.objects.create(
+            user=self.employee, leave_type=leave_type, start_date=MONDAY, end_date=MONDAY,
+            total_days=1, lop_days=Decimal('0.5'), paid_days=Decimal('0.5'), reason='Fever', status='approved',
+        )
+        self.comp_off = CompOff.objects.create(
+            user=self.employee, earned_date=SUNDAY, credit_days=1, expires_on=timezone.localdate().replace(year=2099)
+        )
+        self.login(self.employee)
+
+    def test_partly_used_comp_off_is_split(self):
+        response = self.call('post', '/api/attendance/comp-off/reduce-lop/', {
+            'leave_request_id': self.leave.id, 'comp_off_id': self.comp_off.id,
+        })
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['leave_request']['new_lop_days'], 0)
+        self.leave.refresh_from_db()
+        self.assertEqual((self.leave.lop_days, self.leave.comp_off_days), (0, Decimal('0.5')))
+        self.comp_off.refresh_from_db()
+        self.assertEqual((self.comp_off.status, self.comp_off.credit_days), ('used', Decimal('0.5')))
+        remainder = CompOff.objects.get(user=self.employee, status='earned')
+        self.assertEqual((remainder.credit_days, remainder.earned_date), (Decimal('0.5'), SUNDAY))
+        self.assertEqual(remainder.expires_on, self.comp_off.expires_on)
+
+    def test_unknown_comp_off_leaves_the_lop(self):
+        response = self.call('post', '/api/attendance/comp-off/reduce-lop/', {
+            'leave_request_id': self.leave.id, 'comp_off_id': self.comp_off.id + 100,
+        })
+
+        self.assertEqual(response.status_code, 404)
+        self.leave.refresh_from_db()
+        self.assertEqual(self.leave.lop_days, Decimal('0.5'))
+
+
+class EventRelayTests(SimpleTestCase):
+    def setUp(self):
+        clear_all()
+        self.broker = AttendanceEventBroker()
+        self.relay = EventRelay(self.broker)
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def published(self, after=0):
+        subscription, backlog = self.broker.subscribe(self.loop, after)
+        self.broker.unsubscribe(subscription)
+        return backlog
+
+    def test_logged_events_are_relayed_in_order(self):
+        append_event('punch_in', {'id': 1})
+        append_event('punch_out', {'id': 1})
+
+        self.relay.poll()
+
+        self.assertEqual(self.published(), [(1, 'punch_in', {'id': 1}), (2, 'punch_out', {'id': 1})])
+        self.relay.poll()
+        self.assertEqual(len(self.published()), 2)
+
+    def test_missing_event_turns_into_a_resync(self):
+        first = append_event('punch_in', {'id': 1})
+        live_utils.event_log.delete(f'event:{first}')
+        append_event('punch_in', {'id': 2})
+
+        for _ in range(live_utils.MISSING_EVENT_POLLS - 1):
+            self.relay.poll()
+            self.assertEqual(self.published(), [])
+        self.relay.poll()
+        self.relay.poll()
+
+        self.assertEqual(self.published(), [(1, 'resync', {}), (2, 'punch_in', {'id': 2})])
+
+    def test_clients_resume_only_within_the_history(self):
+        append_event('punch_in', {'id': 1})
+        self.relay.poll()
+
+        self.assertEqual(self.published(after=1), [])
+        # Events from before the relay started can't be replayed
+        self.assertIsNone(self.published(after=5))
+
+
+class LiveBoardTicketTests(BudgetedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = make_admin()
+        self.employee = make_employee('9000000951')
+
+    def test_ticket_is_single_use(self):
+        self.login(self.admin)
+        response = self.call('post', '/api/attendance/live-board/ticket/')
+
+        self.assertEqual(response.status_code, 201)
+        ticket = response.data['ticket']
+        self.assertEqual(redeem_stream_ticket(ticket), self.admin.id)
+        self.assertIsNone(redeem_stream_ticket(ticket))
+        self.assertIsNone(redeem_stream_ticket('forged'))
+
+    def test_employees_get_no_ticket(self):
+        self.login(self.employee)
+        self.assertEqual(self.call('post', '/api/attendance/live-board/ticket/').status_code, 403)
+
+    def test_punches_are_logged_for_the_stream(self):
+        self.login(self.employee)
+        self.assertEqual(self.call('post', '/api/attendance/punch-in/', {}).status_code, 201)
+
+        event_id = live_utils.last_logged_event_id()
+        event_type, data = live_utils.event_log.get(f'event:{event_id}')
+        self.assertEqual((event_type, data['id']), ('punch_in', self.employee.id))
@@ -1,26 +1,29 @@
 from django.urls import path
 from .views import (
-    PunchInView, PunchOutView, TodayAttendanceView, MyAttendanceListView,
+    PunchInView, KioskPunchInView, PunchOutView, TodayAttendanceView, MyAttendanceListView,
     AllAttendanceListView, AttendanceReportView, ExportAttendanceCSVView,
     ExportAttendanceExcelView, ExportAttendancePDFView,
     OfficeLocationListView, OfficeLocationDetailView, OffDayWorkStatsView,
     RegularizationApplyView, MyRegularizationListView, AllRegularizationListView,
-    RegularizationReviewView, CancelRegularizationView,
+    RegularizationReviewView, BulkRegularizationReviewView, CancelRegularizationView,
     WFHApplyView, MyWFHListView, AllWFHListView, WFHReviewView,
-    CancelWFHView, TodayWFHStatusView, AutoPunchOutView, BulkWFHReviewView,
+    CancelWFHView, TodayWFHStatusView, AutoPunchOutView, ExpireCompOffsView, BulkWFHReviewView,
     AdminAttendanceCreateView, AdminAttendanceUpdateView,
     AdminMarkAbsentView, AdminBulkAttendanceView, AdminClearPunchOutView,
     ShiftListCreateView, ShiftDetailView, AssignShiftView,
     MyCompOffListView, AllCompOffListView, CompOffBalanceView,
     UseCompOffView, AdminCreateCompOffView, UseCompOffToReduceLOPView,
-    UseCompOffToCoverAbsentView, FixAutoPunchOutView
+    UseCompOffToCoverAbsentView, FixAutoPunchOutView, LiveBoardTicketView, live_board_stream
 )
 
 urlpatterns = [
     # Employee endpoints
     path('punch-in/', PunchInView.as_view(), name='punch-in'),
     path('punch-out/', PunchOutView.as_view(), name='punch-out'),
+    path('kiosk/punch-in/', KioskPunchInView.as_view(), name='kiosk-punch-in'),
     path('today/', TodayAttendanceView.as_view(), name='today-attendance'),
+    path('live-board/', live_board_stream, name='live-board'),
+    path('live-board/ticket/', LiveBoardTicketView.as_view(), name='live-board-ticket'),
     path('my-attendance/', MyAttendanceListView.as_view(), name='my-attendance'),
     path('off-day-stats/', OffDayWorkStatsView.as_view(), name='off-day-stats'),
 
@@ -37,6 +40,7 @@ urlpatterns = [
     path('export/pdf/', ExportAttendancePDFView.as_view(), name='export-attendance-pdf'),
     path('regularization/all/', AllRegularizationListView.as_view(), name='all-regularizations'),
     path('regularization/review/<int:pk>/', RegularizationReviewView.as_view(), name='review-regularization'),
+    path('regularization/bulk-review/', BulkRegularizationReviewView.as_view(), name='bulk-review-regularization'),
 
     # Office locations
     path('locations/', OfficeLocationListView.as_view(), name='office-locations'),
@@ -53,6 +57,7 @@ urlpatterns = [
 
     # Cron job endpoint (for external cron services like cron-job.org)
     path('cron/auto-punch-out/', AutoPunchOutView.as_view(), name='auto-punch-out'),
+    path('cron/expire-comp-offs/', ExpireCompOffsView.as_view(), name='expire-comp-offs'),
     path('admin/fix-auto-punch-out/', FixAutoPunchOutView.as_view(), name='fix-auto-punch-out'),
 
     # Admin attendance management
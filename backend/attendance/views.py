@@ -2,8 +2,10 @@ from rest_framework import status, generics, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Sum, Count, Q
 from datetime import datetime, timedelta
+from io import BytesIO, StringIO
 import csv
 import pytz
 from django.http import HttpResponse
@@ -25,24 +27,31 @@ from .serializers import (
     ShiftSerializer, ShiftCreateSerializer, CompOffSerializer, CompOffUseSerializer
 )
 from .utils import validate_location, validate_ip, get_client_ip
+from .punch_utils import idempotent, punch_in_user
+from .report_utils import ATTENDANCE_REPORT_DOMAINS, cached_report, report_key
+from .comp_off_utils import (
+    available_comp_off_days, comp_off_summary, use_comp_off
+)
 from accounts.views import IsAdminUser
 from accounts.utils import (
-    notify_regularization_applied, notify_regularization_status,
+    notify_regularization_applied,
     notify_wfh_applied, notify_wfh_status
 )
 from accounts.activity_utils import (
-    log_punch_in, log_punch_out, log_regularization_applied,
-    log_regularization_reviewed, log_attendance_edit, log_wfh_applied,
+    log_punch_out, log_regularization_applied,
+    log_attendance_edit, log_wfh_applied,
     log_wfh_reviewed, log_shift_created, log_shift_updated, log_shift_deleted,
     log_holiday_added, log_holiday_updated, log_holiday_deleted
 )
 
 
 class PunchInView(APIView):
-    def post(self, request):
-        from leaves.models import LeaveRequest, LeaveBalance
-        from django.db.models import Sum
+    # auth user + WFH + office locations + row insert/lock + leave check +
+    # update + shifts + activity log (+ a cold cache lookup, savepoints)
+    query_budget = 14
 
+    @idempotent
+    def post(self, request):
         serializer = PunchInSerializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -50,9 +59,29 @@ class PunchInView(APIView):
         latitude = serializer.validated_data.get('latitude')
         longitude = serializer.validated_data.get('longitude')
         face_verified = serializer.validated_data.get('face_verified', False)
+        live_descriptor = serializer.validated_data.get('face_descriptor')
         client_ip = get_client_ip(request)
         today = get_india_date()
 
+        # Server-side face check against the enrolled descriptor. In 'server'
+        # mode the client's face_verified flag is ignored
+        from accounts.face_utils import server_verification_required, verify_face
+        enrolled = bool(request.user.face_descriptor)
+        if server_verification_required():
+            face_verified = False
+            if enrolled and live_descriptor is None:
+                return Response(
+                    {"error": "Face verification is required to punch in"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        if enrolled and live_descriptor is not None:
+            face_verified, distance = verify_face(request.user, live_descriptor)
+            if distance is not None and not face_verified:
+                return Response(
+                    {"error": "Face not matched. Please try again."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
         # Check if user is permanent WFH or has approved WFH for today
         is_wfh = request.user.is_permanent_wfh or WFHRequest.objects.filter(
             user=request.user,
@@ -78,269 +107,101 @@ class PunchInView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-        # Check if already punched in today
-        existing = Attendance.objects.filter(
-            user=request.user, date=today
-        ).first()
-
-        if existing and existing.punch_in:
+        attendance, note = punch_in_user(
+            request.user, today,
+            latitude=latitude, longitude=longitude, client_ip=client_ip,
+            is_wfh=is_wfh, face_verified=face_verified, request=request
+        )
+        if attendance is None:
             return Response(
-                {"error": "Already punched in today"},
+                {"error": note},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Check if today is employee's weekly off day
-        # Python weekday(): Monday=0, Sunday=6 (matches our model)
-        current_weekday = today.weekday()
-        is_off_day = (current_weekday == request.user.weekly_off)
-
-        # AUTO LEAVE CANCEL: Check if employee has approved leave for today
-        leave_cancelled_msg = ""
-        approved_leave = LeaveRequest.objects.filter(
-            user=request.user,
-            status='approved',
-            start_date__lte=today,
-            end_date__gte=today
-        ).first()
-
-        if approved_leave:
-            # Employee has approved leave but came to office - handle leave adjustment
-            leave_cancelled_msg = self.handle_leave_on_punch_in(approved_leave, today)
-
-        if existing:
-            # Update existing record
-            existing.punch_in = timezone.now()
-            existing.punch_in_latitude = latitude
-            existing.punch_in_longitude = longitude
-            existing.punch_in_ip = client_ip
-            existing.is_off_day = is_off_day
-            existing.is_wfh = is_wfh
-            existing.face_verified = face_verified
-            existing.save()
-            attendance = existing
-        else:
-            # Create new record
-            attendance = Attendance.objects.create(
-                user=request.user,
-                date=today,
-                punch_in=timezone.now(),
-                punch_in_latitude=latitude,
-                punch_in_longitude=longitude,
-                punch_in_ip=client_ip,
-                is_off_day=is_off_day,
-                is_wfh=is_wfh,
-                face_verified=face_verified
-            )
-
-        # Log activity
-        try:
-            log_punch_in(request.user, attendance, request)
-        except Exception:
-            pass  # Don't fail punch in if logging fails
-
         msg = "Punch in successful (Work From Home)" if is_wfh else "Punch in successful"
-        if leave_cancelled_msg:
-            msg += f". {leave_cancelled_msg}"
+        if note:
+            msg += f". {note}"
 
         return Response({
             "message": msg,
             "data": AttendanceSerializer(attendance).data
         }, status=status.HTTP_201_CREATED)
 
-    def handle_leave_on_punch_in(self, leave_request, today):
-        """
-        Handle leave adjustment when employee punches in during approved leave.
-
-        Cases:
-        1. Single day leave (start == end == today) -> Cancel entire leave
-        2. First day of multi-day leave (start == today) -> Shrink leave (start = today + 1)
-        3. Last day of multi-day leave (end == today) -> Shrink leave (end = today - 1)
-        4. Middle day of multi-day leave -> Split into two leaves
-        """
-        from leaves.models import LeaveRequest, LeaveBalance
-        from django.db.models import Sum
-        from datetime import timedelta
-
-        start_date = leave_request.start_date
-        end_date = leave_request.end_date
 
-        # Calculate original days
-        original_total_days = float(leave_request.total_days)
-
-        if start_date == end_date == today:
-            # Case 1: Single day leave - cancel entirely
-            leave_request.status = 'cancelled'
-            leave_request.review_remarks = f"Auto-cancelled: Employee punched in on {today}"
-            leave_request.save()
-
-            # Restore leave balance
-            self.restore_leave_balance(leave_request)
-            return "Your 1 day leave has been auto-cancelled"
-
-        elif start_date == today:
-            # Case 2: First day of multi-day leave - shrink from start
-            new_start = today + timedelta(days=1)
-            new_total_days = (end_date - new_start).days + 1
-            if leave_request.is_half_day:
-                new_total_days = 0.5
-
-            # Recalculate paid/comp-off/lop for reduced days
-            self.recalculate_leave_days(leave_request, new_total_days, new_start, end_date)
-            leave_request.start_date = new_start
-            leave_request.review_remarks = f"Auto-adjusted: Employee punched in on {today}. Original: {start_date} to {end_date}"
-            leave_request.save()
+class HasKioskKey(permissions.BasePermission):
+    """Request comes from a shared kiosk device listed in KIOSK_API_KEYS"""
 
-            return f"Leave adjusted: Now {new_start} to {end_date} ({new_total_days} days)"
-
-        elif end_date == today:
-            # Case 3: Last day of multi-day leave - shrink from end
-            new_end = today - timedelta(days=1)
-            new_total_days = (new_end - start_date).days + 1
-            if leave_request.is_half_day:
-                new_total_days = 0.5
-
-            # Recalculate paid/comp-off/lop for reduced days
-            self.recalculate_leave_days(leave_request, new_total_days, start_date, new_end)
-            leave_request.end_date = new_end
-            leave_request.review_remarks = f"Auto-adjusted: Employee punched in on {today}. Original: {start_date} to {end_date}"
-            leave_request.save()
-
-            return f"Leave adjusted: Now {start_date} to {new_end} ({new_total_days} days)"
-
-        else:
-            # Case 4: Middle day - split into two leaves
-            # First part: start_date to (today - 1)
-            first_end = today - timedelta(days=1)
-            first_total_days = (first_end - start_date).days + 1
-
-            # Second part: (today + 1) to end_date
-            second_start = today + timedelta(days=1)
-            second_total_days = (end_date - second_start).days + 1
-
-            # Update original leave to first part
-            self.recalculate_leave_days(leave_request, first_total_days, start_date, first_end)
-            leave_request.end_date = first_end
-            leave_request.review_remarks = f"Auto-split: Employee punched in on {today}. Original: {start_date} to {end_date}"
-            leave_request.save()
-
-            # Create new leave for second part
-            if second_total_days > 0:
-                # Calculate days for second leave
-                second_leave = LeaveRequest.objects.create(
-                    user=leave_request.user,
-                    leave_type=leave_request.leave_type,
-                    start_date=second_start,
-                    end_date=end_date,
-                    reason=leave_request.reason,
-                    status='approved',
-                    is_half_day=False,
-                    total_days=second_total_days,
-                    comp_off_days=0,
-                    paid_days=0,
-                    lop_days=0,
-                    reviewed_by=leave_request.reviewed_by,
-                    review_remarks=f"Auto-created from split: Original leave {start_date} to {end_date}"
-                )
-                # Recalculate days for second leave
-                self.recalculate_leave_days(second_leave, second_total_days, second_start, end_date)
-                second_leave.save()
+    def has_permission(self, request, view):
+        import hmac
+        from django.conf import settings
+        key = request.META.get('HTTP_X_KIOSK_KEY', '')
+        return bool(key) and any(
+            hmac.compare_digest(key, allowed) for allowed in settings.KIOSK_API_KEYS
+        )
 
-                return f"Leave split: {start_date} to {first_end} ({first_total_days} days) + {second_start} to {end_date} ({second_total_days} days). {today} cancelled."
 
-            return f"Leave adjusted: Now {start_date} to {first_end} ({first_total_days} days)"
+class KioskPunchInView(APIView):
+    """
+    Punch-in from a shared office tablet: nobody logs in, the face is
+    identified against every enrolled employee (accounts/face_index_utils.py).
+    The device key stands in for the location and IP checks.
+    """
+    authentication_classes = []
+    permission_classes = [HasKioskKey]
 
-    def recalculate_leave_days(self, leave_request, new_total_days, new_start, new_end):
-        """
-        Recalculate comp_off_days, paid_days, and lop_days for adjusted leave.
-        Uses Smart Leave System: Comp Off first, then Paid, then LOP.
-        """
-        from leaves.models import LeaveBalance, LeaveRequest
-        from django.db.models import Sum
+    def post(self, request):
+        from django.conf import settings
+        from accounts.face_index_utils import face_index
+        from accounts.models import User
+        from .serializers import KioskPunchInSerializer
 
-        user = leave_request.user
-        leave_type = leave_request.leave_type
-        year = new_start.year
-        month = new_start.month
+        serializer = KioskPunchInSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        # Get available comp off (status='earned' means not used)
-        available_comp_off = CompOff.objects.filter(
-            user=user,
-            status='earned',
-            earned_date__lte=new_end
-        ).count()
+        user_id, distance = face_index.identify(
+            serializer.validated_data['face_descriptor'],
+            settings.FACE_IDENTIFY_THRESHOLD,
+            settings.FACE_IDENTIFY_MARGIN
+        )
+        user = User.objects.filter(pk=user_id, is_active=True).first() if user_id else None
+        if user is None:
+            return Response(
+                {"error": "Face not recognised. Please try again or use the app."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        # Get leave balance for this month
-        balance = LeaveBalance.objects.filter(
-            user=user,
-            leave_type=leave_type,
-            year=year,
-            month=month
-        ).first()
+        today = get_india_date()
+        is_wfh = False  # Kiosk punches are always from the office
+        attendance, note = punch_in_user(
+            user, today,
+            client_ip=get_client_ip(request), is_wfh=is_wfh,
+            face_verified=True, request=request
+        )
+        employee = {"id": user.id, "name": user.name}
+        if attendance is None:
+            return Response(
+                {"error": f"{user.name}: {note}", "employee": employee},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        available_paid = 0
-        if balance:
-            # Get already used paid days (excluding current leave being adjusted)
-            already_used = LeaveRequest.objects.filter(
-                user=user,
-                leave_type=leave_type,
-                status='approved',
-                start_date__year=year,
-                start_date__month=month
-            ).exclude(id=leave_request.id).aggregate(total=Sum('paid_days'))['total'] or 0
-
-            available_paid = float(balance.total_leaves) + float(balance.carried_forward) - float(already_used)
-            available_paid = max(0, available_paid)
-
-        remaining_days = float(new_total_days)
-
-        # 1. Use Comp Off first
-        comp_off_to_use = min(available_comp_off, remaining_days)
-        remaining_days -= comp_off_to_use
-
-        # 2. Use Paid leaves
-        paid_to_use = min(available_paid, remaining_days)
-        remaining_days -= paid_to_use
-
-        # 3. Remaining is LOP
-        lop_days = remaining_days
-
-        # Update leave request
-        old_comp_off = float(leave_request.comp_off_days or 0)
-
-        leave_request.total_days = new_total_days
-        leave_request.comp_off_days = comp_off_to_use
-        leave_request.paid_days = paid_to_use
-        leave_request.lop_days = lop_days
-
-        # Restore excess comp offs that were used
-        comp_off_to_restore = old_comp_off - comp_off_to_use
-        if comp_off_to_restore > 0:
-            # Mark some comp offs as earned (restore them)
-            used_comp_offs = CompOff.objects.filter(
-                user=user,
-                status='used'
-            ).order_by('-used_date')[:int(comp_off_to_restore)]
-            for co in used_comp_offs:
-                co.status = 'earned'
-                co.used_date = None
-                co.save()
-
-    def restore_leave_balance(self, leave_request):
-        """Restore leave balance when leave is cancelled"""
-        # Restore comp offs used in this leave
-        comp_off_to_restore = int(float(leave_request.comp_off_days or 0))
-        if comp_off_to_restore > 0:
-            used_comp_offs = CompOff.objects.filter(
-                user=leave_request.user,
-                status='used'
-            ).order_by('-used_date')[:comp_off_to_restore]
-            for co in used_comp_offs:
-                co.status = 'earned'
-                co.used_date = None
-                co.save()
+        msg = f"Welcome {user.name}, punch in successful"
+        if note:
+            msg += f". {note}"
+        return Response({
+            "message": msg,
+            "employee": employee,
+            "distance": round(distance, 3),
+            "data": AttendanceSerializer(attendance).data
+        }, status=status.HTTP_201_CREATED)
 
 
 class PunchOutView(APIView):
+    # auth user + WFH + office locations + row lock + shift + update +
+    # holiday check + activity log (+ savepoints)
+    query_budget = 11
+
+    @idempotent
     def post(self, request):
         serializer = PunchOutSerializer(data=request.data)
         if not serializer.is_valid():
@@ -376,28 +237,34 @@ class PunchOutView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-        # Check if punched in today
-        attendance = Attendance.objects.filter(
-            user=request.user, date=today
-        ).first()
+        # Check if punched in today (locked, so a double tap punches out once)
+        with transaction.atomic():
+            attendance = Attendance.objects.select_for_update().filter(
+                user=request.user, date=today
+            ).first()
 
-        if not attendance or not attendance.punch_in:
-            return Response(
-                {"error": "You haven't punched in today"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            if not attendance or not attendance.punch_in:
+                return Response(
+                    {"error": "You haven't punched in today"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
-        if attendance.punch_out:
-            return Response(
-                {"error": "Already punched out today"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            if attendance.punch_out:
+                return Response(
+                    {"error": "Already punched out today"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            attendance.punch_out = timezone.now()
+            attendance.punch_out_latitude = latitude
+            attendance.punch_out_longitude = longitude
+            attendance.punch_out_ip = client_ip
+            attendance.save()  # This will calculate working hours
 
-        attendance.punch_out = timezone.now()
-        attendance.punch_out_latitude = latitude
-        attendance.punch_out_longitude = longitude
-        attendance.punch_out_ip = client_ip
-        attendance.save()  # This will calculate working hours
+        from .board_utils import invalidate_today_board, punch_event_data
+        from .live_utils import publish_attendance_event
+        invalidate_today_board(today)
+        publish_attendance_event('punch_out', punch_event_data(request.user, attendance, 'punch_out'))
 
         # Log activity
         try:
@@ -479,6 +346,13 @@ class AttendanceReportView(APIView):
         month = int(request.query_params.get('month', timezone.now().month))
         year = int(request.query_params.get('year', timezone.now().year))
 
+        return Response(cached_report(
+            report_key('attendance_report', year, month), lambda: self.build(year, month),
+            domains=ATTENDANCE_REPORT_DOMAINS, month=(year, month),
+        ))
+
+    def build(self, year, month):
+        """Per-employee totals for the month"""
         from accounts.models import User
         from django.db.models import Value, DecimalField
         from django.db.models.functions import Coalesce
@@ -515,7 +389,7 @@ class AttendanceReportView(APIView):
         ).order_by('name')
 
         # Format response
-        result = [{
+        return [{
             'user_id': emp['id'],
             'user_name': emp['name'],
             'total_present': emp['total_present'],
@@ -525,8 +399,6 @@ class AttendanceReportView(APIView):
             'total_working_hours': float(emp['total_working_hours']) if emp['total_working_hours'] else 0
         } for emp in report]
 
-        return Response(result)
-
 
 class ExportAttendanceCSVView(APIView):
     permission_classes = [IsAdminUser]
@@ -535,10 +407,18 @@ class ExportAttendanceCSVView(APIView):
         month = int(request.query_params.get('month', timezone.now().month))
         year = int(request.query_params.get('year', timezone.now().year))
 
-        response = HttpResponse(content_type='text/csv')
+        content = cached_report(
+            report_key('attendance_csv', year, month), lambda: self.build(year, month),
+            domains=ATTENDANCE_REPORT_DOMAINS, month=(year, month),
+        )
+        response = HttpResponse(content, content_type='text/csv')
         response['Content-Disposition'] = f'attachment; filename="attendance_{year}_{month}.csv"'
+        return response
 
-        writer = csv.writer(response)
+    def build(self, year, month):
+        """CSV text of the month's attendance"""
+        output = StringIO()
+        writer = csv.writer(output)
         writer.writerow([
             'Employee Name', 'Date', 'Punch In', 'Punch Out',
             'Working Hours', 'Status'
@@ -558,7 +438,7 @@ class ExportAttendanceCSVView(APIView):
                 att.status
             ])
 
-        return response
+        return output.getvalue()
 
 
 class ExportAttendanceExcelView(APIView):
@@ -566,13 +446,25 @@ class ExportAttendanceExcelView(APIView):
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-        from io import BytesIO
-
         month = int(request.query_params.get('month', timezone.now().month))
         year = int(request.query_params.get('year', timezone.now().year))
 
+        content = cached_report(
+            report_key('attendance_excel', year, month), lambda: self.build(year, month),
+            domains=ATTENDANCE_REPORT_DOMAINS, month=(year, month),
+        )
+        response = HttpResponse(
+            content,
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+        response['Content-Disposition'] = f'attachment; filename="attendance_{year}_{month:02d}.xlsx"'
+        return response
+
+    def build(self, year, month):
+        """Workbook bytes of the month's attendance"""
+        from openpyxl import Workbook
+        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+
         # Create workbook
         wb = Workbook()
         ws = wb.active
@@ -619,17 +511,9 @@ class ExportAttendanceExcelView(APIView):
         ws.column_dimensions['E'].width = 15
         ws.column_dimensions['F'].width = 12
 
-        # Save to response
         buffer = BytesIO()
         wb.save(buffer)
-        buffer.seek(0)
-
-        response = HttpResponse(
-            buffer.getvalue(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = f'attachment; filename="attendance_{year}_{month:02d}.xlsx"'
-        return response
+        return buffer.getvalue()
 
 
 class ExportAttendancePDFView(APIView):
@@ -637,14 +521,23 @@ class ExportAttendancePDFView(APIView):
     permission_classes = [IsAdminUser]
 
     def get(self, request):
+        month = int(request.query_params.get('month', timezone.now().month))
+        year = int(request.query_params.get('year', timezone.now().year))
+
+        content = cached_report(
+            report_key('attendance_pdf', year, month), lambda: self.build(year, month),
+            domains=ATTENDANCE_REPORT_DOMAINS, month=(year, month),
+        )
+        response = HttpResponse(content, content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="attendance_{year}_{month:02d}.pdf"'
+        return response
+
+    def build(self, year, month):
+        """PDF bytes of the month's attendance"""
         from reportlab.lib import colors
         from reportlab.lib.pagesizes import A4, landscape
         from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
         from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from io import BytesIO
-
-        month = int(request.query_params.get('month', timezone.now().month))
-        year = int(request.query_params.get('year', timezone.now().year))
 
         buffer = BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), topMargin=30, bottomMargin=30)
@@ -702,11 +595,7 @@ class ExportAttendancePDFView(APIView):
             elements.append(Paragraph("No attendance records found for this period.", styles['Normal']))
 
         doc.build(elements)
-        buffer.seek(0)
-
-        response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="attendance_{year}_{month:02d}.pdf"'
-        return response
+        return buffer.getvalue()
 
 
 class OfficeLocationListView(generics.ListCreateAPIView):
@@ -903,114 +792,68 @@ class RegularizationReviewView(APIView):
         new_status = serializer.validated_data['status']
         review_remarks = serializer.validated_data.get('review_remarks', '')
 
-        # VALIDATION: Check if requested time is in the future (only for approval)
-        if new_status == 'approved':
-            now = timezone.now()
-            today = get_india_date()
+        # Requests for today can't set a punch time that hasn't happened yet
+        if new_status == 'approved' and regularization.date == get_india_date():
+            from .regularization_utils import future_punch_error
+            current_time = timezone.now().astimezone(pytz.timezone('Asia/Kolkata')).time()
+            error = future_punch_error(regularization, current_time)
+            if error:
+                return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Same path as bulk review: attendance, comp-off, notification,
+        # activity log and email
+        from .regularization_utils import RegularizationBulkReview
+        reviewed = RegularizationBulkReview(request.user, new_status, review_remarks, request).review([pk])
+        if not reviewed:
+            return Response(
+                {"error": "This request has already been reviewed"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-            # If regularization is for today, check if requested times are in the future
-            if regularization.date == today:
-                current_time = now.astimezone(pytz.timezone('Asia/Kolkata')).time()
+        return Response({
+            "message": f"Regularization request {new_status}",
+            "data": RegularizationRequestSerializer(reviewed[0]).data
+        })
 
-                if regularization.requested_punch_in:
-                    if regularization.requested_punch_in > current_time:
-                        return Response(
-                            {"error": f"Cannot set punch in time ({regularization.requested_punch_in.strftime('%I:%M %p')}) in the future. Current time is {current_time.strftime('%I:%M %p')}. Please wait until that time has passed."},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
 
-                if regularization.requested_punch_out:
-                    if regularization.requested_punch_out > current_time:
-                        return Response(
-                            {"error": f"Cannot set punch out time ({regularization.requested_punch_out.strftime('%I:%M %p')}) in the future. Current time is {current_time.strftime('%I:%M %p')}. Please wait until that time has passed."},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
+class BulkRegularizationReviewView(APIView):
+    """Admin can approve/reject multiple regularization requests at once"""
+    permission_classes = [IsAdminUser]
+    # auth user + lock + update + attendance (load/create/update) + shifts
+    # (cold cache) + holidays + comp-offs (2) + notifications + logs
+    # (+ savepoints)
+    query_budget = 18
 
-        # If approved, update the attendance record FIRST (before regularization save to avoid signal timeout)
-        if new_status == 'approved':
-            try:
-                attendance, created = Attendance.objects.get_or_create(
-                    user=regularization.user,
-                    date=regularization.date,
-                    defaults={'status': 'present'}
-                )
+    def post(self, request):
+        from accounts.review_utils import parse_review_ids
+        from .regularization_utils import RegularizationBulkReview
 
-                # DEBUG: Print what's being updated
-                print(f"=== REGULARIZATION DEBUG ===")
-                print(f"User: {regularization.user.name}")
-                print(f"Date: {regularization.date}")
-                print(f"Requested Punch In: {regularization.requested_punch_in}")
-                print(f"Requested Punch Out: {regularization.requested_punch_out}")
-                print(f"Attendance ID: {attendance.id}, Created: {created}")
-                print(f"Before - Punch In: {attendance.punch_in}, Punch Out: {attendance.punch_out}")
-
-                # Update attendance based on request type (use IST timezone)
-                ist = pytz.timezone('Asia/Kolkata')
-
-                if regularization.requested_punch_in:
-                    naive_punch_in = datetime.combine(regularization.date, regularization.requested_punch_in)
-                    punch_in_datetime = ist.localize(naive_punch_in)
-                    attendance.punch_in = punch_in_datetime
-                    print(f"Setting punch_in to: {punch_in_datetime}")
-
-                if regularization.requested_punch_out:
-                    naive_punch_out = datetime.combine(regularization.date, regularization.requested_punch_out)
-                    punch_out_datetime = ist.localize(naive_punch_out)
-                    attendance.punch_out = punch_out_datetime
-                    print(f"Setting punch_out to: {punch_out_datetime}")
-
-                # Reset auto punch-out flag since this is now regularized
-                if attendance.is_auto_punch_out:
-                    attendance.is_auto_punch_out = False
-
-                # Recalculate working hours with new punch times
-                if attendance.punch_in and attendance.punch_out:
-                    attendance.calculate_working_hours()
-
-                # Always set status to present when regularization is approved
-                attendance.status = 'present'
-                attendance.notes = f"Regularized: {regularization.request_type}"
-                attendance.save(force_status=True)  # Prevent auto-status calculation
-
-                # DEBUG: Print after save
-                print(f"After Save - Punch In: {attendance.punch_in}, Punch Out: {attendance.punch_out}")
-                print(f"Working Hours: {attendance.working_hours}, Status: {attendance.status}")
-                print(f"=== END DEBUG ===")
-
-            except Exception as e:
-                print(f"ERROR in regularization approval: {str(e)}")
-                import traceback
-                traceback.print_exc()
-                return Response(
-                    {"error": f"Failed to update attendance: {str(e)}"},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
+        # skipped_ids below are reported against these validated ints
+        regularization_ids, error = parse_review_ids(request.data, 'regularization_ids')
+        if error:
+            return Response(
+                {"error": error},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        # Update regularization using update() to avoid triggering signal (which causes timeout)
-        RegularizationRequest.objects.filter(pk=regularization.pk).update(
-            status=new_status,
-            reviewed_by=request.user,
-            reviewed_on=timezone.now(),
-            review_remarks=review_remarks
-        )
-        # Refresh to get updated data
-        regularization.refresh_from_db()
+        serializer = RegularizationReviewSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        # Notify employee about regularization status (DISABLED - causing timeout)
-        # try:
-        #     notify_regularization_status(regularization, new_status, review_remarks)
-        # except Exception as e:
-        #     print(f"Email notification failed: {e}")
+        new_status = serializer.validated_data['status']
+        review_remarks = serializer.validated_data.get('review_remarks', '')
 
-        # Log activity (re-enabled after fixing signal issue)
-        try:
-            log_regularization_reviewed(request.user, regularization, new_status, request)
-        except Exception:
-            pass
+        # Already reviewed requests, and approvals for today with punch
+        # times still in the future, are skipped
+        reviewed = RegularizationBulkReview(
+            request.user, new_status, review_remarks, request
+        ).review(regularization_ids)
+        reviewed_ids = {regularization.id for regularization in reviewed}
 
         return Response({
-            "message": f"Regularization request {new_status}",
-            "data": RegularizationRequestSerializer(regularization).data
+            "message": f"{len(reviewed)} regularization request(s) {new_status}",
+            "updated_count": len(reviewed),
+            "skipped_ids": [pk for pk in regularization_ids if pk not in reviewed_ids],
         })
 
 
@@ -1201,15 +1044,19 @@ class WFHReviewView(APIView):
 class BulkWFHReviewView(APIView):
     """Admin can approve/reject multiple WFH requests at once"""
     permission_classes = [IsAdminUser]
+    # auth user + lock/select + update + notifications + logs (+ savepoint)
+    query_budget = 8
 
     def post(self, request):
-        wfh_ids = request.data.get('wfh_ids', [])
+        from accounts.review_utils import WFHBulkReview, parse_review_ids
+
+        wfh_ids, error = parse_review_ids(request.data, 'wfh_ids')
         new_status = request.data.get('status')
         review_remarks = request.data.get('review_remarks', '')
 
-        if not wfh_ids:
+        if error:
             return Response(
-                {"error": "wfh_ids is required"},
+                {"error": error},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
@@ -1219,30 +1066,9 @@ class BulkWFHReviewView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Get all pending WFH requests
-        wfh_requests = WFHRequest.objects.filter(
-            id__in=wfh_ids,
-            status='pending'
-        )
-
-        updated_count = 0
-        for wfh_request in wfh_requests:
-            wfh_request.status = new_status
-            wfh_request.reviewed_by = request.user
-            wfh_request.reviewed_on = timezone.now()
-            wfh_request.review_remarks = review_remarks
-            wfh_request.save()
-
-            # Notify employee
-            notify_wfh_status(wfh_request, new_status, review_remarks)
-
-            # Log activity
-            try:
-                log_wfh_reviewed(request.user, wfh_request, new_status, request)
-            except Exception:
-                pass
-
-            updated_count += 1
+        # One UPDATE plus bulk notifications/logs; emails go out in one batch
+        reviewed = WFHBulkReview(request.user, new_status, review_remarks, request).review(wfh_ids)
+        updated_count = len(reviewed)
 
         return Response({
             "message": f"{updated_count} WFH request(s) {new_status}",
@@ -1375,6 +1201,35 @@ class AutoPunchOutView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class ExpireCompOffsView(APIView):
+    """
+    API endpoint to expire comp offs past their expiry date for all employees.
+    Can be called by external cron services like cron-job.org (daily after midnight IST).
+    Supports both GET and POST methods for compatibility.
+    """
+    authentication_classes = []  # No authentication required
+    permission_classes = [permissions.AllowAny]  # Allow any request
+
+    def get(self, request):
+        """Handle GET request - same as POST for cron compatibility"""
+        return self._expire(request)
+
+    def post(self, request):
+        """Handle POST request"""
+        return self._expire(request)
+
+    def _expire(self, request):
+        from .comp_off_utils import expire_comp_offs
+
+        result = expire_comp_offs()
+        return Response({
+            "message": f"Expired {result['expired']} comp off(s) for {result['users']} employee(s)",
+            "expired": result['expired'],
+            "days": float(result['days']),
+            "users": result['users'],
+        })
+
+
 class FixAutoPunchOutView(APIView):
     """Fix existing auto punch-out records (11 PM) to half day (4 hours)"""
     permission_classes = [IsAdminUser]
@@ -1456,6 +1311,9 @@ class AdminAttendanceCreateView(APIView):
 
         attendance.save()
 
+        from accounts.dashboard_utils import invalidate_dashboard_stats
+        invalidate_dashboard_stats(date)
+
         return Response({
             "message": f"Attendance added for {user.name} on {date}",
             "data": AttendanceSerializer(attendance).data
@@ -1511,6 +1369,9 @@ class AdminAttendanceUpdateView(APIView):
 
         attendance.save(force_status=force_status)
 
+        from accounts.dashboard_utils import invalidate_dashboard_stats
+        invalidate_dashboard_stats(attendance.date)
+
         # Log activity
         try:
             changes = {k: v for k, v in request.data.items() if k != 'notes'}
@@ -1570,6 +1431,9 @@ class AdminMarkAbsentView(APIView):
             }
         )
 
+        from accounts.dashboard_utils import invalidate_dashboard_stats
+        invalidate_dashboard_stats(date)
+
         action = "marked" if created else "updated to"
         return Response({
             "message": f"{user.name} {action} absent on {date}",
@@ -1578,64 +1442,43 @@ class AdminMarkAbsentView(APIView):
 
 
 class AdminBulkAttendanceView(APIView):
-    """Admin can mark multiple employees absent/present for a date"""
+    """
+    Admin can mark multiple employees absent/present in one call.
+
+    Takes either a single date ({date, user_ids, status, notes}) or a list
+    of entries covering several dates, statuses or whole departments - see
+    attendance/bulk_utils.py.
+    """
     permission_classes = [IsAdminUser]
+    # auth user + employees + existing rows + upsert batches + shifts (cold
+    # cache) + holidays + comp-offs (2)
+    query_budget = 12
 
     def post(self, request):
-        from accounts.models import User
-
-        date_str = request.data.get('date')
-        user_ids = request.data.get('user_ids', [])
-        attendance_status = request.data.get('status', 'absent')
-        notes = request.data.get('notes', '')
-
-        if not date_str or not user_ids:
-            return Response(
-                {"error": "date and user_ids are required"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        if attendance_status not in ['present', 'absent', 'half_day', 'on_leave']:
-            return Response(
-                {"error": "Invalid status. Use: present, absent, half_day, on_leave"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        from .bulk_utils import BulkAttendanceError, apply_bulk_attendance, parse_bulk_entries
 
         try:
-            date = datetime.strptime(date_str, '%Y-%m-%d').date()
-        except ValueError:
+            entries = parse_bulk_entries(request.data)
+            outcome = apply_bulk_attendance(entries)
+        except BulkAttendanceError as e:
             return Response(
-                {"error": "Invalid date format. Use YYYY-MM-DD"},
+                {"error": str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        results = []
-        for user_id in user_ids:
-            try:
-                user = User.objects.get(pk=user_id, role='employee')
-                attendance, created = Attendance.objects.update_or_create(
-                    user=user,
-                    date=date,
-                    defaults={
-                        'status': attendance_status,
-                        'notes': f"Bulk update by admin: {notes}" if notes else "Bulk update by admin"
-                    }
-                )
-                results.append({
-                    'user_id': user_id,
-                    'user_name': user.name,
-                    'status': 'success'
-                })
-            except User.DoesNotExist:
-                results.append({
-                    'user_id': user_id,
-                    'status': 'failed',
-                    'error': 'Employee not found'
-                })
+        dates = outcome['dates']
+        if len(dates) == 1:
+            period = f"{dates[0]}"
+        elif dates:
+            period = f"{dates[0]} to {dates[-1]}"
+        else:
+            period = "no dates"
 
         return Response({
-            "message": f"Bulk attendance update completed for {date}",
-            "results": results
+            "message": f"Bulk attendance update completed for {period}",
+            "results": outcome['results'],
+            "created": outcome['created'],
+            "updated": outcome['updated'],
         })
 
 
@@ -1754,7 +1597,10 @@ class AssignShiftView(APIView):
         updated_count = User.objects.filter(
             pk__in=user_ids,
             role='employee'
-        ).update(shift=shift)
+        ).touching(*user_ids).update(shift=shift)
+
+        from .board_utils import invalidate_today_board
+        invalidate_today_board()
 
         shift_name = shift.name if shift else "No Shift"
         return Response({
@@ -1808,26 +1654,9 @@ class CompOffBalanceView(APIView):
         else:
             user = request.user
 
-        # Calculate balances
-        earned = CompOff.objects.filter(user=user, status='earned').aggregate(
-            total=Sum('credit_days')
-        )['total'] or 0
-
-        used = CompOff.objects.filter(user=user, status='used').aggregate(
-            total=Sum('credit_days')
-        )['total'] or 0
-
-        expired = CompOff.objects.filter(user=user, status='expired').aggregate(
-            total=Sum('credit_days')
-        )['total'] or 0
-
-        # Check and mark expired comp offs
-        today = get_india_date()
-        CompOff.objects.filter(
-            user=user,
-            status='earned',
-            expires_on__lt=today
-        ).update(status='expired')
+        # Earned/used/expired totals in one query; earned comp offs past
+        # their expiry count as expired until the nightly sweep marks them
+        summary = comp_off_summary(user.id, get_india_date())
 
         # Calculate pending comp off days in leave requests
         from leaves.models import LeaveRequest
@@ -1839,10 +1668,10 @@ class CompOffBalanceView(APIView):
         return Response({
             "user_id": user.id,
             "user_name": user.name,
-            "earned": float(earned),
-            "used": float(used),
-            "expired": float(expired),
-            "available": float(earned),  # Available = earned (status='earned')
+            "earned": float(summary['available']),
+            "used": float(summary['used']),
+            "expired": float(summary['expired']),
+            "available": float(summary['available']),  # Available = earned and not expired
             "pending_in_leaves": float(pending_in_leaves)  # Comp offs reserved in pending leaves
         })
 
@@ -1858,30 +1687,20 @@ class UseCompOffView(APIView):
         comp_off_id = serializer.validated_data['comp_off_id']
         use_date = serializer.validated_data['use_date']
 
-        try:
-            comp_off = CompOff.objects.get(
-                pk=comp_off_id,
-                user=request.user,
-                status='earned'
-            )
-        except CompOff.DoesNotExist:
+        if not CompOff.objects.filter(pk=comp_off_id, user=request.user, status='earned').exists():
             return Response(
                 {"error": "Comp off not found or already used"},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Check if expired
-        if comp_off.expires_on and use_date > comp_off.expires_on:
+        # Mark comp off as used (locked, so a double submit can't spend it twice)
+        comp_off = use_comp_off(request.user.id, comp_off_id, use_date)
+        if comp_off is None:
             return Response(
                 {"error": "Comp off has expired"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Mark comp off as used
-        comp_off.status = 'used'
-        comp_off.used_date = use_date
-        comp_off.save()
-
         # Create attendance record for the comp off day
         attendance, created = Attendance.objects.update_or_create(
             user=request.user,
@@ -1974,8 +1793,6 @@ class UseCompOffToReduceLOPView(APIView):
             expires_on__gte=today
         ).order_by('expires_on')
 
-        available_comp_off_days = sum(co.credit_days for co in available_comp_offs)
-
         # Get LOP from approved leave requests (current month and previous)
         lop_leaves = LeaveRequest.objects.filter(
             user=user,
@@ -2005,7 +1822,7 @@ class UseCompOffToReduceLOPView(APIView):
         } for co in available_comp_offs]
 
         return Response({
-            'available_comp_off_days': float(available_comp_off_days),
+            'available_comp_off_days': float(available_comp_off_days(user.id)),
             'available_comp_offs': available_comp_off_list,
             'lop_leaves': lop_details
         })
@@ -2030,71 +1847,42 @@ class UseCompOffToReduceLOPView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Get the leave request with LOP
-        try:
-            leave_request = LeaveRequest.objects.get(
+        today = get_india_date()
+
+        # The comp-off and the LOP it covers are written together
+        with transaction.atomic():
+            # Get the leave request with LOP
+            leave_request = LeaveRequest.objects.select_for_update().filter(
                 pk=leave_request_id,
                 user=request.user,
                 status='approved',
                 lop_days__gt=0
-            )
-        except LeaveRequest.DoesNotExist:
-            return Response(
-                {"error": "Leave request not found or has no LOP"},
-                status=status.HTTP_404_NOT_FOUND
-            )
-
-        today = get_india_date()
+            ).first()
+            if leave_request is None:
+                return Response(
+                    {"error": "Leave request not found or has no LOP"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
 
-        # Get the selected comp off
-        try:
-            comp_off = CompOff.objects.get(
-                pk=comp_off_id,
-                user=request.user,
-                status='earned',
-                expires_on__gte=today
-            )
-        except CompOff.DoesNotExist:
-            return Response(
-                {"error": "Comp off not found or already used/expired"},
-                status=status.HTTP_404_NOT_FOUND
+            # Use the selected comp off, only as much as the LOP needs - any
+            # remainder is split off as a new earned comp off
+            comp_off = use_comp_off(
+                request.user.id, comp_off_id, today, max_days=leave_request.lop_days,
+                remainder_reason=f"Remaining after LOP reduction on {today}"
             )
+            if comp_off is None:
+                return Response(
+                    {"error": "Comp off not found or already used/expired"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
 
-        days_to_reduce = float(comp_off.credit_days)
-
-        # Check if days_to_reduce is valid - can only reduce up to available LOP
-        actual_reduction = min(days_to_reduce, float(leave_request.lop_days))
-
-        if actual_reduction < days_to_reduce:
-            # Partial use - we'll use only what's needed
-            remaining_days = days_to_reduce - actual_reduction
-
-            # Mark original as used with reduced days
-            comp_off.credit_days = actual_reduction
-            comp_off.status = 'used'
-            comp_off.used_date = today
-            comp_off.save()
+            actual_reduction = float(comp_off.credit_days)
 
-            # Create new comp off for remaining days
-            CompOff.objects.create(
-                user=request.user,
-                earned_date=comp_off.earned_date,
-                credit_days=remaining_days,
-                status='earned',
-                reason=f"Remaining after LOP reduction on {today}",
-                expires_on=comp_off.expires_on
-            )
-        else:
-            # Use entire comp off
-            comp_off.status = 'used'
-            comp_off.used_date = today
-            comp_off.save()
-
-        # Update leave request - reduce LOP, increase comp_off_days
-        old_lop = leave_request.lop_days
-        leave_request.lop_days = float(leave_request.lop_days) - actual_reduction
-        leave_request.comp_off_days = float(leave_request.comp_off_days) + actual_reduction
-        leave_request.save()
+            # Update leave request - reduce LOP, increase comp_off_days
+            old_lop = leave_request.lop_days
+            leave_request.lop_days = float(leave_request.lop_days) - actual_reduction
+            leave_request.comp_off_days = float(leave_request.comp_off_days) + actual_reduction
+            leave_request.save()
 
         # Create notification
         Notification.objects.create(
@@ -2130,8 +1918,6 @@ class UseCompOffToCoverAbsentView(APIView):
             expires_on__gte=today
         ).order_by('expires_on')
 
-        available_comp_off_days = sum(float(co.credit_days) for co in available_comp_offs)
-
         # Get absent attendance records (last 60 days)
         from datetime import timedelta
         sixty_days_ago = today - timedelta(days=60)
@@ -2160,7 +1946,7 @@ class UseCompOffToCoverAbsentView(APIView):
         } for co in available_comp_offs]
 
         return Response({
-            'available_comp_off_days': available_comp_off_days,
+            'available_comp_off_days': float(available_comp_off_days(user.id)),
             'available_comp_offs': available_comp_off_list,
             'absent_days': absent_details
         })
@@ -2199,31 +1985,15 @@ class UseCompOffToCoverAbsentView(APIView):
 
         today = get_india_date()
 
-        # Get the selected comp off
-        try:
-            comp_off = CompOff.objects.get(
-                pk=comp_off_id,
-                user=request.user,
-                status='earned',
-                expires_on__gte=today
-            )
-        except CompOff.DoesNotExist:
+        # Mark the selected comp off as used (a half day comp off covers
+        # the whole absent day)
+        comp_off = use_comp_off(request.user.id, comp_off_id, today)
+        if comp_off is None:
             return Response(
                 {"error": "Comp off not found or already used/expired"},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Check if comp-off has enough days (need at least 1 day for full absent, 0.5 for half)
-        if float(comp_off.credit_days) < 1:
-            # Half day comp-off - can only cover if we allow partial
-            # For simplicity, we'll use the full comp-off value
-            pass
-
-        # Mark comp off as used
-        comp_off.status = 'used'
-        comp_off.used_date = today
-        comp_off.save()
-
         # Update attendance - mark as present with comp-off note
         old_status = attendance.status
         attendance.status = 'present'
@@ -2253,3 +2023,70 @@ class UseCompOffToCoverAbsentView(APIView):
                 }
             }
         })
+
+
+# Live board stream (ASGI)
+class LiveBoardTicketView(APIView):
+    """Issue a single-use ticket for opening the live board stream"""
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        from .live_utils import STREAM_TICKET_TTL, issue_stream_ticket
+
+        return Response({
+            "ticket": issue_stream_ticket(request.user),
+            "expires_in": STREAM_TICKET_TTL,
+        }, status=status.HTTP_201_CREATED)
+
+
+def authenticate_stream_request(request):
+    """
+    Resolve the admin user for a stream request from its ?ticket=.
+    EventSource can't send headers, and an access token in the URL would be
+    written to access logs, so the stream takes a single-use ticket instead.
+    """
+    from accounts.models import User
+    from .live_utils import redeem_stream_ticket
+
+    user_id = redeem_stream_ticket(request.GET.get('ticket'))
+    if user_id is None:
+        return None
+    return User.objects.filter(pk=user_id, is_active=True).first()
+
+
+async def live_board_stream(request):
+    """Server-Sent Events stream of punch in/out deltas for the admin board"""
+    import asyncio
+    from asgiref.sync import sync_to_async
+    from django.http import JsonResponse, StreamingHttpResponse
+    from .live_utils import relay, stream_events
+
+    from django.core.handlers.asgi import ASGIRequest
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would try to buffer the endless stream
+        return JsonResponse(
+            {"error": "Live board stream requires the ASGI server"},
+            status=501
+        )
+
+    user = await sync_to_async(authenticate_stream_request)(request)
+    if user is None:
+        return JsonResponse({"error": "Authentication required"}, status=401)
+    if not user.is_admin:
+        return JsonResponse({"error": "Admin access required"}, status=403)
+
+    await sync_to_async(relay.ensure_started)()
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    response = StreamingHttpResponse(
+        stream_events(asyncio.get_running_loop(), last_event_id),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Don't let proxies buffer the stream
+    return response
@@ -0,0 +1,234 @@
+"""
+Punch-rush load generator.
+
+Replays the morning spike against a running server (gunicorn/uvicorn):
+synthetic employees log in through the real login endpoint, then arrive
+along a configurable curve and call today -> punch-in -> unread-count, with
+some of them punching out later in the window.
+
+Arrivals are scheduled on asyncio; requests go through a urllib3
+keep-alive connection pool, one worker thread per connection.
+"""
+import asyncio
+import json
+import math
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import urllib3
+from urllib3.exceptions import HTTPError
+
+from config.instrumentation import percentiles
+
+from .synthetic import SYNTHETIC_OFFICE_IP, SYNTHETIC_PASSWORD, employee_mobile
+
+ARRIVAL_CURVES = ('uniform', 'ramp', 'peak', 'burst')
+
+REQUEST_TIMEOUT = 30
+
+
+class HttpClient:
+    """Connection-pooled client - at most `max_connections` requests in flight"""
+
+    def __init__(self, base_url, max_connections=50):
+        if not base_url.startswith(('http://', 'https://')):
+            raise ValueError('The server URL must start with http:// or https://')
+        self.base_url = base_url.rstrip('/')
+        self.pool = urllib3.PoolManager(
+            maxsize=max_connections, block=True, retries=False, timeout=REQUEST_TIMEOUT
+        )
+        self.executor = ThreadPoolExecutor(max_workers=max_connections)
+
+    async def request(self, method, path, data=None, token=None):
+        """Returns (status, headers, parsed JSON body or None)"""
+        headers = {'Accept': 'application/json', 'X-Forwarded-For': SYNTHETIC_OFFICE_IP}
+        body = None
+        if data is not None:
+            body = json.dumps(data).encode()
+            headers['Content-Type'] = 'application/json'
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+
+        response = await asyncio.get_running_loop().run_in_executor(
+            self.executor,
+            lambda: self.pool.request(method, self.base_url + path, body=body, headers=headers)
+        )
+        try:
+            payload = json.loads(response.data) if response.data else None
+        except ValueError:
+            payload = None
+        return response.status, response.headers, payload
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.pool.clear()
+
+
+def server_total_ms(headers):
+    """Server-side total from the instrumentation Server-Timing header"""
+    for metric in headers.get('server-timing', '').split(','):
+        name, _, params = metric.strip().partition(';')
+        if name == 'total':
+            for param in params.split(';'):
+                key, _, value = param.partition('=')
+                if key == 'dur':
+                    try:
+                        return float(value)
+                    except ValueError:
+                        return None
+    return None
+
+
+def arrival_offsets(count, duration, curve, rng):
+    """Seconds from the start of the window at which each user arrives"""
+    if curve == 'uniform':
+        offsets = [rng.uniform(0, duration) for _ in range(count)]
+    elif curve == 'ramp':
+        # Arrival rate grows linearly towards the end of the window
+        offsets = [duration * math.sqrt(rng.random()) for _ in range(count)]
+    elif curve == 'peak':
+        # Most people turn up just before shift start, two thirds in
+        offsets = [rng.triangular(0, duration, duration * 2 / 3) for _ in range(count)]
+    elif curve == 'burst':
+        offsets = [0.0] * count
+    else:
+        raise ValueError(f'Unknown arrival curve: {curve}')
+    return sorted(offsets)
+
+
+class LoadStats:
+    """Latency samples and errors per endpoint"""
+
+    def __init__(self):
+        self.latency = defaultdict(list)
+        self.server = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.completed = []
+
+    def record(self, name, started, status, headers, expected):
+        finished = time.perf_counter()
+        self.latency[name].append((finished - started) * 1000)
+        self.completed.append(finished)
+        server_ms = server_total_ms(headers)
+        if server_ms is not None:
+            self.server[name].append(server_ms)
+        if status not in expected:
+            self.errors[name][str(status)] += 1
+
+    def record_failure(self, name, error):
+        self.errors[name][type(error).__name__] += 1
+
+    def summary(self, elapsed):
+        endpoints = {}
+        total_requests = 0
+        total_errors = 0
+        for name in sorted(set(self.latency) | set(self.errors)):
+            requests = len(self.latency[name])
+            failures = sum(count for key, count in self.errors[name].items() if not key.isdigit())
+            errors = sum(self.errors[name].values())
+            total_requests += requests + failures
+            total_errors += errors
+            endpoints[name] = {
+                'requests': requests + failures,
+                'errors': dict(self.errors[name]),
+                'error_rate': round(errors / max(requests + failures, 1), 4),
+                'latency_ms': percentiles(self.latency[name]),
+                'server_ms': percentiles(self.server[name]),
+            }
+        return {
+            'elapsed_s': round(elapsed, 2),
+            'requests': total_requests,
+            'errors': total_errors,
+            'error_rate': round(total_errors / max(total_requests, 1), 4),
+            'throughput_rps': round(len(self.completed) / elapsed, 1) if elapsed else 0,
+            'peak_rps': self.peak_rps(),
+            'endpoints': endpoints,
+        }
+
+    def peak_rps(self):
+        per_second = defaultdict(int)
+        for finished in self.completed:
+            per_second[int(finished)] += 1
+        return max(per_second.values(), default=0)
+
+
+class PunchRush:
+    """One load run: log users in, then replay the arrival curve"""
+
+    def __init__(self, base_url, users=100, duration=60, curve='peak', punch_out_ratio=0.2,
+                 max_connections=50, seed=42, latitude=None, longitude=None, log=None):
+        self.client = HttpClient(base_url, max_connections=max_connections)
+        self.users = users
+        self.duration = duration
+        self.curve = curve
+        self.punch_out_ratio = punch_out_ratio
+        self.rng = random.Random(seed)
+        self.location = {'latitude': latitude, 'longitude': longitude}
+        self.log = log or (lambda message: None)
+        self.stats = LoadStats()
+        self.login_stats = LoadStats()
+
+    async def login(self, index):
+        started = time.perf_counter()
+        try:
+            status, headers, payload = await self.client.request('POST', '/api/auth/login/', {
+                'mobile': employee_mobile(index),
+                'password': SYNTHETIC_PASSWORD,
+            })
+        except (OSError, HTTPError) as e:
+            self.login_stats.record_failure('login', e)
+            return None
+        self.login_stats.record('login', started, status, headers, (200,))
+        if status != 200 or not payload:
+            return None
+        return payload['tokens']['access']
+
+    async def call(self, name, method, path, token, data=None, expected=(200,)):
+        started = time.perf_counter()
+        try:
+            status, headers, _ = await self.client.request(method, path, data, token)
+        except (OSError, HTTPError) as e:
+            self.stats.record_failure(name, e)
+            return None
+        self.stats.record(name, started, status, headers, expected)
+        return status
+
+    async def employee(self, token, arrive_at, leave_at, start):
+        await asyncio.sleep(max(0, start + arrive_at - time.perf_counter()))
+        await self.call('today', 'GET', '/api/attendance/today/', token)
+        await self.call('punch-in', 'POST', '/api/attendance/punch-in/', token, self.location, (201,))
+        await self.call('unread-count', 'GET', '/api/auth/notifications/unread-count/', token)
+        if leave_at is not None:
+            await asyncio.sleep(max(0, start + leave_at - time.perf_counter()))
+            await self.call('punch-out', 'POST', '/api/attendance/punch-out/', token, self.location)
+
+    async def run(self):
+        try:
+            self.log(f'Logging in {self.users} users...')
+            login_start = time.perf_counter()
+            tokens = await asyncio.gather(*(self.login(index) for index in range(1, self.users + 1)))
+            login_summary = self.login_stats.summary(time.perf_counter() - login_start)
+            tokens = [token for token in tokens if token]
+            if not tokens:
+                return {'login': login_summary, 'rush': None}
+
+            offsets = arrival_offsets(len(tokens), self.duration, self.curve, self.rng)
+            plan = []
+            for token, arrive_at in zip(tokens, offsets):
+                leave_at = None
+                if self.rng.random() < self.punch_out_ratio:
+                    leave_at = self.rng.uniform(arrive_at, self.duration)
+                plan.append((token, arrive_at, leave_at))
+
+            self.log(f'Replaying {self.curve} arrivals for {len(tokens)} users over {self.duration}s...')
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                self.employee(token, arrive_at, leave_at, start)
+                for token, arrive_at, leave_at in plan
+            ))
+            rush_summary = self.stats.summary(time.perf_counter() - start)
+            return {'login': login_summary, 'rush': rush_summary}
+        finally:
+            self.client.close()
@@ -0,0 +1,60 @@
+"""
+Management command to generate a synthetic company for benchmarks.
+Creates employees, shifts, an office, holidays and a history of attendance,
+leaves, balances, comp-offs, notifications and activity logs in bulk.
+
+Synthetic users log in with mobile 000XXXXXXX and the password in
+benchmarks/synthetic.py; the admin is 0000000000.
+
+Usage:
+    python manage.py generate_synthetic_org
+    python manage.py generate_synthetic_org --employees 500 --days 365
+    python manage.py generate_synthetic_org --clear   # remove synthetic data only
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.synthetic import clear_org, generate_org, synthetic_users
+
+
+class Command(BaseCommand):
+    help = 'Generate a synthetic organisation (employees + history) for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=100, help='Number of employees (default 100)')
+        parser.add_argument('--days', type=int, default=365, help='Days of history ending yesterday (default 365)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (default 42)')
+        parser.add_argument('--clear', action='store_true', help='Delete existing synthetic data and exit')
+        parser.add_argument('--replace', action='store_true', help='Delete existing synthetic data before generating')
+
+    def handle(self, *args, **options):
+        if options['clear'] or options['replace']:
+            deleted = clear_org()
+            total = sum(deleted.values())
+            self.stdout.write(f'Deleted {total} synthetic rows')
+            if options['clear']:
+                self.stdout.write(self.style.SUCCESS('Done!'))
+                return
+
+        if synthetic_users().exists():
+            raise CommandError('Synthetic org already exists - use --replace to regenerate it')
+        if options['employees'] < 1 or options['days'] < 1:
+            raise CommandError('--employees and --days must be positive')
+
+        self.stdout.write(
+            f"Generating {options['employees']} employees with {options['days']} days of history..."
+        )
+        start = time.perf_counter()
+        counts = generate_org(
+            employees=options['employees'],
+            days=options['days'],
+            seed=options['seed'],
+            log=self.stdout.write
+        )
+        elapsed = time.perf_counter() - start
+
+        for name, count in counts.items():
+            self.stdout.write(f'  {name:<16} {count}')
+        self.stdout.write(self.style.SUCCESS(f'\nDone in {elapsed:.1f}s'))
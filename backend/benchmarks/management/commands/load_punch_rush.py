@@ -0,0 +1,114 @@
+"""
+Management command to load test the morning punch-in rush.
+Fires today/punch-in/unread-count (and some punch-out) calls at a running
+server along an arrival curve and reports throughput, latency percentiles
+and error rates - the numbers used for sizing workers.
+
+Needs a synthetic org (generate_synthetic_org) in the database the server
+uses, and a local server, e.g.:
+    gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker --workers 2
+    gunicorn config.wsgi:application --workers 4
+
+Usage:
+    python manage.py load_punch_rush --users 200 --duration 60
+    python manage.py load_punch_rush --url http://127.0.0.1:8000 --curve burst --connections 100
+    python manage.py load_punch_rush --reset-today --output rush.json
+"""
+
+import asyncio
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.dashboard_utils import get_india_date
+from attendance.models import Attendance
+from benchmarks.load import ARRIVAL_CURVES, PunchRush
+from benchmarks.synthetic import synthetic_employees
+
+
+class Command(BaseCommand):
+    help = 'Replay the punch-in rush against a running server and report capacity numbers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Server base URL (default http://127.0.0.1:8000)')
+        parser.add_argument('--users', type=int, default=100, help='Synthetic employees taking part (default 100)')
+        parser.add_argument('--duration', type=float, default=60, help='Arrival window in seconds (default 60)')
+        parser.add_argument('--curve', choices=ARRIVAL_CURVES, default='peak', help='Arrival curve (default peak)')
+        parser.add_argument(
+            '--punch-out-ratio', type=float, default=0.2,
+            help='Share of users who also punch out within the window (default 0.2)'
+        )
+        parser.add_argument('--connections', type=int, default=50, help='Max concurrent connections (default 50)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (default 42)')
+        parser.add_argument(
+            '--reset-today', action='store_true',
+            help="Delete today's synthetic attendance first so everyone can punch in again"
+        )
+        parser.add_argument('--output', help='Write results as JSON to this file')
+
+    def handle(self, *args, **options):
+        available = synthetic_employees().count()
+        if available < options['users']:
+            raise CommandError(
+                f"Only {available} synthetic employees - run generate_synthetic_org --employees {options['users']}"
+            )
+
+        if options['reset_today']:
+            deleted, _ = Attendance.objects.filter(
+                user__in=synthetic_employees(), date=get_india_date()
+            ).delete()
+            self.stdout.write(f"Cleared {deleted} of today's attendance rows")
+
+        rush = PunchRush(
+            options['url'],
+            users=options['users'],
+            duration=options['duration'],
+            curve=options['curve'],
+            punch_out_ratio=options['punch_out_ratio'],
+            max_connections=options['connections'],
+            seed=options['seed'],
+            latitude=settings.OFFICE_LATITUDE,
+            longitude=settings.OFFICE_LONGITUDE,
+            log=self.stdout.write,
+        )
+        try:
+            results = asyncio.run(rush.run())
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.print_summary('login', results['login'])
+        if results['rush'] is None:
+            raise CommandError('No user could log in - is the server running against this database?')
+        self.print_summary('rush', results['rush'])
+
+        if options['output']:
+            results['meta'] = {key: options[key] for key in (
+                'url', 'users', 'duration', 'curve', 'punch_out_ratio', 'connections', 'seed'
+            )}
+            Path(options['output']).write_text(json.dumps(results, indent=2))
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if results['rush']['errors']:
+            self.stdout.write(self.style.WARNING(
+                f"\n{results['rush']['errors']} failed requests ({results['rush']['error_rate']:.1%})"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('\nDone! No failed requests.'))
+
+    def print_summary(self, title, summary):
+        self.stdout.write(
+            f"\n{title}: {summary['requests']} requests in {summary['elapsed_s']}s  "
+            f"{summary['throughput_rps']} req/s (peak {summary['peak_rps']}/s)  "
+            f"errors {summary['error_rate']:.1%}"
+        )
+        for name, stats in summary['endpoints'].items():
+            latency = stats['latency_ms']
+            self.stdout.write(
+                f"  {name:<14} n={stats['requests']:<6} p50 {latency['p50']}ms  p95 {latency['p95']}ms  "
+                f"p99 {latency['p99']}ms  server p50 {stats['server_ms']['p50']}ms  "
+                f"errors {stats['error_rate']:.1%}"
+            )
+            if stats['errors']:
+                self.stdout.write(f"    {stats['errors']}")
@@ -0,0 +1,212 @@
+"""
+Management command to run the end-to-end benchmark scenarios.
+Needs a synthetic org (python manage.py generate_synthetic_org). Every
+iteration runs inside a transaction that is rolled back, so the database
+is left exactly as it was.
+
+Per scenario it reports wall-clock call latency (p50/p95/p99) plus the
+per-endpoint query counts and DB/serialize/render times recorded by the
+instrumentation middleware. Query budgets are enforced, so a scenario that
+regresses into N+1 queries fails.
+
+Usage:
+    python manage.py run_benchmarks
+    python manage.py run_benchmarks --scenario punch_rush --iterations 10
+    python manage.py run_benchmarks --output bench.json --compare baseline.json
+"""
+
+import json
+import logging
+import platform
+import subprocess
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from accounts.models import ActivityLog, Notification, User
+from attendance.models import Attendance
+from config.instrumentation import QueryBudgetExceeded, percentiles, registry
+from leaves.models import LeaveRequest
+
+from benchmarks.scenarios import (
+    DEFAULT_SAMPLE_SIZE, SCENARIOS, BenchmarkContext, ScenarioError, reset_caches
+)
+
+# p50 slowdown (ratio) reported as a regression by --compare
+REGRESSION_THRESHOLD = 1.25
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Run timed end-to-end scenarios against the synthetic org'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario', action='append', choices=list(SCENARIOS),
+            help='Scenario to run (repeatable, default all)'
+        )
+        parser.add_argument('--iterations', type=int, default=5, help='Timed iterations per scenario (default 5)')
+        parser.add_argument('--warmup', type=int, default=1, help='Untimed warm-up iterations (default 1)')
+        parser.add_argument(
+            '--sample', type=int, default=DEFAULT_SAMPLE_SIZE,
+            help=f'Employees taking part in per-employee scenarios (default {DEFAULT_SAMPLE_SIZE})'
+        )
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--compare', help='Baseline JSON from an earlier run to compare p50s against')
+        parser.add_argument(
+            '--no-enforce-budgets', action='store_true',
+            help='Only record query budget violations instead of failing the scenario'
+        )
+
+    def handle(self, *args, **options):
+        names = options['scenario'] or list(SCENARIOS)
+        enforce = not options['no_enforce_budgets']
+
+        # Test environment: locmem email backend and the testserver host.
+        # Brevo is switched off so no scenario sends real mail.
+        setup_test_environment()
+        # Per-request INFO logging would dominate both the output and the timings
+        logging.disable(logging.INFO)
+        try:
+            with override_settings(QUERY_BUDGET_ENFORCE=enforce), \
+                    mock.patch('accounts.email_utils.BREVO_API_KEY', ''):
+                results = {
+                    name: self.run_scenario(name, options)
+                    for name in names
+                }
+        finally:
+            logging.disable(logging.NOTSET)
+            teardown_test_environment()
+
+        report = {
+            'meta': self.metadata(options),
+            'scenarios': results,
+        }
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(report, indent=2))
+            self.stdout.write(f"Results written to {options['output']}")
+
+        regressions = []
+        if options['compare']:
+            regressions = self.compare(results, options['compare'])
+
+        failed = [name for name, result in results.items() if result.get('error')]
+        if failed or regressions:
+            raise CommandError(
+                f"Failed: {', '.join(failed) or 'none'}; "
+                f"regressed: {', '.join(regressions) or 'none'}"
+            )
+        self.stdout.write(self.style.SUCCESS('\nAll scenarios passed'))
+
+    def run_scenario(self, name, options):
+        scenario = SCENARIOS[name]
+        self.stdout.write(f'\n{name}: {scenario.__doc__}')
+
+        timings = []
+        iteration_ms = []
+        error = None
+        try:
+            for _ in range(options['warmup']):
+                self.run_iteration(scenario, options['sample'])
+            registry.reset()
+            for _ in range(options['iterations']):
+                start = time.perf_counter()
+                timings.extend(self.run_iteration(scenario, options['sample']))
+                iteration_ms.append((time.perf_counter() - start) * 1000)
+        except (ScenarioError, QueryBudgetExceeded) as e:
+            error = str(e)
+            self.stdout.write(self.style.ERROR(f'  FAILED: {error}'))
+
+        snapshot = registry.snapshot()
+        result = {
+            'calls': len(timings),
+            'call_ms': percentiles(timings),
+            'iteration_ms': percentiles(iteration_ms),
+            'endpoints': snapshot['endpoints'],
+            'measurements': snapshot['measurements'],
+            'error': error,
+        }
+        if not error:
+            self.stdout.write(
+                f"  {result['calls']} calls  "
+                f"p50 {result['call_ms']['p50']}ms  p95 {result['call_ms']['p95']}ms  "
+                f"p99 {result['call_ms']['p99']}ms"
+            )
+            for endpoint, stats in snapshot['endpoints'].items():
+                self.stdout.write(
+                    f"    {endpoint:<28} queries p50 {stats['queries']['p50']:<6} "
+                    f"db p50 {stats['db_ms']['p50']}ms"
+                )
+        return result
+
+    def run_iteration(self, scenario, sample_size):
+        """Run the scenario once and roll back everything it wrote"""
+        reset_caches()
+        ctx = None
+        try:
+            with transaction.atomic():
+                ctx = BenchmarkContext(sample_size=sample_size)
+                scenario(ctx)
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            reset_caches()
+        return ctx.timings
+
+    def metadata(self, options):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'],
+                capture_output=True, text=True, cwd=settings.BASE_DIR, timeout=5
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            commit = None
+        return {
+            'commit': commit,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'iterations': options['iterations'],
+            'warmup': options['warmup'],
+            'sample': options['sample'],
+            'enforce_budgets': not options['no_enforce_budgets'],
+            'rows': {
+                'users': User.objects.count(),
+                'attendance': Attendance.objects.count(),
+                'leave_requests': LeaveRequest.objects.count(),
+                'notifications': Notification.objects.count(),
+                'activity_logs': ActivityLog.objects.count(),
+            },
+        }
+
+    def compare(self, results, baseline_path):
+        try:
+            baseline = json.loads(Path(baseline_path).read_text())['scenarios']
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f'Could not read baseline {baseline_path}: {e}')
+
+        self.stdout.write(f'\nCompared with {baseline_path} (call p50):')
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name, {}).get('call_ms', {}).get('p50')
+            after = result['call_ms']['p50']
+            if not before or result.get('error'):
+                continue
+            ratio = after / before
+            line = f'  {name:<16} {before:>9}ms -> {after:>9}ms  ({ratio:.2f}x)'
+            if ratio > REGRESSION_THRESHOLD:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+        return regressions
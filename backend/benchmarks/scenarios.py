@@ -0,0 +1,204 @@
+"""
+Benchmark scenarios.
+
+Each scenario drives the real views through the DRF test client against a
+synthetic org (see synthetic.py). The runner wraps every iteration in a
+transaction that is rolled back, so scenarios can freely punch in, apply
+for leave or run the year-end reset and the next iteration starts from the
+same data.
+
+A scenario is a function taking a BenchmarkContext; every HTTP call made
+through ctx.call() is timed and checked against the expected status.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.authentication import add_user_claims
+from accounts.dashboard_utils import get_india_date
+from config.cache import clear_all
+
+from .synthetic import SYNTHETIC_OFFICE_IP, get_synthetic_admin, synthetic_employees
+
+# Employees taking part in per-employee scenarios
+DEFAULT_SAMPLE_SIZE = 50
+
+
+class ScenarioError(Exception):
+    """A call in a scenario returned an unexpected status"""
+
+
+class BenchmarkContext:
+    """Shared state for one scenario run: client, users and call timings"""
+
+    def __init__(self, sample_size=DEFAULT_SAMPLE_SIZE):
+        self.client = APIClient(REMOTE_ADDR=SYNTHETIC_OFFICE_IP)
+        self.admin = get_synthetic_admin()
+        if self.admin is None:
+            raise ScenarioError('No synthetic org found - run generate_synthetic_org first')
+        self.employees = list(synthetic_employees()[:sample_size])
+        self.today = get_india_date()
+        # Most recent fully generated month
+        last_day = self.today.replace(day=1) - timedelta(days=1)
+        self.report_year, self.report_month = last_day.year, last_day.month
+        self.timings = []
+        self._tokens = {}
+
+    def token(self, user):
+        # Access tokens only - RefreshToken.for_user would write blacklist rows
+        if user.pk not in self._tokens:
+            self._tokens[user.pk] = str(add_user_claims(AccessToken.for_user(user), user))
+        return self._tokens[user.pk]
+
+    def call(self, method, path, user, data=None, expect=200):
+        """Make one timed request as `user` and return the response"""
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token(user)}')
+        start = time.perf_counter()
+        response = getattr(self.client, method)(path, data, format='json' if method != 'get' else None)
+        # Streaming exports aren't done until the body has been read
+        if response.streaming:
+            b''.join(response.streaming_content)
+        else:
+            response.content
+        self.timings.append((time.perf_counter() - start) * 1000)
+        if response.status_code != expect:
+            body = getattr(response, 'data', None) or response.content[:200]
+            raise ScenarioError(f'{method.upper()} {path} returned {response.status_code}: {body}')
+        return response
+
+
+def punch_rush(ctx):
+    """Every sampled employee punches in at the office"""
+    location = {'latitude': settings.OFFICE_LATITUDE, 'longitude': settings.OFFICE_LONGITUDE}
+    for employee in ctx.employees:
+        ctx.call('post', '/api/attendance/punch-in/', employee, location, expect=201)
+
+
+def month_report(ctx):
+    """Admin attendance report for the last full month"""
+    ctx.call(
+        'get',
+        f'/api/attendance/report/?month={ctx.report_month}&year={ctx.report_year}',
+        ctx.admin
+    )
+
+
+def exports(ctx):
+    """CSV, Excel and PDF attendance exports plus the leave report"""
+    query = f'month={ctx.report_month}&year={ctx.report_year}'
+    ctx.call('get', f'/api/attendance/export/?{query}', ctx.admin)
+    ctx.call('get', f'/api/attendance/export/excel/?{query}', ctx.admin)
+    ctx.call('get', f'/api/attendance/export/pdf/?{query}', ctx.admin)
+    ctx.call('get', f'/api/leaves/export/?year={ctx.report_year}', ctx.admin)
+
+
+def leave_apply(ctx):
+    """Every sampled employee applies for a day of sick leave next week"""
+    from leaves.models import LeaveType
+    sick_leave = LeaveType.objects.get(code='SL')
+    for employee in ctx.employees:
+        day = ctx.today + timedelta(days=7)
+        if day.weekday() == employee.weekly_off:
+            day += timedelta(days=1)
+        ctx.call('post', '/api/leaves/apply/', employee, {
+            'leave_type': sick_leave.id,
+            'start_date': day.isoformat(),
+            'end_date': day.isoformat(),
+            'reason': 'Benchmark leave',
+        }, expect=201)
+
+
+def leave_review(ctx):
+    """Admin approves a pending leave request from every sampled employee in one call"""
+    from leaves.models import LeaveRequest, LeaveType
+    sick_leave = LeaveType.objects.get(code='SL')
+    day = ctx.today + timedelta(days=14)
+    pending = LeaveRequest.objects.bulk_create([
+        LeaveRequest(
+            user=employee, leave_type=sick_leave, start_date=day, end_date=day + timedelta(days=1),
+            total_days=2, paid_days=1, lop_days=1, reason='Benchmark leave'
+        )
+        for employee in ctx.employees
+    ])
+    ctx.call('post', '/api/leaves/bulk-review/', ctx.admin, {
+        'leave_ids': [leave_request.id for leave_request in pending],
+        'status': 'approved',
+    })
+
+
+def regularization_review(ctx):
+    """Admin approves a missed punch-out from every sampled employee in one call"""
+    from datetime import time
+    from attendance.models import RegularizationRequest
+    pending = RegularizationRequest.objects.bulk_create([
+        RegularizationRequest(
+            user=employee, date=ctx.today - timedelta(days=offset), request_type='forgot_punch',
+            requested_punch_in=time(10, 0), requested_punch_out=time(19, 0), reason='Benchmark regularization'
+        )
+        for employee in ctx.employees
+        for offset in (1, 2)
+    ])
+    ctx.call('post', '/api/attendance/regularization/bulk-review/', ctx.admin, {
+        'regularization_ids': [regularization.id for regularization in pending],
+        'status': 'approved',
+    })
+
+
+def balance_view(ctx):
+    """Every sampled employee opens their leave balance for the last full month"""
+    path = f'/api/leaves/my-balance/?year={ctx.report_year}&month={ctx.report_month}'
+    for employee in ctx.employees:
+        ctx.call('get', path, employee)
+
+
+def auto_punch_out(ctx):
+    """Cron auto punch-out with yesterday's sampled employees still punched in"""
+    from attendance.models import Attendance
+    Attendance.objects.filter(
+        user__in=ctx.employees,
+        date=ctx.today - timedelta(days=1),
+        punch_in__isnull=False
+    ).update(punch_out=None, working_hours=0, status='present')
+    ctx.call('get', '/api/attendance/cron/auto-punch-out/', ctx.admin)
+
+
+def bulk_attendance(ctx):
+    """Admin marks a whole department on leave for a week"""
+    start = ctx.today + timedelta(days=7)
+    ctx.call('post', '/api/attendance/admin/bulk-update/', ctx.admin, {
+        'entries': [{
+            'department': 'Engineering',
+            'start_date': start.isoformat(),
+            'end_date': (start + timedelta(days=6)).isoformat(),
+            'status': 'on_leave',
+            'notes': 'Benchmark offsite',
+        }],
+    })
+
+
+def year_end(ctx):
+    """Admin new-year reset (carry forward into next year)"""
+    ctx.call('post', '/api/leaves/new-year-reset/', ctx.admin, {'year': ctx.today.year + 1})
+
+
+# name -> scenario; the runner executes them in this order
+SCENARIOS = {
+    'punch_rush': punch_rush,
+    'month_report': month_report,
+    'exports': exports,
+    'leave_apply': leave_apply,
+    'leave_review': leave_review,
+    'regularization_review': regularization_review,
+    'balance_view': balance_view,
+    'auto_punch_out': auto_punch_out,
+    'bulk_attendance': bulk_attendance,
+    'year_end': year_end,
+}
+
+
+def reset_caches():
+    """Start every iteration cold - cached counters would outlive the rollback"""
+    clear_all()
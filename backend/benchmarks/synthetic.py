@@ -0,0 +1,425 @@
+"""
+Synthetic organisation generator for benchmarks.
+
+Builds a company of N employees with shifts, an office, holidays and
+`days` of history (attendance, leaves, balances, comp-offs, notifications
+and activity logs) using bulk inserts, so a year for a few hundred people
+takes seconds rather than hours.
+
+Everything is seeded, so the same arguments always produce the same org.
+Synthetic rows are tagged (mobile prefix, names) and clear_org() removes
+only those, leaving real data alone.
+"""
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import transaction
+
+from accounts.activity_utils import IST
+from accounts.dashboard_utils import get_india_date
+
+# Indian mobiles never start with 0, so these can't collide with real users
+SYNTHETIC_MOBILE_PREFIX = '000'
+SYNTHETIC_ADMIN_MOBILE = '0000000000'
+SYNTHETIC_PASSWORD = 'bench-pass-123'
+SYNTHETIC_OFFICE_NAME = 'Synthetic Office'
+SYNTHETIC_OFFICE_IP = '10.0.0.1'
+SYNTHETIC_HOLIDAY_PREFIX = 'Synthetic Holiday'
+
+# (name, start, end) - breaks are the model defaults (2-3 PM, 1 hour)
+SYNTHETIC_SHIFTS = (
+    ('Bench Morning', time(9, 0), time(18, 0)),
+    ('Bench Day', time(10, 0), time(19, 0)),
+    ('Bench Late', time(12, 0), time(21, 0)),
+)
+
+DEPARTMENTS = ('Engineering', 'Sales', 'Support', 'Operations', 'Finance', 'HR')
+
+HOLIDAYS_PER_YEAR = 10
+ABSENT_RATE = 0.03
+OFF_DAY_WORK_RATE = 0.08
+LEAVE_BLOCKS_PER_MONTH = 0.8
+NOTIFICATIONS_PER_EMPLOYEE = 20
+ACTIVITY_LOG_DAYS = 30
+
+BATCH_SIZE = 2000
+
+
+def employee_mobile(index):
+    """Mobile number of synthetic employee `index` (1-based)"""
+    return f'{SYNTHETIC_MOBILE_PREFIX}{index:07d}'
+
+
+def synthetic_users():
+    """Queryset of all synthetic users, admin included"""
+    from accounts.models import User
+    return User.objects.filter(mobile__startswith=SYNTHETIC_MOBILE_PREFIX)
+
+
+def synthetic_employees():
+    return synthetic_users().filter(role='employee').order_by('mobile')
+
+
+def get_synthetic_admin():
+    from accounts.models import User
+    return User.objects.filter(mobile=SYNTHETIC_ADMIN_MOBILE).first()
+
+
+def _ist_datetime(day, clock, minutes=0):
+    """Aware datetime for an IST wall-clock time plus an offset in minutes"""
+    return datetime.combine(day, clock, tzinfo=IST) + timedelta(minutes=minutes)
+
+
+def _working_hours(punch_in, punch_out):
+    """Hours worked minus the default 2-3 PM break, as Attendance.calculate_working_hours does"""
+    hours = (punch_out - punch_in).total_seconds() / 3600
+    if punch_in.astimezone(IST).time() < time(15, 0) and punch_out.astimezone(IST).time() > time(14, 0):
+        hours -= 1
+    return Decimal(str(round(max(0, hours), 2)))
+
+
+def _status_for_hours(hours):
+    from attendance.models import HALF_DAY_MAX_HOURS, HALF_DAY_MIN_HOURS
+    if hours >= HALF_DAY_MAX_HOURS:
+        return 'present'
+    if hours >= HALF_DAY_MIN_HOURS:
+        return 'half_day'
+    return 'absent'
+
+
+class SyntheticOrgBuilder:
+    """Generates one synthetic org; counts of created rows end up in `counts`"""
+
+    def __init__(self, employees=100, days=365, seed=42, log=None):
+        self.employee_count = employees
+        self.days = days
+        self.rng = random.Random(seed)
+        self.log = log or (lambda message: None)
+        self.counts = {}
+
+        self.end_date = get_india_date() - timedelta(days=1)
+        self.start_date = self.end_date - timedelta(days=days - 1)
+
+    def build(self):
+        with transaction.atomic():
+            self.create_leave_types()
+            self.create_shifts()
+            self.create_office()
+            self.create_holidays()
+            self.create_users()
+            self.create_history()
+            self.create_notifications()
+            self.create_activity_logs()
+        return self.counts
+
+    def create_leave_types(self):
+        from leaves.models import LeaveType
+        call_command('setup_leave_types', stdout=StringIO())
+        self.leave_types = {lt.code: lt for lt in LeaveType.objects.all()}
+
+    def create_shifts(self):
+        from attendance.models import Shift
+        self.shifts = []
+        for name, start, end in SYNTHETIC_SHIFTS:
+            shift, _ = Shift.objects.get_or_create(
+                name=name,
+                defaults={'start_time': start, 'end_time': end}
+            )
+            self.shifts.append(shift)
+
+    def create_office(self):
+        from attendance.models import OfficeLocation
+        self.office, _ = OfficeLocation.objects.get_or_create(
+            name=SYNTHETIC_OFFICE_NAME,
+            defaults={
+                'latitude': settings.OFFICE_LATITUDE,
+                'longitude': settings.OFFICE_LONGITUDE,
+                'radius_meters': 200,
+                'allowed_ips': SYNTHETIC_OFFICE_IP,
+            }
+        )
+
+    def create_holidays(self):
+        from leaves.models import Holiday
+        span = (self.end_date - self.start_date).days + 1
+        wanted = max(1, span * HOLIDAYS_PER_YEAR // 365)
+        candidates = self.rng.sample(range(span), min(wanted, span))
+        Holiday.objects.bulk_create(
+            [
+                Holiday(
+                    name=f'{SYNTHETIC_HOLIDAY_PREFIX} {index + 1}',
+                    date=self.start_date + timedelta(days=offset)
+                )
+                for index, offset in enumerate(sorted(candidates))
+            ],
+            ignore_conflicts=True
+        )
+        # Real holidays in the range count too - nobody works on those either
+        self.holidays = set(
+            Holiday.objects.filter(
+                date__gte=self.start_date, date__lte=self.end_date
+            ).values_list('date', flat=True)
+        )
+        self.counts['holidays'] = len(self.holidays)
+
+    def create_users(self):
+        from accounts.models import User
+        password = make_password(SYNTHETIC_PASSWORD)
+        joined = _ist_datetime(self.start_date - timedelta(days=30), time(10, 0))
+
+        self.admin = get_synthetic_admin()
+        if self.admin is None:
+            self.admin = User.objects.create(
+                mobile=SYNTHETIC_ADMIN_MOBILE,
+                name='Bench Admin',
+                role='admin',
+                is_admin=True,
+                is_staff=True,
+                password=password,
+                date_joined=joined,
+            )
+
+        new_users = []
+        for index in range(1, self.employee_count + 1):
+            new_users.append(User(
+                mobile=employee_mobile(index),
+                name=f'Bench Employee {index:05d}',
+                role='employee',
+                department=self.rng.choice(DEPARTMENTS),
+                designation='Associate',
+                weekly_off=6 if self.rng.random() < 0.8 else self.rng.randrange(7),
+                shift=self.rng.choice(self.shifts),
+                password=password,
+                date_joined=joined,
+            ))
+        User.objects.bulk_create(new_users, batch_size=BATCH_SIZE)
+        self.employees = list(
+            synthetic_employees().select_related('shift')[:self.employee_count]
+        )
+        self.counts['employees'] = len(self.employees)
+
+    def plan_leave_days(self):
+        """Random 1-3 day leave blocks on working days, per employee"""
+        months = max(1, self.days // 30)
+        plan = {}
+        for employee in self.employees:
+            blocks = []
+            for _ in range(int(months * LEAVE_BLOCKS_PER_MONTH)):
+                start = self.start_date + timedelta(days=self.rng.randrange(self.days))
+                length = self.rng.choice((1, 1, 1, 2, 3))
+                block = [
+                    start + timedelta(days=offset) for offset in range(length)
+                    if start + timedelta(days=offset) <= self.end_date
+                ]
+                if any(day.weekday() == employee.weekly_off or day in self.holidays for day in block):
+                    continue
+                if any(day in taken for day in block for taken in blocks):
+                    continue
+                blocks.append(block)
+            plan[employee.id] = blocks
+        return plan
+
+    def create_history(self):
+        from attendance.models import Attendance, CompOff
+        from leaves.models import LeaveBalance, LeaveRequest
+
+        leave_plan = self.plan_leave_days()
+        sick_leave = self.leave_types['SL']
+        reviewed_on = _ist_datetime(self.end_date, time(18, 0))
+
+        attendances = []
+        comp_off_days = []
+        leave_requests = []
+        sick_used = {}
+
+        for employee in self.employees:
+            shift = employee.shift
+            leave_days = set()
+            for block in leave_plan[employee.id]:
+                leave_days.update(block)
+                # One sick leave a month is paid, the rest is loss of pay
+                month_key = (employee.id, block[0].year, block[0].month)
+                paid = 1 if not sick_used.get(month_key) else 0
+                sick_used[month_key] = sick_used.get(month_key, 0) + paid
+                lop = len(block) - paid
+                leave_requests.append(LeaveRequest(
+                    user=employee,
+                    leave_type=sick_leave,
+                    start_date=block[0],
+                    end_date=block[-1],
+                    total_days=len(block),
+                    paid_days=paid,
+                    lop_days=lop,
+                    is_lop=lop > 0,
+                    reason='Synthetic leave',
+                    status='approved',
+                    reviewed_by=self.admin,
+                    reviewed_on=reviewed_on,
+                ))
+
+            day = self.start_date
+            while day <= self.end_date:
+                is_off = day.weekday() == employee.weekly_off or day in self.holidays
+                if day in leave_days:
+                    attendances.append(Attendance(user=employee, date=day, status='on_leave'))
+                elif is_off:
+                    if self.rng.random() < OFF_DAY_WORK_RATE:
+                        attendances.append(self.worked_day(employee, shift, day, is_off_day=True))
+                        comp_off_days.append(len(attendances) - 1)
+                elif self.rng.random() < ABSENT_RATE:
+                    attendances.append(Attendance(user=employee, date=day, status='absent'))
+                else:
+                    attendances.append(self.worked_day(employee, shift, day))
+                day += timedelta(days=1)
+
+        Attendance.objects.bulk_create(attendances, batch_size=BATCH_SIZE)
+        LeaveRequest.objects.bulk_create(leave_requests, batch_size=BATCH_SIZE)
+        self.counts['attendance'] = len(attendances)
+        self.counts['leave_requests'] = len(leave_requests)
+        self.log(f'  {len(attendances)} attendance rows, {len(leave_requests)} leave requests')
+
+        comp_offs = []
+        for index in comp_off_days:
+            attendance = attendances[index]
+            if attendance.working_hours < 4:
+                continue
+            used = self.rng.random() < 0.4
+            comp_offs.append(CompOff(
+                user=attendance.user,
+                earned_date=attendance.date,
+                earned_hours=attendance.working_hours,
+                credit_days=Decimal('1.0') if attendance.working_hours >= 6 else Decimal('0.5'),
+                reason='Weekly Off Work',
+                status='used' if used else 'earned',
+                used_date=min(attendance.date + timedelta(days=14), self.end_date) if used else None,
+                expires_on=attendance.date.replace(month=12, day=31),
+                attendance=attendance,
+            ))
+        CompOff.objects.bulk_create(comp_offs, batch_size=BATCH_SIZE)
+        self.counts['comp_offs'] = len(comp_offs)
+
+        # Monthly balances as the views create them: SL gets 1 a month, the rest 0
+        balances = []
+        months = sorted({(day.year, day.month) for day in (
+            self.start_date + timedelta(days=offset) for offset in range(self.days)
+        )})
+        for employee in self.employees:
+            for year, month in months:
+                for code, leave_type in self.leave_types.items():
+                    used = sick_used.get((employee.id, year, month), 0) if code == 'SL' else 0
+                    balances.append(LeaveBalance(
+                        user=employee,
+                        leave_type=leave_type,
+                        year=year,
+                        month=month,
+                        total_leaves=1 if code == 'SL' else 0,
+                        used_leaves=used,
+                    ))
+        LeaveBalance.objects.bulk_create(balances, batch_size=BATCH_SIZE, ignore_conflicts=True)
+        self.counts['leave_balances'] = len(balances)
+
+    def worked_day(self, employee, shift, day, is_off_day=False):
+        from attendance.models import Attendance
+        punch_in = _ist_datetime(day, shift.start_time, self.rng.randint(-20, 45))
+        punch_out = _ist_datetime(day, shift.end_time, self.rng.randint(-90, 60))
+        if is_off_day:
+            punch_out -= timedelta(hours=self.rng.choice((0, 3)))
+        hours = _working_hours(punch_in, punch_out)
+        return Attendance(
+            user=employee,
+            date=day,
+            punch_in=punch_in,
+            punch_out=punch_out,
+            punch_in_latitude=Decimal(str(settings.OFFICE_LATITUDE)),
+            punch_in_longitude=Decimal(str(settings.OFFICE_LONGITUDE)),
+            punch_in_ip=SYNTHETIC_OFFICE_IP,
+            punch_out_ip=SYNTHETIC_OFFICE_IP,
+            working_hours=hours,
+            status=_status_for_hours(hours),
+            is_off_day=is_off_day,
+        )
+
+    def create_notifications(self):
+        from accounts.models import Notification
+        kinds = (
+            ('leave_approved', 'Leave Approved', 'Your leave request has been approved.'),
+            ('holiday', 'Upcoming Holiday', 'The office is closed on the next holiday.'),
+            ('wfh_approved', 'WFH Approved', 'Your work from home request has been approved.'),
+            ('system', 'Reminder', 'Please remember to punch out before leaving.'),
+        )
+        notifications = []
+        for employee in self.employees:
+            for _ in range(NOTIFICATIONS_PER_EMPLOYEE):
+                notification_type, title, message = self.rng.choice(kinds)
+                notifications.append(Notification(
+                    user=employee,
+                    title=title,
+                    message=message,
+                    notification_type=notification_type,
+                    is_read=self.rng.random() < 0.7,
+                ))
+        Notification.objects.bulk_create(notifications, batch_size=BATCH_SIZE)
+        self.counts['notifications'] = len(notifications)
+
+    def create_activity_logs(self):
+        from accounts.activity_utils import get_actor_snapshot
+        from accounts.models import ActivityLog
+        from attendance.models import Attendance
+
+        since = self.end_date - timedelta(days=ACTIVITY_LOG_DAYS - 1)
+        snapshots = {employee.id: get_actor_snapshot(employee) for employee in self.employees}
+        rows = Attendance.objects.filter(
+            user__in=self.employees, date__gte=since, punch_in__isnull=False
+        ).values_list('id', 'user_id', 'user__name')
+
+        logs = []
+        for attendance_id, user_id, name in rows.iterator(chunk_size=BATCH_SIZE):
+            actor_name, actor_photo_url = snapshots[user_id]
+            for activity_type, verb in (('punch_in', 'punched in'), ('punch_out', 'punched out')):
+                logs.append(ActivityLog(
+                    actor_id=user_id,
+                    target_user_id=user_id,
+                    actor_name=actor_name,
+                    actor_photo_url=actor_photo_url,
+                    activity_type=activity_type,
+                    category='attendance',
+                    title=f'{name} {verb}',
+                    related_model='Attendance',
+                    related_id=attendance_id,
+                    ip_address=SYNTHETIC_OFFICE_IP,
+                ))
+        ActivityLog.objects.bulk_create(logs, batch_size=BATCH_SIZE)
+        self.counts['activity_logs'] = len(logs)
+
+
+def generate_org(employees=100, days=365, seed=42, log=None):
+    """Create a synthetic org and return the number of rows created per table"""
+    return SyntheticOrgBuilder(employees=employees, days=days, seed=seed, log=log).build()
+
+
+def clear_org():
+    """Delete every synthetic row; returns the number deleted per table"""
+    from accounts.models import ActivityLog
+    from attendance.models import OfficeLocation, Shift
+    from leaves.models import Holiday
+
+    counts = {}
+    with transaction.atomic():
+        # Activity logs only SET_NULL their actor, so they go first;
+        # attendance, leaves, balances, comp-offs and notifications cascade
+        users = synthetic_users()
+        for queryset in (
+            ActivityLog.objects.filter(actor__in=users),
+            users,
+            Holiday.objects.filter(name__startswith=SYNTHETIC_HOLIDAY_PREFIX),
+            OfficeLocation.objects.filter(name=SYNTHETIC_OFFICE_NAME),
+            Shift.objects.filter(name__in=[name for name, _, _ in SYNTHETIC_SHIFTS]),
+        ):
+            _, deleted = queryset.delete()
+            counts.update(deleted)
+    return counts
@@ -10,3 +10,6 @@ python manage.py collectstatic --no-input
 
 # Run migrations
 python manage.py migrate
+
+# Cache table (only used when CACHE_L2=db)
+python manage.py createcachetable
@@ -0,0 +1,260 @@
+"""
+Two-tier cache.
+
+L1 is a bounded LRU with per-entry expiry inside each process. L2 is the
+shared Django cache (CACHES['default']: Redis when REDIS_URL is set,
+otherwise the file-based or database cache), so every worker and cron
+process sees the same data.
+
+Code uses a Namespace instead of raw keys:
+
+    shifts = Namespace('shift_policies', ttl=60 * 60, l1_ttl=30)
+    policies = shifts.get_or_set('all', load_policies)
+    shifts.invalidate()   # bump the version; every key in it is dropped at once
+
+Keys are stored as '<namespace>:<version>:<key>'. The namespace version
+lives in L2 and is cached in L1 for l1_ttl seconds, so after another
+process invalidates, this one stops serving its old L1 entries within
+that window. Namespaces that hold counters or locks (incr/add) pass
+l1_ttl=0 and go to L2 every time.
+
+L1 hands out the stored object itself - treat cached values as read-only.
+Hits and misses per namespace and tier are reported by cache_stats().
+"""
+import random
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache as l2_cache
+
+_MISSING = object()
+# ttl argument meaning "the namespace's ttl" (None means never expire)
+DEFAULT_TTL = object()
+
+STAT_FIELDS = ('l1_hits', 'l2_hits', 'misses', 'sets')
+
+
+class LRUCache:
+    """Bounded in-process LRU with per-entry expiry, thread safe"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=_MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+l1_cache = LRUCache(getattr(settings, 'CACHE_L1_MAX_ENTRIES', 5000))
+
+_stats_lock = threading.Lock()
+_stats = defaultdict(lambda: dict.fromkeys(STAT_FIELDS, 0))
+
+
+def _count(namespace, field, n=1):
+    if n:
+        with _stats_lock:
+            _stats[namespace][field] += n
+
+
+class Namespace:
+    """A group of cache keys sharing timeouts, a version and statistics"""
+
+    def __init__(self, name, ttl=300, l1_ttl=5, versioned=True):
+        self.name = name
+        self.ttl = ttl
+        self.l1_ttl = l1_ttl
+        self.versioned = versioned
+        self._version_key = f'cache_version:{name}'
+
+    # Keys
+
+    def version(self):
+        """Current namespace version (None when not versioned)"""
+        if not self.versioned:
+            return None
+        if self.l1_ttl:
+            version = l1_cache.get(self._version_key)
+            if version is not _MISSING:
+                return version
+        version = l2_cache.get(self._version_key)
+        if version is None:
+            # Start from an unguessable value so keys written under a lost
+            # counter can't be mistaken for current ones
+            l2_cache.add(self._version_key, random.getrandbits(48), None)
+            version = l2_cache.get(self._version_key)
+        if self.l1_ttl:
+            l1_cache.set(self._version_key, version, self.l1_ttl)
+        return version
+
+    def make_key(self, key, version=_MISSING):
+        if version is _MISSING:
+            version = self.version()
+        if version is None:
+            return f'{self.name}:{key}'
+        return f'{self.name}:{version}:{key}'
+
+    # Reads
+
+    def get(self, key, default=None):
+        full_key = self.make_key(key)
+        if self.l1_ttl:
+            value = l1_cache.get(full_key)
+            if value is not _MISSING:
+                _count(self.name, 'l1_hits')
+                return value
+        value = l2_cache.get(full_key, _MISSING)
+        if value is _MISSING:
+            _count(self.name, 'misses')
+            return default
+        _count(self.name, 'l2_hits')
+        if self.l1_ttl:
+            l1_cache.set(full_key, value, self.l1_ttl)
+        return value
+
+    def get_many(self, keys):
+        """{key: value} for the keys that are cached"""
+        version = self.version()
+        full_keys = {self.make_key(key, version): key for key in keys}
+        found = {}
+        if self.l1_ttl:
+            for full_key, key in full_keys.items():
+                value = l1_cache.get(full_key)
+                if value is not _MISSING:
+                    found[key] = value
+        _count(self.name, 'l1_hits', len(found))
+
+        remaining = [full_key for full_key, key in full_keys.items() if key not in found]
+        if remaining:
+            from_l2 = l2_cache.get_many(remaining)
+            for full_key, value in from_l2.items():
+                found[full_keys[full_key]] = value
+                if self.l1_ttl:
+                    l1_cache.set(full_key, value, self.l1_ttl)
+            _count(self.name, 'l2_hits', len(from_l2))
+            _count(self.name, 'misses', len(remaining) - len(from_l2))
+        return found
+
+    def get_or_set(self, key, default_func, ttl=DEFAULT_TTL):
+        """Cached value, or default_func() stored and returned on a miss"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = default_func()
+            self.set(key, value, ttl)
+        return value
+
+    # Writes
+
+    def _ttl(self, ttl):
+        return self.ttl if ttl is DEFAULT_TTL else ttl
+
+    def _l1_ttl(self, ttl):
+        return self.l1_ttl if ttl is None else min(self.l1_ttl, ttl)
+
+    def set(self, key, value, ttl=DEFAULT_TTL):
+        full_key = self.make_key(key)
+        ttl = self._ttl(ttl)
+        l2_cache.set(full_key, value, ttl)
+        if self.l1_ttl:
+            l1_cache.set(full_key, value, self._l1_ttl(ttl))
+        _count(self.name, 'sets')
+
+    def set_many(self, mapping, ttl=DEFAULT_TTL):
+        version = self.version()
+        ttl = self._ttl(ttl)
+        data = {self.make_key(key, version): value for key, value in mapping.items()}
+        l2_cache.set_many(data, ttl)
+        if self.l1_ttl:
+            for full_key, value in data.items():
+                l1_cache.set(full_key, value, self._l1_ttl(ttl))
+        _count(self.name, 'sets', len(data))
+
+    def add(self, key, value, ttl=DEFAULT_TTL):
+        """Set only if absent in L2; returns whether it was set"""
+        added = l2_cache.add(self.make_key(key), value, self._ttl(ttl))
+        if added:
+            _count(self.name, 'sets')
+        return added
+
+    def incr(self, key, delta=1):
+        """Increment in L2; raises ValueError if the key isn't cached"""
+        full_key = self.make_key(key)
+        if self.l1_ttl:
+            l1_cache.delete(full_key)
+        return l2_cache.incr(full_key, delta)
+
+    def delete(self, key):
+        full_key = self.make_key(key)
+        l1_cache.delete(full_key)
+        l2_cache.delete(full_key)
+
+    def delete_many(self, keys):
+        version = self.version()
+        full_keys = [self.make_key(key, version) for key in keys]
+        for full_key in full_keys:
+            l1_cache.delete(full_key)
+        l2_cache.delete_many(full_keys)
+
+    def invalidate(self):
+        """Drop every key in the namespace by moving to a new version"""
+        if not self.versioned:
+            raise ValueError(f"Cache namespace '{self.name}' is not versioned")
+        try:
+            version = l2_cache.incr(self._version_key)
+        except ValueError:
+            self.version()
+            version = l2_cache.incr(self._version_key)
+        if self.l1_ttl:
+            l1_cache.set(self._version_key, version, self.l1_ttl)
+        return version
+
+
+def cache_stats():
+    """Hit/miss counters per namespace, with the overall hit rate"""
+    with _stats_lock:
+        stats = {name: dict(counts) for name, counts in _stats.items()}
+    for counts in stats.values():
+        lookups = counts['l1_hits'] + counts['l2_hits'] + counts['misses']
+        counts['hit_rate'] = round((counts['l1_hits'] + counts['l2_hits']) / lookups, 3) if lookups else None
+    return {'l1_entries': len(l1_cache), 'namespaces': stats}
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def clear_all():
+    """Empty both tiers (this process's L1 and the shared L2)"""
+    l1_cache.clear()
+    l2_cache.clear()
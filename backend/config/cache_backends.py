@@ -0,0 +1,145 @@
+"""
+Shared cache backends with atomic add() and incr().
+
+Django's file and database caches implement add() as check-then-set and
+incr() as get-then-set, so two workers can both "win" the same lock or
+lose an increment. The cache layer relies on both being atomic: dashboard
+counters, punch idempotency markers, single-flight locks, face-index
+versions and data version counters (config/versions.py).
+
+- AtomicFileBasedCache holds an exclusive flock() on a lock file for the
+  key while it checks and writes, which serializes every thread and
+  process on the host (the file cache is single-host anyway).
+- AtomicDatabaseCache locks the key's row with SELECT ... FOR UPDATE; a
+  concurrent INSERT of a new key loses on the primary key. SQLite has no
+  row locks; the development settings open its transactions IMMEDIATE,
+  which serializes them instead.
+
+Both keep an existing key's expiry on incr(), as Redis and LocMemCache do,
+instead of resetting it to the default timeout. The Redis backend needs
+nothing extra: SET NX and INCR are atomic.
+"""
+import base64
+import os
+import pickle
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db import DatabaseError, connections, models, router, transaction
+from django.utils.timezone import now as tz_now
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are serialized
+    fcntl = None
+
+LOCK_STRIPES = 64
+
+
+class AtomicFileBasedCache(FileBasedCache):
+    """FileBasedCache whose add() and incr() hold an exclusive lock on the key"""
+
+    _thread_lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self, fname):
+        self._createdir()
+        # A fixed set of lock files: clear() and culling never see them
+        stripe = zlib.crc32(os.path.basename(fname).encode()) % LOCK_STRIPES
+        with open(os.path.join(self._dir, f'.lock-{stripe}'), 'ab') as lock_file:
+            if fcntl is None:
+                with self._thread_lock:
+                    yield
+                return
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked(self._key_to_file(key, version)):
+            if self.has_key(key, version):
+                return False
+            self.set(key, value, timeout, version)
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        fname = self._key_to_file(key, version)
+        with self._locked(fname):
+            try:
+                with open(fname, 'rb') as f:
+                    expiry = pickle.load(f)
+                    if expiry is not None and expiry < time.time():
+                        raise ValueError(f"Key '{key}' not found")
+                    value = pickle.loads(zlib.decompress(f.read()))
+            except FileNotFoundError:
+                raise ValueError(f"Key '{key}' not found")
+            new_value = value + delta
+            timeout = None if expiry is None else expiry - time.time()
+            self.set(key, new_value, timeout, version)
+            return new_value
+
+
+class AtomicDatabaseCache(DatabaseCache):
+    """DatabaseCache whose add() and incr() lock the key's row"""
+
+    def _locked_row(self, cursor, connection, key):
+        """(value, expires) of an unexpired row, locked until the transaction ends"""
+        quote_name = connection.ops.quote_name
+        sql = 'SELECT %s, %s FROM %s WHERE %s = %%s' % (
+            quote_name('value'), quote_name('expires'), quote_name(self._table), quote_name('cache_key'),
+        )
+        if connection.features.has_select_for_update:
+            sql += ' FOR UPDATE'
+        cursor.execute(sql, [key])
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        value, expires = row
+        expression = models.Expression(output_field=models.DateTimeField())
+        for converter in connection.ops.get_db_converters(expression) + expression.get_db_converters(connection):
+            expires = converter(expires, expression, connection)
+        if expires < tz_now():
+            return None
+        value = pickle.loads(base64.b64decode(connection.ops.process_clob(value).encode()))
+        return value, expires
+
+    def _encode(self, value):
+        return base64.b64encode(pickle.dumps(value, self.pickle_protocol)).decode('latin1')
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        db_key = self.make_and_validate_key(key, version=version)
+        db = router.db_for_write(self.cache_model_class)
+        connection = connections[db]
+        try:
+            with transaction.atomic(using=db), connection.cursor() as cursor:
+                if self._locked_row(cursor, connection, db_key) is not None:
+                    return False
+                # An expired row is replaced; a concurrent insert fails on the key
+                return self._base_set('set', db_key, value, timeout)
+        except DatabaseError:
+            return False
+
+    def incr(self, key, delta=1, version=None):
+        db_key = self.make_and_validate_key(key, version=version)
+        db = router.db_for_write(self.cache_model_class)
+        connection = connections[db]
+        quote_name = connection.ops.quote_name
+        with transaction.atomic(using=db), connection.cursor() as cursor:
+            row = self._locked_row(cursor, connection, db_key)
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            new_value = row[0] + delta
+            cursor.execute(
+                'UPDATE %s SET %s = %%s WHERE %s = %%s' % (
+                    quote_name(self._table), quote_name('value'), quote_name('cache_key'),
+                ),
+                [self._encode(new_value), db_key],
+            )
+        return new_value
@@ -0,0 +1,280 @@
+"""
+Per-request instrumentation.
+
+Records query count, DB time, serializer time, render time and total time
+for every request, keyed by URL name. Recent samples are kept in memory so
+the admin metrics endpoint can report p50/p95/p99, and each response gets
+a Server-Timing header that shows up in the browser dev tools.
+
+Views can declare a query budget with a `query_budget` class attribute (or
+via settings.QUERY_BUDGETS keyed by URL name). Going over budget logs a
+warning, and raises QueryBudgetExceeded when QUERY_BUDGET_ENFORCE is on -
+which it is under the test runner, so an N+1 regression fails the suite.
+"""
+import contextvars
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.renderers import JSONRenderer
+
+logger = logging.getLogger(__name__)
+
+# Samples kept per URL name for percentile reporting
+SAMPLES_PER_ENDPOINT = 1000
+
+METRIC_FIELDS = ('total_ms', 'db_ms', 'queries', 'serialize_ms', 'render_ms')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A view ran more queries than its declared budget"""
+
+
+class RequestMetrics:
+    """Counters for the request currently being handled"""
+    __slots__ = ('queries', 'db_time', 'serialize_time', 'render_time', 'query_budget')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.render_time = 0.0
+        self.query_budget = None
+
+
+_current_metrics = contextvars.ContextVar('request_metrics', default=None)
+
+
+def current_metrics():
+    """Metrics for the request being handled, or None outside a request"""
+    return _current_metrics.get()
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper - counts queries and time for the current request"""
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - start
+        metrics.queries += 1
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+connection_created.connect(_on_connection_created)
+
+
+@contextmanager
+def timed(bucket):
+    """Add the time spent in the block to the current request's bucket"""
+    metrics = _current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(metrics, bucket, getattr(metrics, bucket) + time.perf_counter() - start)
+
+
+class MetricsRegistry:
+    """Recent per-endpoint samples, thread safe"""
+
+    def __init__(self, maxlen=SAMPLES_PER_ENDPOINT):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=maxlen))
+        self._counts = defaultdict(int)
+        self._budget_violations = defaultdict(int)
+        self._extra = defaultdict(lambda: deque(maxlen=maxlen))
+
+    def record(self, name, sample, over_budget=False):
+        with self._lock:
+            self._samples[name].append(sample)
+            self._counts[name] += 1
+            if over_budget:
+                self._budget_violations[name] += 1
+
+    def record_value(self, name, value):
+        """Record a free-standing measurement (e.g. background job latency)"""
+        with self._lock:
+            self._extra[name].append(value)
+
+    def snapshot(self):
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+            counts = dict(self._counts)
+            violations = dict(self._budget_violations)
+            extra = {name: list(values) for name, values in self._extra.items()}
+
+        endpoints = {}
+        for name, rows in samples.items():
+            stats = {'requests': counts[name], 'budget_violations': violations.get(name, 0)}
+            for index, field in enumerate(METRIC_FIELDS):
+                stats[field] = percentiles([row[index] for row in rows])
+            endpoints[name] = stats
+        return {
+            'endpoints': endpoints,
+            'measurements': {name: percentiles(values) for name, values in extra.items()},
+        }
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._budget_violations.clear()
+            self._extra.clear()
+
+
+def percentiles(values):
+    """Nearest-rank p50/p95/p99 and max of a list of numbers"""
+    if not values:
+        return {'p50': 0, 'p95': 0, 'p99': 0, 'max': 0}
+    ordered = sorted(values)
+    last = len(ordered) - 1
+
+    def rank(p):
+        return round(ordered[min(last, int(p * len(ordered)))], 2)
+
+    return {'p50': rank(0.50), 'p95': rank(0.95), 'p99': rank(0.99), 'max': round(ordered[-1], 2)}
+
+
+registry = MetricsRegistry()
+
+
+def get_query_budget(view_class, url_name):
+    """Budget from the view class, falling back to settings.QUERY_BUDGETS"""
+    budget = getattr(view_class, 'query_budget', None)
+    if budget is None:
+        budget = getattr(settings, 'QUERY_BUDGETS', {}).get(url_name)
+    return budget
+
+
+class InstrumentationMiddleware:
+    """Measure each request and attach a Server-Timing header"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        # Sync views run via sync_to_async, which copies this context, so
+        # queries on the worker thread still land in these metrics
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        return self.finish(request, response, metrics, start)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current_metrics.get()
+        if metrics is not None:
+            view_class = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None)
+            url_name = request.resolver_match.url_name if request.resolver_match else None
+            metrics.query_budget = get_query_budget(view_class, url_name)
+        return None
+
+    def finish(self, request, response, metrics, start):
+        total = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return response
+        name = match.url_name or match.route
+
+        db_ms = metrics.db_time * 1000
+        serialize_ms = metrics.serialize_time * 1000
+        render_ms = metrics.render_time * 1000
+        total_ms = total * 1000
+
+        budget = metrics.query_budget
+        over_budget = budget is not None and metrics.queries > budget
+        registry.record(
+            name,
+            (total_ms, db_ms, metrics.queries, serialize_ms, render_ms),
+            over_budget=over_budget
+        )
+
+        response['Server-Timing'] = (
+            f'db;dur={db_ms:.1f};desc="{metrics.queries} queries", '
+            f'serialize;dur={serialize_ms:.1f}, '
+            f'render;dur={render_ms:.1f}, '
+            f'total;dur={total_ms:.1f}'
+        )
+
+        if over_budget:
+            message = f'{name} ran {metrics.queries} queries (budget {budget})'
+            if getattr(settings, 'QUERY_BUDGET_ENFORCE', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSONRenderer that records render time for the current request"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('render_time'):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class InstrumentedViewMixin:
+    """
+    DRF view mixin that times serializer output.
+
+    Serializers handed out by get_serializer() record the time spent in
+    their top-level to_representation; hand-written views can wrap their own
+    serializer calls in `with self.timed_serialization():`.
+    """
+    query_budget = None
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        to_representation = serializer.to_representation
+
+        def timed_to_representation(instance):
+            with timed('serialize_time'):
+                return to_representation(instance)
+
+        serializer.to_representation = timed_to_representation
+        return serializer
+
+    def timed_serialization(self):
+        return timed('serialize_time')
@@ -3,10 +3,13 @@ Django settings for config project.
 """
 
 import os
+import sys
+import tempfile
 from pathlib import Path
 from datetime import timedelta
 import dj_database_url
 import cloudinary
+from corsheaders.defaults import default_headers
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -39,9 +42,11 @@ INSTALLED_APPS = [
     'accounts',
     'attendance',
     'leaves',
+    'benchmarks',
 ]
 
 MIDDLEWARE = [
+    'config.instrumentation.InstrumentationMiddleware',  # Query count / timing metrics
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Add whitenoise
@@ -72,14 +77,17 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
 
 # Database - Use PostgreSQL in production, SQLite in development
 DATABASE_URL = os.environ.get('DATABASE_URL')
 if DATABASE_URL:
     DATABASES = {
+        # The API (WSGI) keeps connections open. The live board stream
+        # service runs under ASGI, where Django requires CONN_MAX_AGE=0
         'default': dj_database_url.config(
             default=DATABASE_URL,
-            conn_max_age=600,
+            conn_max_age=int(os.environ.get('CONN_MAX_AGE', '600')),
             conn_health_checks=True,
         )
     }
@@ -88,6 +96,10 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # Take the write lock when a transaction starts, so concurrent
+            # read-then-write transactions (e.g. CACHE_L2=db counters) wait
+            # for each other instead of failing with "database is locked"
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
         }
     }
 
@@ -121,27 +133,61 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
+        'config.instrumentation.TimedJSONRenderer',
     ),
     # Pagination for better performance on free tier
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
 }
 
-# Cache settings (using local memory for free tier)
-CACHES = {
-    'default': {
+# Request instrumentation (see config/instrumentation.py)
+# Views declare `query_budget`; budgets here are keyed by URL name.
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+QUERY_BUDGET_ENFORCE = TESTING or os.environ.get('QUERY_BUDGET_ENFORCE', 'False') == 'True'
+QUERY_BUDGETS = {}
+
+# Cache: code goes through config/cache.py namespaces - an in-process LRU
+# (L1) in front of this shared cache (L2). CACHE_L2 picks the shared store:
+# 'redis' (REDIS_URL), 'file' (one host, no extra service) or 'db' (also
+# reaches cron jobs running on other machines; run createcachetable). The
+# file and db backends come from config/cache_backends.py, whose add() and
+# incr() are atomic like Redis's - counters and locks depend on that.
+REDIS_URL = os.environ.get('REDIS_URL', '')
+CACHE_L2 = os.environ.get('CACHE_L2', 'redis' if REDIS_URL else 'file')
+CACHE_L2_BACKENDS = {
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    },
+    'file': {
+        'BACKEND': 'config.cache_backends.AtomicFileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'attendance-cache')),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+    'db': {
+        'BACKEND': 'config.cache_backends.AtomicDatabaseCache',
+        'LOCATION': 'django_cache',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+    # Per-process, for the test runner
+    'local': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'unique-snowflake',
+    },
+}
+CACHES = {
+    'default': {
+        **CACHE_L2_BACKENDS['local' if TESTING else CACHE_L2],
         'TIMEOUT': 300,  # 5 minutes
     }
 }
+CACHE_L1_MAX_ENTRIES = int(os.environ.get('CACHE_L1_MAX_ENTRIES', '5000'))
 
 # JWT Settings
 SIMPLE_JWT = {
@@ -159,6 +205,9 @@ CORS_ALLOWED_ORIGINS = os.environ.get(
 # Allow all origins on Render (production) to avoid CORS issues
 CORS_ALLOW_ALL_ORIGINS = DEBUG or bool(os.environ.get('RENDER'))
 CORS_ALLOW_CREDENTIALS = True
+# Punch requests carry a client-generated key so retries are replayed, and
+# kiosk devices authenticate with their own key
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key', 'x-kiosk-key')
 
 # Office Location Settings (GPS)
 OFFICE_LATITUDE = float(os.environ.get('OFFICE_LATITUDE', '28.6139'))
@@ -168,11 +217,42 @@ OFFICE_RADIUS_METERS = int(os.environ.get('OFFICE_RADIUS_METERS', '50'))
 # Allowed Office IPs (for IP-based validation)
 ALLOWED_OFFICE_IPS = os.environ.get('ALLOWED_OFFICE_IPS', '127.0.0.1,49.205.145.158,49.205.148.237,115.246.216.11').split(',')
 
+# Face verification on punch-in: 'client' trusts the app's face_verified flag,
+# 'server' requires the live descriptor and compares it here (accounts/face_utils.py)
+FACE_VERIFICATION_MODE = os.environ.get('FACE_VERIFICATION_MODE', 'client')
+# Euclidean distance below which two descriptors are the same face (face-api.js uses 0.6)
+FACE_MATCH_THRESHOLD = float(os.environ.get('FACE_MATCH_THRESHOLD', '0.6'))
+# Kiosk punch-in (1:N identification): stricter cut-off, and the runner-up must
+# be at least this much further away when it is also under the cut-off
+FACE_IDENTIFY_THRESHOLD = float(os.environ.get('FACE_IDENTIFY_THRESHOLD', '0.5'))
+FACE_IDENTIFY_MARGIN = float(os.environ.get('FACE_IDENTIFY_MARGIN', '0.05'))
+# Shared kiosk devices send one of these in the X-Kiosk-Key header
+KIOSK_API_KEYS = [key for key in os.environ.get('KIOSK_API_KEYS', '').split(',') if key]
+# detect_duplicate_faces flags two accounts whose enrolled faces are closer than this
+FACE_DUPLICATE_THRESHOLD = float(os.environ.get('FACE_DUPLICATE_THRESHOLD', '0.4'))
+
 # Leave Settings
 ANNUAL_CASUAL_LEAVE = 12
 ANNUAL_SICK_LEAVE = 6
 ANNUAL_EARNED_LEAVE = 15
 MAX_CARRY_FORWARD_EARNED_LEAVE = 30
+# Shrink/split multi-day leaves after a punch-in commits instead of inside it.
+# Off by default: the deferred job runs in a thread, and nothing retries it
+# if the process goes away first
+LEAVE_ADJUST_DEFER = os.environ.get('LEAVE_ADJUST_DEFER', 'False') == 'True'
+
+# Photo uploads are compressed off-request in a process pool (accounts/image_utils.py).
+# Raw uploads wait in the staging dir until then; inline mode compresses in
+# the committing thread instead (used by the test runner).
+IMAGE_PIPELINE_WORKERS = int(os.environ.get('IMAGE_PIPELINE_WORKERS', '2'))
+IMAGE_PIPELINE_INLINE = TESTING or os.environ.get('IMAGE_PIPELINE_INLINE', 'False') == 'True'
+IMAGE_STAGING_DIR = os.environ.get('IMAGE_STAGING_DIR', os.path.join(tempfile.gettempdir(), 'attendance-uploads'))
+
+# Monthly reports and exports (attendance/report_utils.py) are computed by one
+# request at a time and cached for REPORT_CACHE_TTL seconds, then served
+# stale for up to REPORT_CACHE_STALE_TTL more while being recomputed.
+REPORT_CACHE_TTL = int(os.environ.get('REPORT_CACHE_TTL', '120'))
+REPORT_CACHE_STALE_TTL = int(os.environ.get('REPORT_CACHE_STALE_TTL', '600'))
 
 # Email Settings (Brevo SMTP with SSL)
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -0,0 +1,132 @@
+"""
+Single-flight caching for expensive computations.
+
+When a cached report expires while several admins have it open, every
+request would otherwise recompute it at once. single_flight() makes one of
+them do the work:
+
+    rows = single_flight(report_cache, 'attendance:2025:3', build_report, ttl=120, stale_ttl=600)
+
+- The first request to miss takes a lock in the shared cache (add() is
+  atomic in each configured L2 backend, see config/cache_backends.py) and
+  computes; the others poll the shared cache until the value appears, so
+  all workers wait on one computation.
+- Fresh lifetimes are jittered by +-JITTER so entries written together
+  don't all expire in the same second.
+- With stale_ttl, an expired value is kept that much longer and served
+  while one request recomputes it in a background thread
+  (stale-while-revalidate).
+- `tag` (e.g. a config.versions tag) is stored with the value. A value
+  with another tag is known to be outdated and is never served, stale or
+  not; it is recomputed like a miss.
+
+If the lock holder dies, its lock expires after lock_timeout; a waiter
+that gives up after `wait` seconds computes for itself instead of failing.
+Time spent waiting is recorded as single_flight.wait_ms in the metrics
+registry.
+"""
+import logging
+import random
+import threading
+import time
+import uuid
+
+from django.core.cache import cache as l2_cache
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+JITTER = 0.1
+LOCK_TIMEOUT = 60
+WAIT_TIMEOUT = 30
+POLL_INTERVAL = 0.05
+MAX_POLL_INTERVAL = 0.5
+
+
+def single_flight(namespace, key, compute, ttl, stale_ttl=0, tag=None,
+                  lock_timeout=LOCK_TIMEOUT, wait=WAIT_TIMEOUT):
+    """Cached compute() for `key`, computed by one caller at a time"""
+    entry = namespace.get(key)
+    if entry is not None:
+        value, entry_tag, fresh_until = entry
+        if entry_tag == tag:
+            if time.time() < fresh_until:
+                return value
+            # A background thread wouldn't see this transaction's data
+            if stale_ttl and not connection.in_atomic_block:
+                token = _acquire(namespace, key, lock_timeout)
+                if token:
+                    _refresh_in_background(namespace, key, compute, ttl, stale_ttl, tag, token)
+                return value
+
+    token = _acquire(namespace, key, lock_timeout)
+    if token is None:
+        value = _wait_for(namespace, key, tag, wait)
+        if value is not None:
+            return value
+        logger.warning(f"Gave up waiting for {namespace.name}:{key}; computing it here")
+        return compute()
+    try:
+        return _store(namespace, key, compute(), ttl, stale_ttl, tag)
+    finally:
+        _release(namespace, key, token)
+
+
+def _store(namespace, key, value, ttl, stale_ttl, tag):
+    fresh = ttl * random.uniform(1 - JITTER, 1 + JITTER)
+    namespace.set(key, (value, tag, time.time() + fresh), int(fresh + stale_ttl))
+    return value
+
+
+def _lock_key(namespace, key):
+    return namespace.make_key(f'lock:{key}')
+
+
+def _acquire(namespace, key, lock_timeout):
+    token = uuid.uuid4().hex
+    return token if l2_cache.add(_lock_key(namespace, key), token, lock_timeout) else None
+
+
+def _release(namespace, key, token):
+    # Only drop our own lock; it may have expired and been taken by another
+    lock_key = _lock_key(namespace, key)
+    if l2_cache.get(lock_key) == token:
+        l2_cache.delete(lock_key)
+
+
+def _wait_for(namespace, key, tag, wait):
+    """Poll the shared cache for a fresh value; None on timeout"""
+    from .instrumentation import registry
+
+    started = time.perf_counter()
+    full_key = namespace.make_key(key)
+    interval = POLL_INTERVAL
+    try:
+        while time.perf_counter() - started < wait:
+            time.sleep(interval)
+            holding = l2_cache.get(_lock_key(namespace, key)) is not None
+            entry = l2_cache.get(full_key)
+            if entry is not None and entry[1] == tag and time.time() < entry[2]:
+                return entry[0]
+            if not holding:
+                # The holder finished without storing a value (it failed)
+                return None
+            interval = min(interval * 2, MAX_POLL_INTERVAL)
+        return None
+    finally:
+        registry.record_value('single_flight.wait_ms', (time.perf_counter() - started) * 1000)
+
+
+def _refresh_in_background(namespace, key, compute, ttl, stale_ttl, tag, token):
+    def run():
+        try:
+            _store(namespace, key, compute(), ttl, stale_ttl, tag)
+        except Exception as e:
+            logger.error(f"Refreshing {namespace.name}:{key} failed: {e}", exc_info=True)
+        finally:
+            _release(namespace, key, token)
+            connection.close()
+
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
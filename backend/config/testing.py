@@ -0,0 +1,54 @@
+"""
+Test helpers.
+
+BudgetedAPITestCase drives views through the DRF test client with real
+JWTs (so authentication costs what it does in production) and checks the
+query count each response reports in its Server-Timing header against the
+view's query_budget.
+
+It is a transaction test case: views open and commit their own
+transactions as they do in production, so the count isn't inflated by the
+savepoints a TestCase turns them into, and on_commit work (data version
+bumps, cache invalidation) runs when each request finishes.
+"""
+import re
+
+from rest_framework.test import APITransactionTestCase
+
+from accounts.authentication import ClaimsRefreshToken
+from config.cache import clear_all
+
+_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def query_count(response):
+    """Queries the request ran, from its Server-Timing header"""
+    match = _QUERIES.search(response.get('Server-Timing', ''))
+    return int(match.group(1)) if match else None
+
+
+class BudgetedAPITestCase(APITransactionTestCase):
+    """API test case with JWT login and query budget checks"""
+
+    def setUp(self):
+        super().setUp()
+        clear_all()
+
+    def login(self, user):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {ClaimsRefreshToken.for_user(user).access_token}'
+        )
+
+    def call(self, method, path, data=None, **extra):
+        if method != 'get':
+            extra['format'] = 'json'
+        return getattr(self.client, method)(path, data, **extra)
+
+    def assertWithinBudget(self, response, view_class):
+        queries = query_count(response)
+        self.assertIsNotNone(queries, "response has no Server-Timing query count")
+        self.assertIsNotNone(view_class.query_budget, f"{view_class.__name__} has no query budget")
+        self.assertLessEqual(
+            queries, view_class.query_budget,
+            f"{view_class.__name__} ran {queries} queries (budget {view_class.query_budget})"
+        )
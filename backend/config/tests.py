@@ -0,0 +1,202 @@
+import multiprocessing
+import pickle
+import shutil
+import tempfile
+import time
+from datetime import date
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from accounts.models import User
+from attendance.models import Attendance
+from .cache import Namespace, clear_all
+from .cache_backends import AtomicDatabaseCache, AtomicFileBasedCache, fcntl
+from .versions import cached, version_tag
+
+test_cache = Namespace('versions_test', ttl=60, l1_ttl=0, versioned=False)
+
+INCR_PROCESSES = 4
+INCR_PER_PROCESS = 50
+
+
+def make_user(mobile):
+    return User.objects.create_user(mobile=mobile, name='Employee')
+
+
+class VersionCounterTests(TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        clear_all()
+        self.first = make_user('9000000401')
+        self.second = make_user('9000000402')
+
+    def tags(self):
+        return (
+            version_tag(['users']),
+            version_tag(['users'], self.first.pk),
+            version_tag(['users'], self.second.pk),
+        )
+
+    def test_touching_moves_only_those_users(self):
+        domain, first, second = self.tags()
+
+        User.objects.filter(pk=self.first.pk).touching(self.first.pk).update(name='Renamed')
+
+        self.assertNotEqual(version_tag(['users']), domain)
+        self.assertNotEqual(version_tag(['users'], self.first.pk), first)
+        self.assertEqual(version_tag(['users'], self.second.pk), second)
+
+    def test_update_without_touching_moves_every_user(self):
+        domain, first, second = self.tags()
+
+        User.objects.filter(pk=self.first.pk).update(name='Renamed')
+
+        self.assertNotEqual(version_tag(['users']), domain)
+        self.assertNotEqual(version_tag(['users'], self.first.pk), first)
+        self.assertNotEqual(version_tag(['users'], self.second.pk), second)
+
+    def test_bumps_wait_for_commit(self):
+        before = self.tags()
+
+        with transaction.atomic():
+            User.objects.filter(pk=self.first.pk).touching(self.first.pk).update(name='Renamed')
+            self.assertEqual(self.tags(), before)
+
+        self.assertNotEqual(self.tags(), before)
+
+    def test_rolled_back_writes_bump_nothing(self):
+        before = self.tags()
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            User.objects.filter(pk=self.first.pk).update(name='Renamed')
+            raise RuntimeError
+
+        self.assertEqual(self.tags(), before)
+
+    def test_cached_bypasses_the_cache_with_pending_bumps(self):
+        self.assertEqual(cached(test_cache, 'name', lambda: 'old', ['users'], self.first.pk), 'old')
+
+        with transaction.atomic():
+            User.objects.filter(pk=self.first.pk).touching(self.first.pk).update(name='Renamed')
+            self.assertEqual(cached(test_cache, 'name', lambda: 'new', ['users'], self.first.pk), 'new')
+            # Other domains are still served from the cache
+            self.assertEqual(cached(test_cache, 'shift', lambda: 'old', ['shifts']), 'old')
+            self.assertEqual(cached(test_cache, 'shift', lambda: 'new', ['shifts']), 'old')
+
+        self.assertEqual(cached(test_cache, 'name', lambda: 'newer', ['users'], self.first.pk), 'newer')
+
+    def test_writes_move_only_their_month(self):
+        day = date(2026, 3, 10)
+        march = version_tag(['attendance'], month=(2026, 3))
+        april = version_tag(['attendance'], month=(2026, 4))
+
+        Attendance.objects.create(user=self.first, date=day)
+
+        self.assertNotEqual(version_tag(['attendance'], month=(2026, 3)), march)
+        self.assertEqual(version_tag(['attendance'], month=(2026, 4)), april)
+
+        # update() can't tell which months it touched, so every month moves
+        april = version_tag(['attendance'], month=(2026, 4))
+        Attendance.objects.filter(user=self.first).update(status='absent')
+        self.assertNotEqual(version_tag(['attendance'], month=(2026, 4)), april)
+
+
+def _incr_file_cache(location):
+    cache = AtomicFileBasedCache(location, {})
+    for _ in range(INCR_PER_PROCESS):
+        cache.incr('counter')
+
+
+def _add_file_cache(location, results):
+    results.put(AtomicFileBasedCache(location, {}).add('lock', 'held'))
+
+
+@skipUnless(fcntl, "needs flock()")
+class AtomicFileBasedCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        self.cache = AtomicFileBasedCache(self.location, {})
+        self.context = multiprocessing.get_context('fork')
+
+    def run_processes(self, target, *args):
+        processes = [self.context.Process(target=target, args=args) for _ in range(INCR_PROCESSES)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+
+    def test_concurrent_incr_loses_nothing(self):
+        self.cache.set('counter', 0)
+
+        self.run_processes(_incr_file_cache, self.location)
+
+        self.assertEqual(self.cache.get('counter'), INCR_PROCESSES * INCR_PER_PROCESS)
+
+    def test_concurrent_add_has_one_winner(self):
+        results = self.context.Queue()
+
+        self.run_processes(_add_file_cache, self.location, results)
+
+        self.assertEqual([results.get() for _ in range(INCR_PROCESSES)].count(True), 1)
+
+    def expiry(self, key):
+        with open(self.cache._key_to_file(key), 'rb') as f:
+            return pickle.load(f)
+
+    def test_incr_keeps_the_expiry(self):
+        self.cache.set('counter', 1, 60)
+        expires = self.expiry('counter')
+
+        self.assertEqual(self.cache.incr('counter'), 2)
+        self.assertAlmostEqual(self.expiry('counter'), expires, delta=0.5)
+
+    def test_incr_of_missing_or_expired_key_fails(self):
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.cache.set('expired', 1, 0.01)
+        time.sleep(0.05)
+        with self.assertRaises(ValueError):
+            self.cache.incr('expired')
+
+
+class AtomicDatabaseCacheTests(TestCase):
+    table = 'atomic_cache_test'
+
+    def setUp(self):
+        call_command('createcachetable', self.table, verbosity=0)
+        self.cache = AtomicDatabaseCache(self.table, {})
+
+    def expiry(self, key):
+        from django.db import connection
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT expires FROM {self.table} WHERE cache_key = %s', [self.cache.make_key(key)])
+            return cursor.fetchone()[0]
+
+    def test_add_only_sets_missing_or_expired_keys(self):
+        self.assertTrue(self.cache.add('lock', 'first', 60))
+        self.assertFalse(self.cache.add('lock', 'second', 60))
+        self.assertEqual(self.cache.get('lock'), 'first')
+
+        self.cache.set('stale', 'old', -1)
+        self.assertTrue(self.cache.add('stale', 'new', 60))
+        self.assertEqual(self.cache.get('stale'), 'new')
+
+    def test_incr_keeps_the_value_and_expiry(self):
+        self.cache.set('counter', 1, 60)
+        expires = self.expiry('counter')
+
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        self.assertEqual(self.cache.get('counter'), 3)
+        self.assertEqual(self.expiry('counter'), expires)
+
+    def test_incr_of_missing_or_expired_key_fails(self):
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.cache.set('expired', 1, -1)
+        with self.assertRaises(ValueError):
+            self.cache.incr('expired')
@@ -4,6 +4,9 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.http import JsonResponse
 from django.utils import timezone
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from accounts.views import IsAdminUser
 
 
 def health_check(request):
@@ -15,12 +18,28 @@ def health_check(request):
     })
 
 
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def request_metrics(request):
+    """Per-endpoint latency and query percentiles and cache hit rates (admin only). DELETE resets."""
+    from .cache import cache_stats, reset_cache_stats
+    from .instrumentation import registry
+    if request.method == 'DELETE':
+        registry.reset()
+        reset_cache_stats()
+        return Response({"message": "Metrics reset"})
+    return Response({**registry.snapshot(), 'cache': cache_stats()})
+
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('accounts.urls')),
     path('api/attendance/', include('attendance.urls')),
     path('api/leaves/', include('leaves.urls')),
 
+    # Request metrics (admin only)
+    path('api/metrics/', request_metrics, name='request-metrics'),
+
     # Health check for keep-alive ping
     path('health/', health_check, name='health-check'),
 ]
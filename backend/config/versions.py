@@ -0,0 +1,270 @@
+"""
+Data version counters.
+
+Cached data that is derived from a table is keyed by the version of the
+data it was built from instead of being deleted when the table changes:
+
+    balance = cached(balance_cache, f'available:{user.id}', load, ['comp_offs'], user.id)
+
+Every domain has monotonic counters in the shared cache:
+
+- '<domain>' moves on any change; readers of the whole domain (reports,
+  lists) use it
+- '<domain>:all' moves only on changes that can't be pinned to users
+- '<domain>:user:<id>' moves when one user's rows change; a per-user
+  reader's key embeds it together with '<domain>:all'
+
+So a write never has to know which keys exist, and one employee's comp-off
+being used doesn't evict anyone else's balance.
+
+Domains tracked with a date field also have month counters, for readers
+of one month (monthly reports):
+
+- '<domain>:month:<YYYY-MM>' moves when rows dated in that month change
+- '<domain>:months' moves on changes whose months aren't known (update())
+
+so today's punches don't make last month's report outdated.
+
+Models are registered with track_model() (see each app's signals). save()
+and delete() bump through signals; the model's VersionedQuerySet manager
+bumps for update(), bulk_create() and bulk_update(), which don't send
+signals. update() can't see which users it touched, so it bumps the whole
+domain unless told with .touching(*user_ids).
+
+Bumps happen when the surrounding transaction commits. Until then the
+writer's own transaction sees data other processes don't, so cached()
+reads straight from the database inside a transaction with pending bumps.
+"""
+import random
+
+from django.db import connection, models, transaction
+from django.db.models.signals import post_delete, post_save
+
+from .cache import DEFAULT_TTL, Namespace
+
+# Counters are read from L2 every time: a counter cached in L1 would serve
+# stale data for as long as it lived
+version_cache = Namespace('data_version', ttl=None, l1_ttl=0, versioned=False)
+
+# Bumping more users than this from one write moves the whole domain instead
+MAX_USER_BUMPS = 50
+# Same for months
+MAX_MONTH_BUMPS = 12
+
+# model -> (domain, user field or None, date field or None)
+_tracked = {}
+# Domains with month counters
+_month_domains = set()
+_MISSING = object()
+
+
+class _Bump:
+    """on_commit callback; also marks the transaction as having pending bumps"""
+
+    def __init__(self, domain, user_ids, months):
+        self.domain = domain
+        self.user_ids = user_ids
+        self.months = months
+
+    def __call__(self):
+        keys = [self.domain]
+        if self.user_ids:
+            keys += [f'{self.domain}:user:{user_id}' for user_id in self.user_ids]
+        else:
+            keys.append(f'{self.domain}:all')
+        if self.domain in _month_domains:
+            if self.months:
+                keys += [f'{self.domain}:month:{month}' for month in self.months]
+            else:
+                keys.append(f'{self.domain}:months')
+        for key in keys:
+            _incr(key)
+
+
+def _initial_value():
+    # Start from an unguessable value so keys written under a lost counter
+    # can't be mistaken for current ones
+    return random.getrandbits(48)
+
+
+def _incr(key):
+    try:
+        version_cache.incr(key)
+    except ValueError:
+        version_cache.add(key, _initial_value())
+        version_cache.incr(key)
+
+
+def month_label(year, month):
+    return f'{year}-{month:02d}'
+
+
+def bump(domain, *user_ids, months=None):
+    """
+    Move the counters of `domain` once the current transaction commits.
+
+    With user ids only those users' counters (and the domain counter) move;
+    without, the whole domain does. months ('YYYY-MM' labels) are the months
+    the written rows are dated in; None means unknown, which moves every
+    month of a domain with month counters.
+    """
+    user_ids = sorted({str(user_id) for user_id in user_ids if user_id is not None})
+    if len(user_ids) > MAX_USER_BUMPS:
+        user_ids = []
+    if months is not None:
+        months = sorted(set(months))
+        if not months or len(months) > MAX_MONTH_BUMPS:
+            months = None
+    transaction.on_commit(_Bump(domain, user_ids, months))
+
+
+def _counter_keys(domains, user_id, month=None):
+    if user_id is None:
+        keys = []
+        for domain in domains:
+            if month is not None and domain in _month_domains:
+                keys += [f'{domain}:months', f'{domain}:month:{month_label(*month)}']
+            else:
+                keys.append(domain)
+        return keys
+    keys = []
+    for domain in domains:
+        keys += [f'{domain}:all', f'{domain}:user:{user_id}']
+    return keys
+
+
+def versions(domains, user_id=None, month=None):
+    """
+    {counter key: version} for the domains (and the user's counters).
+
+    With month as (year, month), domains with month counters are read at
+    that month's counters instead of the whole domain's.
+    """
+    keys = _counter_keys(domains, user_id, month)
+    found = version_cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            version_cache.add(key, _initial_value())
+        found.update(version_cache.get_many(missing))
+    return found
+
+
+def version_tag(domains, user_id=None, month=None):
+    """Short string of the current versions, to embed in a cache key"""
+    found = versions(domains, user_id, month)
+    return '.'.join(str(found[key]) for key in _counter_keys(domains, user_id, month))
+
+
+def has_pending_bumps(domains=None):
+    """Whether this transaction has written to any of these domains (any, if None)"""
+    if not connection.in_atomic_block:
+        return False
+    return any(
+        isinstance(func, _Bump) and (domains is None or func.domain in domains)
+        for _, func, *_ in connection.run_on_commit
+    )
+
+
+def cached(namespace, key, default_func, domains, user_id=None, ttl=DEFAULT_TTL):
+    """
+    namespace value for `key` at the current versions of `domains`.
+
+    default_func() is called on a miss. A transaction with uncommitted
+    writes to those domains bypasses the cache: it has to see its own
+    writes, and nobody else may see them yet.
+    """
+    if has_pending_bumps(domains):
+        return default_func()
+    full_key = f'{key}:{version_tag(domains, user_id)}'
+    value = namespace.get(full_key, _MISSING)
+    if value is _MISSING:
+        value = default_func()
+        namespace.set(full_key, value, ttl)
+    return value
+
+
+class VersionedQuerySet(models.QuerySet):
+    """QuerySet whose bulk writes bump the model's domain version"""
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._touched_users = getattr(self, '_touched_users', None)
+        return clone
+
+    def touching(self, *user_ids):
+        """Declare which users an update() on this queryset affects"""
+        clone = self._chain()
+        clone._touched_users = user_ids
+        return clone
+
+    def _bump(self, user_ids=(), months=None):
+        tracked = _tracked.get(self.model)
+        if tracked:
+            bump(tracked[0], *user_ids, months=months)
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        if rows:
+            self._bump(getattr(self, '_touched_users', None) or ())
+        return rows
+
+    update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if objs:
+            self._bump(_user_ids(self.model, objs), _months(self.model, objs))
+        return objs
+
+    bulk_create.alters_data = True
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        if rows:
+            self._bump(_user_ids(self.model, objs), _months(self.model, objs))
+        return rows
+
+    bulk_update.alters_data = True
+
+
+def _user_ids(model, objs):
+    tracked = _tracked.get(model)
+    if not tracked or not tracked[1]:
+        return ()
+    attname = model._meta.get_field(tracked[1]).attname
+    return [getattr(obj, attname) for obj in objs]
+
+
+def _months(model, objs):
+    """Month labels of the objects' dates, None if unknown"""
+    tracked = _tracked.get(model)
+    if not tracked or not tracked[2]:
+        return None
+    dates = [getattr(obj, tracked[2]) for obj in objs]
+    if any(day is None for day in dates):
+        return None
+    return [month_label(day.year, day.month) for day in dates]
+
+
+def track_model(model, domain, user_field=None, date_field=None):
+    """
+    Bump `domain` whenever rows of `model` are written.
+
+    With user_field (a foreign key to the user, or 'id' for the user model
+    itself), single-row writes only move that user's counter. With
+    date_field the domain also gets month counters, moved by the month of
+    that field.
+    """
+    _tracked[model] = (domain, user_field, date_field)
+    if date_field:
+        _month_domains.add(domain)
+    attname = model._meta.get_field(user_field).attname if user_field else None
+
+    def receiver(sender, instance, **kwargs):
+        user_ids = [getattr(instance, attname)] if attname else []
+        bump(domain, *user_ids, months=_months(model, [instance]))
+
+    post_save.connect(receiver, sender=model, weak=False, dispatch_uid=f'versions:{domain}:save')
+    post_delete.connect(receiver, sender=model, weak=False, dispatch_uid=f'versions:{domain}:delete')
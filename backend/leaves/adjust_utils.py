@@ -0,0 +1,219 @@
+"""
+Leave interval service.
+
+Taking one day out of an approved leave (the employee punched in on it, or
+cancelled that day) leaves zero, one or two intervals:
+
+    cancel  [d, d]          -> nothing left
+    shrink  [d, e] / [s, d] -> one interval
+    split   [s, e] around d -> two intervals
+
+The day is released in reverse of how leave is allocated on apply (comp-off,
+then paid, then LOP): LOP is freed first, then paid days, then comp-off. The
+remaining allocation is spread over the pieces in date order with the same
+priority. The plan is worked out in memory and written in one transaction:
+one bulk_update for the original request, one bulk_create for a split-off
+piece, one balance UPDATE and one comp-off restore.
+
+On the punch-in path, multi-day adjustments can optionally run after the
+punch has committed (settings.LEAVE_ADJUST_DEFER, off by default) so the
+punch response doesn't wait for them. A deferred adjustment lost to a
+restart is not retried.
+"""
+import logging
+import threading
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import LeaveBalance, LeaveRequest
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0')
+
+
+def plan_day_removal(leave_request, day):
+    """
+    Work out the pieces left after removing `day` from the leave.
+
+    Returns (pieces, released) where pieces is a list of dicts with
+    start_date/end_date/total_days/comp_off_days/paid_days/lop_days and
+    released is {'comp_off_days', 'paid_days', 'lop_days'} given back.
+    """
+    intervals = []
+    if leave_request.start_date < day:
+        intervals.append((leave_request.start_date, day - timedelta(days=1)))
+    if day < leave_request.end_date:
+        intervals.append((day + timedelta(days=1), leave_request.end_date))
+
+    total = Decimal(leave_request.total_days)
+    removed = min(total, Decimal('0.5') if leave_request.is_half_day else Decimal('1'))
+    if not intervals:
+        removed = total
+
+    # Free LOP first, then paid, then comp-off
+    left = {
+        'comp_off_days': Decimal(leave_request.comp_off_days),
+        'paid_days': Decimal(leave_request.paid_days),
+        'lop_days': Decimal(leave_request.lop_days),
+    }
+    released = dict.fromkeys(left, ZERO)
+    to_release = removed
+    for field in ('lop_days', 'paid_days', 'comp_off_days'):
+        take = min(left[field], to_release)
+        left[field] -= take
+        released[field] += take
+        to_release -= take
+
+    pieces = []
+    remaining_total = total - removed
+    for index, (start, end) in enumerate(intervals):
+        if index == len(intervals) - 1 or leave_request.is_half_day:
+            piece_total = remaining_total
+        else:
+            piece_total = min(Decimal((end - start).days + 1), remaining_total)
+        remaining_total -= piece_total
+
+        piece = {'start_date': start, 'end_date': end, 'total_days': piece_total}
+        to_cover = piece_total
+        for field in ('comp_off_days', 'paid_days', 'lop_days'):
+            take = min(left[field], to_cover)
+            left[field] -= take
+            piece[field] = take
+            to_cover -= take
+        # Anything not covered (e.g. a half day rounded away) becomes LOP
+        piece['lop_days'] += to_cover
+        pieces.append(piece)
+        if remaining_total <= 0:
+            break
+
+    return pieces, released
+
+
+def remove_leave_day(leave_id, day, note, clear_attendance=False):
+    """
+    Take `day` out of an approved leave in one transaction.
+
+    `note` ("Employee punched in", ...) is appended to the review remarks.
+    Does nothing and returns None if the leave no longer covers the day,
+    so retries and duplicate jobs are harmless. Otherwise returns a short
+    message for the employee.
+    """
+    from attendance.comp_off_utils import restore_comp_offs
+
+    with transaction.atomic():
+        leave_request = (
+            LeaveRequest.objects.select_for_update()
+            .filter(pk=leave_id, status='approved', start_date__lte=day, end_date__gte=day)
+            .first()
+        )
+        if leave_request is None:
+            return None
+
+        original = (leave_request.start_date, leave_request.end_date)
+        pieces, released = plan_day_removal(leave_request, day)
+        now = timezone.now()
+        remarks = (leave_request.review_remarks or '').strip()
+
+        if not pieces:
+            leave_request.status = 'cancelled'
+            action = 'Auto-cancelled'
+        else:
+            first = pieces[0]
+            for field, value in first.items():
+                setattr(leave_request, field, value)
+            leave_request.is_lop = first['lop_days'] > 0
+            action = 'Auto-split' if len(pieces) > 1 else 'Auto-adjusted'
+        leave_request.review_remarks = (
+            f"{remarks}\n[{action} for {day}: {note}. Original: {original[0]} to {original[1]}]"
+        ).strip()
+        leave_request.updated_at = now
+
+        LeaveRequest.objects.bulk_update([leave_request], [
+            'status', 'start_date', 'end_date', 'total_days', 'comp_off_days',
+            'paid_days', 'lop_days', 'is_lop', 'review_remarks', 'updated_at',
+        ])
+
+        if len(pieces) > 1:
+            LeaveRequest.objects.bulk_create([
+                LeaveRequest(
+                    user_id=leave_request.user_id,
+                    leave_type_id=leave_request.leave_type_id,
+                    reason=leave_request.reason,
+                    status='approved',
+                    reviewed_by_id=leave_request.reviewed_by_id,
+                    reviewed_on=leave_request.reviewed_on or now,
+                    review_remarks=f"Auto-created from split: Original leave {original[0]} to {original[1]}",
+                    is_lop=piece['lop_days'] > 0,
+                    **piece
+                )
+                for piece in pieces[1:]
+            ])
+
+        # Balance usage was recorded against the month the leave started in
+        if released['paid_days'] or released['lop_days']:
+            LeaveBalance.objects.filter(
+                user_id=leave_request.user_id,
+                leave_type_id=leave_request.leave_type_id,
+                year=original[0].year,
+                month=original[0].month,
+            ).touching(leave_request.user_id).update(
+                used_leaves=Greatest(F('used_leaves') - Value(released['paid_days']), Value(ZERO)),
+                lop_days=Greatest(F('lop_days') - Value(released['lop_days']), Value(ZERO)),
+                updated_at=now,
+            )
+        if released['comp_off_days']:
+            restore_comp_offs(leave_request.user_id, released['comp_off_days'])
+
+        if clear_attendance:
+            from attendance.models import Attendance
+            Attendance.objects.filter(
+                user_id=leave_request.user_id, date=day, status='on_leave'
+            ).delete()
+
+    from accounts.dashboard_utils import invalidate_dashboard_stats
+    invalidate_dashboard_stats(day)
+
+    if not pieces:
+        return f"Your leave for {day} has been auto-cancelled"
+    return 'Leave ' + ' + '.join(
+        f"{piece['start_date']} to {piece['end_date']} ({piece['total_days'].normalize():f} days)"
+        for piece in pieces
+    ) + f". {day} cancelled."
+
+
+def _remove_leave_day_in_background(leave_id, day, note):
+    def run():
+        try:
+            remove_leave_day(leave_id, day, note)
+        except Exception as e:
+            logger.error(f"Deferred leave adjustment failed for leave {leave_id}: {e}", exc_info=True)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+
+
+def adjust_leave_for_punch_in(leave_request, day):
+    """
+    Take the punch day out of the employee's approved leave.
+
+    Single-day leaves are cancelled inline. Longer leaves are shrunk or
+    split after the punch transaction commits when LEAVE_ADJUST_DEFER is
+    on. Returns the message for the punch response.
+    """
+    note = "Employee punched in"
+    is_multi_day = leave_request.start_date != leave_request.end_date
+    if is_multi_day and getattr(settings, 'LEAVE_ADJUST_DEFER', False):
+        leave_id = leave_request.id
+        transaction.on_commit(lambda: _remove_leave_day_in_background(leave_id, day, note))
+        return f"Your leave for {day} is being cancelled and the rest adjusted"
+    return remove_leave_day(leave_request.id, day, note) or ""
@@ -0,0 +1,145 @@
+"""
+Leave review helpers.
+
+LeaveBulkReview approves or rejects any number of leave requests in one
+transaction. On approval the side effects are applied per batch rather
+than per request:
+
+- comp-offs are consumed oldest-expiry first with one UPDATE (see
+  attendance.comp_off_utils)
+- monthly balances are created if missing, then adjusted with one
+  UPDATE of F() + per-balance deltas
+- every leave day is upserted as an on_leave attendance row with one
+  bulk_create(update_conflicts=True)
+
+The single-request review endpoint goes through the same path.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from accounts.review_utils import BulkReviewEngine
+
+from .models import LeaveBalance, LeaveRequest
+
+
+def monthly_quota(leave_type):
+    """Monthly quota for a balance row created on review (SL = 1 a month)"""
+    return 1 if leave_type.code == 'SL' else 0
+
+
+def leave_dates(leave_request):
+    """Every calendar day covered by the leave"""
+    day = leave_request.start_date
+    while day <= leave_request.end_date:
+        yield day
+        day += timedelta(days=1)
+
+
+def consume_comp_offs(leave_requests):
+    """Use up comp-offs for the approved requests through the comp-off wallet"""
+    from attendance.comp_off_utils import consume_comp_offs as consume
+
+    consume([(lr.user_id, lr.comp_off_days, lr.start_date) for lr in leave_requests])
+
+
+def apply_balance_usage(leave_requests):
+    """Add paid and LOP days to the monthly balances of the leave start month"""
+    deltas = defaultdict(lambda: [Decimal('0'), Decimal('0')])
+    leave_types = {}
+    for lr in leave_requests:
+        key = (lr.user_id, lr.leave_type_id, lr.start_date.year, lr.start_date.month)
+        deltas[key][0] += Decimal(lr.paid_days)
+        deltas[key][1] += Decimal(lr.lop_days)
+        leave_types[lr.leave_type_id] = lr.leave_type
+    if not deltas:
+        return
+
+    LeaveBalance.objects.bulk_create(
+        [
+            LeaveBalance(
+                user_id=user_id, leave_type_id=leave_type_id, year=year, month=month,
+                total_leaves=monthly_quota(leave_types[leave_type_id]),
+                used_leaves=0, carried_forward=0, lop_days=0
+            )
+            for user_id, leave_type_id, year, month in deltas
+        ],
+        ignore_conflicts=True
+    )
+
+    matches = {
+        key: Q(user_id=key[0], leave_type_id=key[1], year=key[2], month=key[3])
+        for key in deltas
+    }
+    any_match = Q()
+    for match in matches.values():
+        any_match |= match
+
+    LeaveBalance.objects.filter(any_match).touching(*{key[0] for key in deltas}).update(
+        used_leaves=F('used_leaves') + Case(
+            *[When(matches[key], then=Value(paid)) for key, (paid, _) in deltas.items()],
+            default=Value(Decimal('0'))
+        ),
+        lop_days=F('lop_days') + Case(
+            *[When(matches[key], then=Value(lop)) for key, (_, lop) in deltas.items()],
+            default=Value(Decimal('0'))
+        ),
+        updated_at=timezone.now(),
+    )
+
+
+def mark_leave_attendance(leave_requests):
+    """Upsert an on_leave attendance row for every approved leave day"""
+    from attendance.models import Attendance
+
+    rows = {
+        (lr.user_id, day): Attendance(user_id=lr.user_id, date=day, status='on_leave')
+        for lr in leave_requests
+        for day in leave_dates(lr)
+    }
+    if not rows:
+        return []
+    # Punch times on existing rows are kept, as update_or_create did
+    Attendance.objects.bulk_create(
+        list(rows.values()),
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['user', 'date'],
+        update_fields=['status', 'updated_at'],
+    )
+    return sorted({day for _, day in rows})
+
+
+class LeaveBulkReview(BulkReviewEngine):
+    """Approve/reject leave requests with batched balance and attendance updates"""
+    model = LeaveRequest
+    related = ('user', 'leave_type')
+
+    def __init__(self, *args, **kwargs):
+        from accounts.email_utils import send_leave_status_email
+        self.email_function = send_leave_status_email
+        super().__init__(*args, **kwargs)
+
+    def apply_batch(self, objects):
+        from accounts.dashboard_utils import get_india_date, record_leaves_reviewed
+        from attendance.board_utils import invalidate_today_board
+
+        if self.new_status == 'approved':
+            consume_comp_offs(objects)
+            apply_balance_usage(objects)
+            dates = mark_leave_attendance(objects)
+            if get_india_date() in dates:
+                invalidate_today_board()
+
+        record_leaves_reviewed(objects, self.new_status)
+
+    def notification(self, obj):
+        from accounts.utils import leave_status_notification
+        return leave_status_notification(obj, self.new_status, commit=False)
+
+    def activity_log(self, obj):
+        from accounts.activity_utils import log_leave_reviewed
+        return log_leave_reviewed(self.reviewer, obj, self.new_status, commit=False)
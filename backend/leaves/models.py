@@ -2,6 +2,8 @@ from django.db import models
 from django.conf import settings
 from django.utils import timezone
 
+from config.versions import VersionedQuerySet
+
 
 class LeaveType(models.Model):
     name = models.CharField(max_length=50, unique=True)
@@ -12,6 +14,8 @@ class LeaveType(models.Model):
     description = models.TextField(blank=True)
     is_active = models.BooleanField(default=True)
 
+    objects = VersionedQuerySet.as_manager()
+
     class Meta:
         db_table = 'leave_types'
 
@@ -39,6 +43,8 @@ class LeaveBalance(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = VersionedQuerySet.as_manager()
+
     class Meta:
         db_table = 'leave_balances'
         unique_together = ('user', 'leave_type', 'year', 'month')
@@ -101,6 +107,8 @@ class LeaveRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = VersionedQuerySet.as_manager()
+
     class Meta:
         db_table = 'leave_requests'
         ordering = ['-applied_on']
@@ -132,6 +140,8 @@ class Holiday(models.Model):
     is_optional = models.BooleanField(default=False)
     description = models.TextField(blank=True)
 
+    objects = VersionedQuerySet.as_manager()
+
     class Meta:
         db_table = 'holidays'
         ordering = ['date']
@@ -3,10 +3,17 @@ Signals for Leave app - sends email and in-app notifications when status changes
 """
 from django.db.models.signals import pre_save, post_save
 from django.dispatch import receiver
-from .models import LeaveRequest
+from .models import Holiday, LeaveBalance, LeaveRequest, LeaveType
+from config.versions import track_model
 from accounts.email_utils import send_leave_status_email
 from accounts.utils import create_notification
 
+# Data versions for caches built from these tables
+track_model(Holiday, 'holidays')
+track_model(LeaveType, 'leave_types')
+track_model(LeaveBalance, 'leave_balances', user_field='user')
+track_model(LeaveRequest, 'leave_requests', user_field='user')
+
 
 @receiver(pre_save, sender=LeaveRequest)
 def store_previous_status(sender, instance, **kwargs):
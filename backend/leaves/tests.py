@@ -1,3 +1,215 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
 
-# Create your tests here.
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase
+
+from accounts.dashboard_utils import get_dashboard_stats
+from accounts.models import Notification, User
+from attendance.models import Attendance, CompOff
+from config.testing import BudgetedAPITestCase
+from .adjust_utils import plan_day_removal, remove_leave_day
+from .leave_utils import LeaveBulkReview
+from .models import LeaveBalance, LeaveRequest, LeaveType
+from .views import BulkReviewLeaveRequestsView
+
+
+def leave(start, end, comp_off=0, paid=0, lop=0, is_half_day=False, total=None):
+    """Unsaved leave request with the given allocation"""
+    if total is None:
+        total = Decimal(comp_off) + Decimal(paid) + Decimal(lop)
+    return LeaveRequest(
+        start_date=start, end_date=end, is_half_day=is_half_day, total_days=Decimal(total),
+        comp_off_days=Decimal(comp_off), paid_days=Decimal(paid), lop_days=Decimal(lop),
+    )
+
+
+def days(value):
+    return Decimal(str(value))
+
+
+class PlanDayRemovalTests(SimpleTestCase):
+    def test_single_day_is_cancelled(self):
+        pieces, released = plan_day_removal(leave(date(2025, 3, 10), date(2025, 3, 10), paid=1), date(2025, 3, 10))
+        self.assertEqual(pieces, [])
+        self.assertEqual(released, {'comp_off_days': 0, 'paid_days': 1, 'lop_days': 0})
+
+    def test_half_day_is_cancelled_releasing_half(self):
+        request = leave(date(2025, 3, 10), date(2025, 3, 10), lop='0.5', is_half_day=True)
+        pieces, released = plan_day_removal(request, date(2025, 3, 10))
+        self.assertEqual(pieces, [])
+        self.assertEqual(released, {'comp_off_days': 0, 'paid_days': 0, 'lop_days': days('0.5')})
+
+    def test_shrink_at_start(self):
+        pieces, released = plan_day_removal(leave(date(2025, 3, 10), date(2025, 3, 12), paid=3), date(2025, 3, 10))
+        self.assertEqual(pieces, [{
+            'start_date': date(2025, 3, 11), 'end_date': date(2025, 3, 12), 'total_days': 2,
+            'comp_off_days': 0, 'paid_days': 2, 'lop_days': 0,
+        }])
+        self.assertEqual(released['paid_days'], 1)
+
+    def test_shrink_at_end(self):
+        pieces, released = plan_day_removal(leave(date(2025, 3, 10), date(2025, 3, 12), paid=3), date(2025, 3, 12))
+        self.assertEqual(len(pieces), 1)
+        self.assertEqual((pieces[0]['start_date'], pieces[0]['end_date']), (date(2025, 3, 10), date(2025, 3, 11)))
+        self.assertEqual(pieces[0]['total_days'], 2)
+        self.assertEqual(released['paid_days'], 1)
+
+    def test_split_spreads_allocation_in_date_order(self):
+        request = leave(date(2025, 3, 10), date(2025, 3, 14), comp_off=1, paid=2, lop=2)
+        pieces, released = plan_day_removal(request, date(2025, 3, 12))
+        self.assertEqual(released, {'comp_off_days': 0, 'paid_days': 0, 'lop_days': 1})
+        self.assertEqual(pieces, [
+            {'start_date': date(2025, 3, 10), 'end_date': date(2025, 3, 11), 'total_days': 2,
+             'comp_off_days': 1, 'paid_days': 1, 'lop_days': 0},
+            {'start_date': date(2025, 3, 13), 'end_date': date(2025, 3, 14), 'total_days': 2,
+             'comp_off_days': 0, 'paid_days': 1, 'lop_days': 1},
+        ])
+
+    def test_releases_lop_then_paid_then_comp_off(self):
+        request = leave(date(2025, 3, 10), date(2025, 3, 11), comp_off=1, paid='0.5', lop='0.5')
+        _, released = plan_day_removal(request, date(2025, 3, 11))
+        self.assertEqual(released, {'comp_off_days': 0, 'paid_days': days('0.5'), 'lop_days': days('0.5')})
+
+        request = leave(date(2025, 3, 10), date(2025, 3, 11), comp_off='1.5', paid='0.5')
+        _, released = plan_day_removal(request, date(2025, 3, 11))
+        self.assertEqual(released, {'comp_off_days': days('0.5'), 'paid_days': days('0.5'), 'lop_days': 0})
+
+    def test_pieces_add_up_to_the_rest(self):
+        request = leave(date(2025, 3, 1), date(2025, 3, 10), comp_off=2, paid=5, lop=3)
+        pieces, released = plan_day_removal(request, date(2025, 3, 4))
+        self.assertEqual(sum(piece['total_days'] for piece in pieces) + sum(released.values()), 10)
+        for field in ('comp_off_days', 'paid_days', 'lop_days'):
+            self.assertEqual(
+                sum(piece[field] for piece in pieces) + released[field], getattr(request, field)
+            )
+
+
+class RemoveLeaveDayTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(mobile='9000000001', name='Employee')
+        self.leave_type = LeaveType.objects.create(name='Casual Leave', code='CL')
+
+    def approved(self, start, end, **allocation):
+        request = leave(start, end, **allocation)
+        request.user = self.user
+        request.leave_type = self.leave_type
+        request.reason = 'Trip'
+        request.status = 'approved'
+        request.save()
+        return request
+
+    def test_split_writes_both_pieces_and_releases_balance(self):
+        request = self.approved(date(2025, 3, 10), date(2025, 3, 14), paid=4, lop=1)
+        LeaveBalance.objects.create(
+            user=self.user, leave_type=self.leave_type, year=2025, month=3, used_leaves=4, lop_days=1
+        )
+
+        message = remove_leave_day(request.id, date(2025, 3, 12), "Employee punched in")
+
+        self.assertIn("2025-03-12 cancelled", message)
+        rows = list(
+            LeaveRequest.objects.filter(user=self.user, status='approved')
+            .order_by('start_date').values_list('start_date', 'end_date', 'total_days', 'paid_days', 'lop_days')
+        )
+        self.assertEqual(rows, [
+            (date(2025, 3, 10), date(2025, 3, 11), 2, 2, 0),
+            (date(2025, 3, 13), date(2025, 3, 14), 2, 2, 0),
+        ])
+        balance = LeaveBalance.objects.get(user=self.user, year=2025, month=3)
+        self.assertEqual((balance.used_leaves, balance.lop_days), (4, 0))
+
+    def test_cancel_restores_comp_off(self):
+        request = self.approved(date(2025, 3, 10), date(2025, 3, 10), comp_off=1)
+        comp_off = CompOff.objects.create(
+            user=self.user, earned_date=date(2025, 3, 2), credit_days=1, status='used', used_date=date(2025, 3, 10)
+        )
+
+        remove_leave_day(request.id, date(2025, 3, 10), "Employee punched in")
+
+        request.refresh_from_db()
+        comp_off.refresh_from_db()
+        self.assertEqual(request.status, 'cancelled')
+        self.assertEqual(comp_off.status, 'earned')
+
+    def test_day_outside_the_leave_is_ignored(self):
+        request = self.approved(date(2025, 3, 10), date(2025, 3, 11), paid=2)
+        self.assertIsNone(remove_leave_day(request.id, date(2025, 3, 12), "Employee punched in"))
+
+
+class BulkLeaveReviewTests(BudgetedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(mobile='9000000000', name='Admin', role='admin', is_admin=True)
+        self.leave_type = LeaveType.objects.create(name='Casual Leave', code='CL')
+        self.employees = [
+            User.objects.create_user(mobile=f'900000040{index}', name=f'Employee {index}') for index in range(2)
+        ]
+        # Two days each: one covered by a comp-off, one paid
+        self.requests = [
+            LeaveRequest.objects.create(
+                user=employee, leave_type=self.leave_type, start_date=date(2031, 3, 10), end_date=date(2031, 3, 11),
+                total_days=2, comp_off_days=1, paid_days=1, reason='Wedding',
+            )
+            for employee in self.employees
+        ]
+        for employee in self.employees:
+            CompOff.objects.create(user=employee, earned_date=date(2031, 3, 2), credit_days=1)
+        self.login(self.admin)
+
+    def review(self, ids, new_status='approved'):
+        return self.call('post', '/api/leaves/bulk-review/', {'leave_ids': ids, 'status': new_status})
+
+    def test_approval_applies_comp_offs_balances_and_attendance(self):
+        response = self.review([request.id for request in self.requests])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinBudget(response, BulkReviewLeaveRequestsView)
+        self.assertEqual(response.data['updated_count'], 2)
+        self.assertEqual(response.data['skipped_ids'], [])
+        for employee in self.employees:
+            self.assertEqual(CompOff.objects.get(user=employee).status, 'used')
+            balance = LeaveBalance.objects.get(user=employee, leave_type=self.leave_type, year=2031, month=3)
+            self.assertEqual(balance.used_leaves, 1)
+            self.assertEqual(
+                list(Attendance.objects.filter(user=employee).order_by('date').values_list('date', 'status')),
+                [(date(2031, 3, 10), 'on_leave'), (date(2031, 3, 11), 'on_leave')]
+            )
+        self.assertEqual(Notification.objects.filter(notification_type='leave_approved').count(), 2)
+
+    def test_dashboard_counters_follow_the_review(self):
+        before = get_dashboard_stats()
+
+        self.review([request.id for request in self.requests])
+
+        after = get_dashboard_stats()
+        self.assertEqual(after['pending_leave_requests'], before['pending_leave_requests'] - 2)
+        self.assertEqual(after['approved_today'], before['approved_today'] + 2)
+        self.assertEqual(after, get_dashboard_stats(refresh=True))
+
+    def test_rolled_back_review_leaves_the_counters_alone(self):
+        before = get_dashboard_stats()
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            LeaveBulkReview(self.admin, 'approved').review([request.id for request in self.requests])
+            raise RuntimeError("notification insert failed")
+
+        self.assertEqual(get_dashboard_stats(), before)
+        self.assertEqual(LeaveRequest.objects.filter(status='pending').count(), 2)
+
+    def test_skipped_ids_are_the_validated_ids(self):
+        reviewed, already_rejected = self.requests
+        LeaveRequest.objects.filter(pk=already_rejected.pk).update(status='rejected')
+
+        response = self.review([str(reviewed.id), already_rejected.id, reviewed.id], 'rejected')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated_count'], 1)
+        self.assertEqual(response.data['skipped_ids'], [already_rejected.id])
+        self.assertFalse(LeaveBalance.objects.exists())
+
+    def test_malformed_ids_are_rejected(self):
+        for ids in ([], ['x'], 'all'):
+            response = self.review(ids)
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(LeaveRequest.objects.filter(status='pending').count(), 2)
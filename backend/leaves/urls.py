@@ -2,7 +2,7 @@ from django.urls import path
 from .views import (
     LeaveTypeListView, LeaveTypeDetailView, MyLeaveBalanceView,
     LeaveApplyView, MyLeaveRequestsView, CancelLeaveRequestView,
-    AllLeaveRequestsView, ReviewLeaveRequestView, AllLeaveBalancesView,
+    AllLeaveRequestsView, ReviewLeaveRequestView, BulkReviewLeaveRequestsView, AllLeaveBalancesView,
     InitializeLeaveBalanceView, MonthlyCreditView, NewYearResetView,
     UpdateLeaveBalanceView, UpdateLeaveRequestView, ExportLeaveReportCSVView,
     HolidayListView, HolidayDetailView, CheckTodayLeaveView, CancelLeaveForDateView
@@ -22,6 +22,7 @@ urlpatterns = [
     # Admin endpoints
     path('all-requests/', AllLeaveRequestsView.as_view(), name='all-leave-requests'),
     path('review/<int:pk>/', ReviewLeaveRequestView.as_view(), name='review-leave'),
+    path('bulk-review/', BulkReviewLeaveRequestsView.as_view(), name='bulk-review-leave'),
     path('update-request/<int:pk>/', UpdateLeaveRequestView.as_view(), name='update-leave-request'),
     path('all-balances/', AllLeaveBalancesView.as_view(), name='all-leave-balances'),
     path('update-balance/<int:pk>/', UpdateLeaveBalanceView.as_view(), name='update-leave-balance'),
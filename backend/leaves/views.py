@@ -5,11 +5,16 @@ from django.utils import timezone
 from django.db.models import Sum
 import csv
 import pytz
+from io import StringIO
 from django.http import HttpResponse
 
 from .models import LeaveType, LeaveBalance, LeaveRequest, Holiday
 
 
+# Data the leave reports are built from (see config.versions)
+LEAVE_REPORT_DOMAINS = ('leave_balances', 'leave_types', 'users')
+
+
 def get_india_date():
     """Get current date in India timezone (IST)"""
     india_tz = pytz.timezone('Asia/Kolkata')
@@ -19,9 +24,10 @@ from .serializers import (
     LeaveApplySerializer, LeaveReviewSerializer, HolidaySerializer
 )
 from accounts.views import IsAdminUser
-from accounts.utils import notify_leave_applied, notify_leave_status
+from attendance.report_utils import cached_report, report_key
+from accounts.utils import notify_leave_applied
 from accounts.activity_utils import (
-    log_leave_applied, log_leave_reviewed, log_leave_cancelled,
+    log_leave_applied, log_leave_cancelled,
     log_holiday_added, log_holiday_updated, log_holiday_deleted,
     log_leave_type_created, log_leave_type_updated
 )
@@ -267,7 +273,8 @@ class LeaveApplyView(APIView):
     3. Remaining days become LOP
     """
     def post(self, request):
-        from attendance.models import CompOff, Attendance
+        from attendance.models import Attendance
+        from attendance.comp_off_utils import available_comp_off_days
         from django.db.models import Sum
         from datetime import date, timedelta
 
@@ -295,13 +302,9 @@ class LeaveApplyView(APIView):
             status='pending'
         ).aggregate(total=Sum('comp_off_days'))['total'] or 0
 
-        available_comp_offs = CompOff.objects.filter(
-            user=request.user,
-            status='earned',
-            expires_on__gte=start_date  # Not expired
-        ).order_by('expires_on')  # Use earliest expiring first
-
-        total_comp_off_available = sum(float(co.credit_days) for co in available_comp_offs)
+        # Earned comp offs not expired by the leave start (one aggregate,
+        # cached when the leave starts today)
+        total_comp_off_available = float(available_comp_off_days(request.user.id, start_date))
         # Subtract already pending comp off days
         total_comp_off_available = max(0, total_comp_off_available - float(pending_comp_off_days))
 
@@ -481,6 +484,9 @@ class LeaveApplyView(APIView):
         # Notify admins about new leave request
         notify_leave_applied(leave_request)
 
+        from accounts.dashboard_utils import record_leave_applied
+        record_leave_applied()
+
         # Log activity
         try:
             log_leave_applied(request.user, leave_request, request)
@@ -529,6 +535,9 @@ class CancelLeaveRequestView(APIView):
         leave_request.status = 'cancelled'
         leave_request.save()
 
+        from accounts.dashboard_utils import record_leave_withdrawn
+        record_leave_withdrawn()
+
         # Log activity
         try:
             log_leave_cancelled(request.user, leave_request, request)
@@ -563,6 +572,8 @@ class ReviewLeaveRequestView(APIView):
     permission_classes = [IsAdminUser]
 
     def post(self, request, pk):
+        from .leave_utils import LeaveBulkReview
+
         try:
             leave_request = LeaveRequest.objects.get(pk=pk)
         except LeaveRequest.DoesNotExist:
@@ -584,93 +595,54 @@ class ReviewLeaveRequestView(APIView):
         new_status = serializer.validated_data['status']
         remarks = serializer.validated_data.get('remarks', '')
 
-        leave_request.status = new_status
-        leave_request.reviewed_by = request.user
-        leave_request.reviewed_on = timezone.now()
-        leave_request.review_remarks = remarks
-        leave_request.save()
+        # Same path as bulk review: comp-offs, balance, attendance,
+        # notification, activity log and email
+        reviewed = LeaveBulkReview(request.user, new_status, remarks, request).review([pk])
+        if not reviewed:
+            return Response(
+                {"error": "This request has already been reviewed"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        # If approved, update leave balance and comp offs
-        if new_status == 'approved':
-            from attendance.models import Attendance, CompOff
-
-            # Step 1: Deduct Comp Off days if used
-            if leave_request.comp_off_days > 0:
-                comp_off_to_use = float(leave_request.comp_off_days)
-                available_comp_offs = CompOff.objects.filter(
-                    user=leave_request.user,
-                    status='earned',
-                    expires_on__gte=leave_request.start_date
-                ).order_by('expires_on')
-
-                for comp_off in available_comp_offs:
-                    if comp_off_to_use <= 0:
-                        break
-                    credit = float(comp_off.credit_days)
-                    if credit <= comp_off_to_use:
-                        # Use entire comp off
-                        comp_off.status = 'used'
-                        comp_off.used_date = leave_request.start_date
-                        comp_off.save()
-                        comp_off_to_use -= credit
-                    else:
-                        # Partial use - reduce credit days
-                        comp_off.credit_days = credit - comp_off_to_use
-                        comp_off.save()
-                        comp_off_to_use = 0
+        return Response({
+            "message": f"Leave request {new_status}",
+            "data": LeaveRequestSerializer(reviewed[0]).data
+        })
 
-            # Step 2: Update leave balance
-            year = leave_request.start_date.year
-            month = leave_request.start_date.month
 
-            # Set monthly quota based on leave type
-            if leave_request.leave_type.code == 'SL':
-                monthly_quota = 1
-            elif leave_request.leave_type.code == 'LOP':
-                monthly_quota = 0
-            else:
-                monthly_quota = 0  # CL and EL removed
+class BulkReviewLeaveRequestsView(APIView):
+    """Admin can approve/reject multiple leave requests at once"""
+    permission_classes = [IsAdminUser]
+    # auth user + lock + update + comp-offs (2) + balances (2) + attendance
+    # + notifications + logs (+ savepoints)
+    query_budget = 14
 
-            balance, created = LeaveBalance.objects.get_or_create(
-                user=leave_request.user,
-                leave_type=leave_request.leave_type,
-                year=year,
-                month=month,
-                defaults={
-                    'total_leaves': monthly_quota,
-                    'used_leaves': 0,
-                    'carried_forward': 0,
-                    'lop_days': 0
-                }
+    def post(self, request):
+        from accounts.review_utils import parse_review_ids
+        from .leave_utils import LeaveBulkReview
+
+        # skipped_ids below are reported against these validated ints
+        leave_ids, error = parse_review_ids(request.data, 'leave_ids')
+        if error:
+            return Response(
+                {"error": error},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
-            # Update used leaves and LOP
-            balance.used_leaves += leave_request.paid_days
-            balance.lop_days += leave_request.lop_days
-            balance.save()
-
-            # Step 3: Mark attendance as on_leave for approved dates
-            current_date = leave_request.start_date
-            while current_date <= leave_request.end_date:
-                Attendance.objects.update_or_create(
-                    user=leave_request.user,
-                    date=current_date,
-                    defaults={'status': 'on_leave'}
-                )
-                current_date += timezone.timedelta(days=1)
+        serializer = LeaveReviewSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        # Notify employee about leave status (with email)
-        notify_leave_status(leave_request, new_status, remarks)
+        new_status = serializer.validated_data['status']
+        remarks = serializer.validated_data.get('remarks', '')
 
-        # Log activity
-        try:
-            log_leave_reviewed(request.user, leave_request, new_status, request)
-        except Exception:
-            pass
+        reviewed = LeaveBulkReview(request.user, new_status, remarks, request).review(leave_ids)
+        reviewed_ids = {leave_request.id for leave_request in reviewed}
 
         return Response({
-            "message": f"Leave request {new_status}",
-            "data": LeaveRequestSerializer(leave_request).data
+            "message": f"{len(reviewed)} leave request(s) {new_status}",
+            "updated_count": len(reviewed),
+            "skipped_ids": [leave_id for leave_id in leave_ids if leave_id not in reviewed_ids],
         })
 
 
@@ -685,6 +657,20 @@ class AllLeaveBalancesView(generics.ListAPIView):
             'user', 'leave_type'
         )
 
+    def list(self, request, *args, **kwargs):
+        # The whole month is serialized once and cached; pages are cut from it
+        year = int(request.query_params.get('year', timezone.now().year))
+        month = int(request.query_params.get('month', timezone.now().month))
+        rows = cached_report(
+            report_key('leave_balances', year, month),
+            lambda: self.get_serializer(self.get_queryset(), many=True).data,
+            domains=LEAVE_REPORT_DOMAINS,
+        )
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(rows)
+
 
 class InitializeLeaveBalanceView(APIView):
     permission_classes = [IsAdminUser]
@@ -960,6 +946,10 @@ class UpdateLeaveRequestView(APIView):
 
                 balance.save()
 
+        if old_status != leave_request.status:
+            from accounts.dashboard_utils import invalidate_dashboard_stats
+            invalidate_dashboard_stats()
+
         return Response({
             "message": "Leave request updated successfully",
             "data": LeaveRequestSerializer(leave_request).data
@@ -972,10 +962,17 @@ class ExportLeaveReportCSVView(APIView):
     def get(self, request):
         year = int(request.query_params.get('year', timezone.now().year))
 
-        response = HttpResponse(content_type='text/csv')
+        content = cached_report(
+            report_key('leave_csv', year), lambda: self.build(year), domains=LEAVE_REPORT_DOMAINS
+        )
+        response = HttpResponse(content, content_type='text/csv')
         response['Content-Disposition'] = f'attachment; filename="leave_report_{year}.csv"'
+        return response
 
-        writer = csv.writer(response)
+    def build(self, year):
+        """CSV text of the year's leave balances"""
+        output = StringIO()
+        writer = csv.writer(output)
         writer.writerow([
             'Employee Name', 'Leave Type', 'Total Leaves',
             'Used Leaves', 'Available Leaves', 'LOP Days'
@@ -995,7 +992,7 @@ class ExportLeaveReportCSVView(APIView):
                 bal.lop_days
             ])
 
-        return response
+        return output.getvalue()
 
 
 # Holiday views
@@ -1091,7 +1088,7 @@ class CancelLeaveForDateView(APIView):
             status='approved',
             start_date__lte=date_to_cancel,
             end_date__gte=date_to_cancel
-        ).select_related('leave_type').first()
+        ).only('id').first()
 
         if not leave_request:
             return Response(
@@ -1099,161 +1096,12 @@ class CancelLeaveForDateView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Get leave balance to restore
-        year = leave_request.start_date.year
-        month = leave_request.start_date.month
-
-        balance = LeaveBalance.objects.filter(
-            user=request.user,
-            leave_type=leave_request.leave_type,
-            year=year,
-            month=month
-        ).first()
-
-        # Calculate days to restore (1 day or 0.5 for half day)
-        days_to_restore = 0.5 if leave_request.is_half_day else 1
-
-        # Handle different scenarios
-        if leave_request.start_date == leave_request.end_date:
-            # Single day leave - just cancel it
-            leave_request.status = 'cancelled'
-            leave_request.review_remarks = (leave_request.review_remarks or '') + f'\n[Auto-cancelled for {date_to_cancel} - Employee came to office]'
-            leave_request.save()
-
-            # Restore balance
-            if balance:
-                if leave_request.paid_days > 0:
-                    balance.used_leaves = max(0, float(balance.used_leaves) - float(leave_request.paid_days))
-                if leave_request.lop_days > 0:
-                    balance.lop_days = max(0, float(balance.lop_days) - float(leave_request.lop_days))
-                balance.save()
-
-            # Remove on_leave status from attendance
-            from attendance.models import Attendance
-            Attendance.objects.filter(
-                user=request.user,
-                date=date_to_cancel,
-                status='on_leave'
-            ).delete()
-
-        elif leave_request.start_date == date_to_cancel:
-            # Cancel first day - move start date forward
-            new_start = date_to_cancel + timezone.timedelta(days=1)
-            old_paid = float(leave_request.paid_days)
-            old_lop = float(leave_request.lop_days)
-
-            leave_request.start_date = new_start
-            # Recalculate days
-            total_days = (leave_request.end_date - new_start).days + 1
-            leave_request.paid_days = min(old_paid, total_days)
-            leave_request.lop_days = max(0, total_days - leave_request.paid_days)
-            leave_request.review_remarks = (leave_request.review_remarks or '') + f'\n[Start date changed from {date_to_cancel} - Employee came to office]'
-            leave_request.save()
-
-            # Restore 1 day to balance
-            if balance:
-                if old_paid > leave_request.paid_days:
-                    balance.used_leaves = max(0, float(balance.used_leaves) - (old_paid - float(leave_request.paid_days)))
-                if old_lop > leave_request.lop_days:
-                    balance.lop_days = max(0, float(balance.lop_days) - (old_lop - float(leave_request.lop_days)))
-                balance.save()
-
-            # Remove on_leave status
-            from attendance.models import Attendance
-            Attendance.objects.filter(
-                user=request.user,
-                date=date_to_cancel,
-                status='on_leave'
-            ).delete()
-
-        elif leave_request.end_date == date_to_cancel:
-            # Cancel last day - move end date backward
-            new_end = date_to_cancel - timezone.timedelta(days=1)
-            old_paid = float(leave_request.paid_days)
-            old_lop = float(leave_request.lop_days)
-
-            leave_request.end_date = new_end
-            # Recalculate days
-            total_days = (new_end - leave_request.start_date).days + 1
-            leave_request.paid_days = min(old_paid, total_days)
-            leave_request.lop_days = max(0, total_days - leave_request.paid_days)
-            leave_request.review_remarks = (leave_request.review_remarks or '') + f'\n[End date changed from {date_to_cancel} - Employee came to office]'
-            leave_request.save()
-
-            # Restore 1 day to balance
-            if balance:
-                if old_paid > leave_request.paid_days:
-                    balance.used_leaves = max(0, float(balance.used_leaves) - (old_paid - float(leave_request.paid_days)))
-                if old_lop > leave_request.lop_days:
-                    balance.lop_days = max(0, float(balance.lop_days) - (old_lop - float(leave_request.lop_days)))
-                balance.save()
-
-            # Remove on_leave status
-            from attendance.models import Attendance
-            Attendance.objects.filter(
-                user=request.user,
-                date=date_to_cancel,
-                status='on_leave'
-            ).delete()
-
-        else:
-            # Date is in the middle - need to split into two leave requests
-            original_end = leave_request.end_date
-            old_paid = float(leave_request.paid_days)
-            old_lop = float(leave_request.lop_days)
-            old_total = (original_end - leave_request.start_date).days + 1
-
-            # First part: start_date to (date_to_cancel - 1)
-            new_end_first = date_to_cancel - timezone.timedelta(days=1)
-            first_part_days = (new_end_first - leave_request.start_date).days + 1
-
-            leave_request.end_date = new_end_first
-            leave_request.paid_days = min(old_paid, first_part_days)
-            leave_request.lop_days = max(0, first_part_days - leave_request.paid_days)
-            leave_request.review_remarks = (leave_request.review_remarks or '') + f'\n[Split: Employee came to office on {date_to_cancel}]'
-            leave_request.save()
-
-            # Second part: (date_to_cancel + 1) to end_date
-            new_start_second = date_to_cancel + timezone.timedelta(days=1)
-            if new_start_second <= original_end:
-                second_part_days = (original_end - new_start_second).days + 1
-                remaining_paid = max(0, old_paid - first_part_days - 1)  # -1 for cancelled day
-                second_paid = min(remaining_paid, second_part_days)
-                second_lop = max(0, second_part_days - second_paid)
-
-                LeaveRequest.objects.create(
-                    user=request.user,
-                    leave_type=leave_request.leave_type,
-                    start_date=new_start_second,
-                    end_date=original_end,
-                    reason=leave_request.reason + f' [Split from original leave]',
-                    status='approved',
-                    reviewed_by=leave_request.reviewed_by,
-                    reviewed_on=timezone.now(),
-                    review_remarks=f'Auto-created from split leave. Original: {leave_request.start_date} to {original_end}',
-                    paid_days=second_paid,
-                    lop_days=second_lop,
-                    is_lop=second_lop > 0
-                )
-
-            # Restore 1 day to balance
-            if balance:
-                # Calculate how much was saved
-                new_total = first_part_days + (second_part_days if new_start_second <= original_end else 0)
-                days_saved = old_total - new_total
-
-                if old_paid > 0:
-                    paid_saved = min(days_saved, old_paid - float(leave_request.paid_days))
-                    balance.used_leaves = max(0, float(balance.used_leaves) - paid_saved)
-                balance.save()
-
-            # Remove on_leave status for the cancelled date
-            from attendance.models import Attendance
-            Attendance.objects.filter(
-                user=request.user,
-                date=date_to_cancel,
-                status='on_leave'
-            ).delete()
+        # Cancel, shrink or split the leave around the date, give back its
+        # balance/comp off and clear the on_leave attendance in one transaction
+        from .adjust_utils import remove_leave_day
+        remove_leave_day(
+            leave_request.id, date_to_cancel, "Employee came to office", clear_attendance=True
+        )
 
         return Response({
             "message": f"Leave cancelled for {date_to_cancel}. You can now punch in.",
@@ -33,6 +33,7 @@ const WFH = lazy(() => import('./pages/WFH'));
 const EmployeeProfile = lazy(() => import('./pages/EmployeeProfile'));
 const Shifts = lazy(() => import('./pages/Shifts'));
 const CompOff = lazy(() => import('./pages/CompOff'));
+const Kiosk = lazy(() => import('./pages/Kiosk'));
 
 function App() {
   return (
@@ -45,6 +46,7 @@ function App() {
             {/* Public Routes */}
             <Route path="/login" element={<Login />} />
             <Route path="/admin-setup" element={<AdminSetup />} />
+            <Route path="/kiosk" element={<Kiosk />} />
 
             {/* Protected Routes */}
             <Route
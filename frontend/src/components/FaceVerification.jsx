@@ -1,10 +1,13 @@
 import { useState, useRef, useEffect, useCallback } from 'react';
-import { loadFaceModels, getFaceDescriptor, isFaceMatch, descriptorFromJson } from '../utils/faceRecognition';
+import { loadFaceModels, getFaceDescriptor, isFaceMatch } from '../utils/faceRecognition';
+import { authAPI } from '../services/api';
 
-const FaceVerification = ({ userFaceDescriptor, onSuccess, onCancel, onError }) => {
+const FaceVerification = ({ onSuccess, onCancel, onError }) => {
   const videoRef = useRef(null);
   const canvasRef = useRef(null);
   const streamRef = useRef(null);
+  const storedDescriptorRef = useRef(null);
+  const serverVerifiesRef = useRef(false);
 
   const [modelsLoading, setModelsLoading] = useState(true);
   const [cameraReady, setCameraReady] = useState(false);
@@ -12,6 +15,22 @@ const FaceVerification = ({ userFaceDescriptor, onSuccess, onCancel, onError })
   const [message, setMessage] = useState('Initializing camera...');
   const [countdown, setCountdown] = useState(null);
 
+  // Fetch the enrolled descriptor while the models load (ETag-cached by the browser)
+  useEffect(() => {
+    authAPI.getFaceDescriptor()
+      .then((response) => {
+        storedDescriptorRef.current = new Float32Array(response.data.descriptor);
+      })
+      .catch((err) => {
+        // In server mode the descriptor isn't served; the server compares the capture
+        if (err.response?.data?.verification === 'server') {
+          serverVerifiesRef.current = true;
+          return;
+        }
+        onError?.('Face data not found. Please update your profile photo.');
+      });
+  }, [onError]);
+
   // Load face models
   useEffect(() => {
     loadFaceModels()
@@ -97,8 +116,16 @@ const FaceVerification = ({ userFaceDescriptor, onSuccess, onCancel, onError })
         return;
       }
 
-      // Parse stored descriptor
-      const storedDescriptor = descriptorFromJson(userFaceDescriptor);
+      if (serverVerifiesRef.current) {
+        setMessage('Face captured. Verifying...');
+        if (streamRef.current) {
+          streamRef.current.getTracks().forEach(track => track.stop());
+        }
+        onSuccess?.({ match: true, descriptor: Array.from(capturedDescriptor) });
+        return;
+      }
+
+      const storedDescriptor = storedDescriptorRef.current;
 
       if (!storedDescriptor) {
         onError?.('Face data not found. Please update your profile photo.');
@@ -116,7 +143,8 @@ const FaceVerification = ({ userFaceDescriptor, onSuccess, onCancel, onError })
         }
         // Wait a moment to show success message
         setTimeout(() => {
-          onSuccess?.(result);
+          // The live descriptor goes to the server, which checks it again
+          onSuccess?.({ ...result, descriptor: Array.from(capturedDescriptor) });
         }, 500);
       } else {
         setMessage(`Face not matched (${result.confidence}% similarity). Try again.`);
@@ -127,7 +155,7 @@ const FaceVerification = ({ userFaceDescriptor, onSuccess, onCancel, onError })
       setMessage('Verification failed. Please try again.');
       setVerifying(false);
     }
-  }, [cameraReady, userFaceDescriptor, onSuccess, onError]);
+  }, [cameraReady, onSuccess, onError]);
 
   // Auto capture with countdown
   const startCountdown = useCallback(() => {
@@ -127,6 +127,8 @@ const NotificationBell = () => {
         return '👤';
       case 'holiday':
         return '🎉';
+      case 'comp_off_expired':
+        return '⌛';
       default:
         return '🔔';
     }
@@ -46,9 +46,11 @@ const PunchButton = ({ type, onSuccess, disabled, todayAttendance }) => {
     setShowErrorModal(true);
   };
 
-  const performPunchIn = async (coords, faceVerified = false) => {
+  const performPunchIn = async (coords, faceVerified = false, faceDescriptor = null) => {
     const api = type === 'in' ? attendanceAPI.punchIn : attendanceAPI.punchOut;
-    await api({ ...coords, face_verified: faceVerified });
+    const data = { ...coords, face_verified: faceVerified };
+    if (faceDescriptor) data.face_descriptor = faceDescriptor;
+    await api(data);
     toast.success(`Punch ${type} successful!`);
     onSuccess?.();
   };
@@ -87,8 +89,8 @@ const PunchButton = ({ type, onSuccess, disabled, todayAttendance }) => {
         }
       }
 
-      // Check if face verification is required (only for punch IN and if user has face_descriptor)
-      if (type === 'in' && user?.face_descriptor) {
+      // Check if face verification is required (only for punch IN and if user has a face registered)
+      if (type === 'in' && user?.has_face_descriptor) {
         setPendingCoords(coords);
         setShowFaceVerification(true);
         setLoading(false);
@@ -129,7 +131,7 @@ const PunchButton = ({ type, onSuccess, disabled, todayAttendance }) => {
     setShowFaceVerification(false);
     setLoading(true);
     try {
-      await performPunchIn(pendingCoords, true);
+      await performPunchIn(pendingCoords, true, result?.descriptor);
     } catch (error) {
       const message = error.response?.data?.error ||
         (error.message?.includes('Network') ? 'No internet connection. Please check your network.' : `Failed to punch ${type}`);
@@ -299,9 +301,8 @@ const PunchButton = ({ type, onSuccess, disabled, todayAttendance }) => {
       )}
 
       {/* Face Verification Modal */}
-      {showFaceVerification && user?.face_descriptor && (
+      {showFaceVerification && user?.has_face_descriptor && (
         <FaceVerification
-          userFaceDescriptor={user.face_descriptor}
           onSuccess={handleFaceVerificationSuccess}
           onCancel={handleFaceVerificationCancel}
           onError={handleFaceVerificationError}
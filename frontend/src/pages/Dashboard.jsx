@@ -125,6 +125,75 @@ const Dashboard = () => {
     fetchData();
   }, [isAdmin]);
 
+  // Live board: apply punch deltas pushed by the server instead of refetching
+  useEffect(() => {
+    if (!isAdmin || typeof EventSource === 'undefined') return undefined;
+
+    let source;
+    let retryTimer;
+    let lastEventId = '';
+    let closed = false;
+
+    const refetchBoard = async () => {
+      try {
+        const response = await authAPI.getTodayEmployeeStatus();
+        setTodayEmployeeStatus(response.data.employees || []);
+        setLateCount(response.data.late_count || 0);
+      } catch (error) {
+        console.error('Error refreshing employee status:', error);
+      }
+    };
+
+    const applyDelta = (event) => {
+      lastEventId = event.lastEventId;
+      const delta = JSON.parse(event.data);
+      setTodayEmployeeStatus((prev) =>
+        prev.map((emp) => (emp.id === delta.id ? { ...emp, ...delta } : emp))
+      );
+      if (event.type === 'punch_in' && delta.is_late) {
+        setLateCount((count) => count + 1);
+      }
+    };
+
+    const reconnectLater = () => {
+      retryTimer = setTimeout(() => {
+        // Nothing to resume from: the board may have missed punches
+        if (!lastEventId) refetchBoard();
+        connect();
+      }, 5000);
+    };
+
+    const connect = async () => {
+      let ticket;
+      try {
+        ticket = (await attendanceAPI.getLiveBoardTicket()).data.ticket;
+      } catch (error) {
+        reconnectLater();
+        return;
+      }
+      if (closed) return;
+      source = new EventSource(attendanceAPI.liveBoardUrl(ticket, lastEventId));
+      source.addEventListener('punch_in', applyDelta);
+      source.addEventListener('punch_out', applyDelta);
+      source.addEventListener('resync', (event) => {
+        lastEventId = event.lastEventId;
+        refetchBoard();
+      });
+      source.onerror = () => {
+        // Tickets are single use: resume from the last event with a new one
+        source.close();
+        reconnectLater();
+      };
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (source) source.close();
+    };
+  }, [isAdmin]);
+
   const formatTime = (datetime) => {
     if (!datetime) return '-';
     return new Date(datetime).toLocaleTimeString('en-IN', {
@@ -229,7 +298,7 @@ const Dashboard = () => {
         </div>
 
         {/* Face Registration Warning */}
-        {!isAdmin && !user?.face_descriptor && (
+        {!isAdmin && !user?.has_face_descriptor && (
           <div className="bg-gradient-to-r from-orange-50 to-amber-50 border border-orange-200 rounded-2xl p-5 shadow-sm">
             <div className="flex items-start gap-4">
               <div className="flex-shrink-0 w-12 h-12 bg-gradient-to-br from-orange-400 to-amber-500 rounded-xl flex items-center justify-center shadow-lg">
@@ -0,0 +1,146 @@
+import { useState, useRef, useEffect, useCallback } from 'react';
+import { loadFaceModels, getFaceDescriptor } from '../utils/faceRecognition';
+import { kioskAPI } from '../services/api';
+
+const KIOSK_KEY_STORAGE = 'kioskKey';
+const RESULT_DISPLAY_MS = 4000;
+
+// Shared office tablet: nobody logs in, the server identifies the face and punches in
+const Kiosk = () => {
+  const videoRef = useRef(null);
+  const canvasRef = useRef(null);
+  const streamRef = useRef(null);
+
+  const [kioskKey, setKioskKey] = useState(() => localStorage.getItem(KIOSK_KEY_STORAGE) || '');
+  const [keyInput, setKeyInput] = useState('');
+  const [cameraReady, setCameraReady] = useState(false);
+  const [busy, setBusy] = useState(false);
+  const [result, setResult] = useState(null);
+  const [message, setMessage] = useState('Loading face recognition...');
+
+  useEffect(() => {
+    if (!kioskKey) return;
+
+    let cancelled = false;
+    const start = async () => {
+      try {
+        await loadFaceModels();
+        const stream = await navigator.mediaDevices.getUserMedia({
+          video: { facingMode: 'user', width: { ideal: 640 }, height: { ideal: 480 } },
+          audio: false
+        });
+        if (cancelled) {
+          stream.getTracks().forEach(track => track.stop());
+          return;
+        }
+        streamRef.current = stream;
+        videoRef.current.srcObject = stream;
+        videoRef.current.onloadedmetadata = () => {
+          videoRef.current.play();
+          setCameraReady(true);
+          setMessage('Look at the camera and tap Punch In');
+        };
+      } catch (err) {
+        console.error('Kiosk camera error:', err);
+        setMessage('Camera or face recognition unavailable');
+      }
+    };
+    start();
+
+    return () => {
+      cancelled = true;
+      if (streamRef.current) {
+        streamRef.current.getTracks().forEach(track => track.stop());
+      }
+    };
+  }, [kioskKey]);
+
+  const punchIn = useCallback(async () => {
+    if (!cameraReady || busy) return;
+    setBusy(true);
+    setMessage('Identifying...');
+
+    try {
+      const video = videoRef.current;
+      const canvas = canvasRef.current;
+      canvas.width = video.videoWidth;
+      canvas.height = video.videoHeight;
+      canvas.getContext('2d').drawImage(video, 0, 0);
+
+      const descriptor = await getFaceDescriptor(canvas);
+      if (!descriptor) {
+        setResult({ ok: false, text: 'No face detected. Please try again.' });
+        return;
+      }
+
+      const response = await kioskAPI.punchIn(kioskKey, { face_descriptor: Array.from(descriptor) });
+      setResult({ ok: true, text: response.data.message });
+    } catch (error) {
+      if (error.response?.status === 403) {
+        localStorage.removeItem(KIOSK_KEY_STORAGE);
+        setKioskKey('');
+        return;
+      }
+      setResult({ ok: false, text: error.response?.data?.error || 'Punch in failed. Please try again.' });
+    } finally {
+      setBusy(false);
+      setMessage('Look at the camera and tap Punch In');
+      setTimeout(() => setResult(null), RESULT_DISPLAY_MS);
+    }
+  }, [cameraReady, busy, kioskKey]);
+
+  const saveKey = (e) => {
+    e.preventDefault();
+    if (!keyInput.trim()) return;
+    localStorage.setItem(KIOSK_KEY_STORAGE, keyInput.trim());
+    setKioskKey(keyInput.trim());
+  };
+
+  if (!kioskKey) {
+    return (
+      <div className="min-h-screen flex items-center justify-center bg-gray-900 p-4">
+        <form onSubmit={saveKey} className="bg-white rounded-2xl p-6 w-full max-w-sm shadow-xl space-y-4">
+          <h1 className="text-lg font-semibold text-gray-800">Set up kiosk</h1>
+          <p className="text-sm text-gray-500">Enter the kiosk key provided by your administrator.</p>
+          <input
+            type="password"
+            value={keyInput}
+            onChange={(e) => setKeyInput(e.target.value)}
+            className="w-full border border-gray-300 rounded-lg px-3 py-2"
+            placeholder="Kiosk key"
+          />
+          <button type="submit" className="w-full bg-blue-600 hover:bg-blue-700 text-white rounded-lg py-2 font-medium">
+            Save
+          </button>
+        </form>
+      </div>
+    );
+  }
+
+  return (
+    <div className="min-h-screen flex flex-col items-center justify-center bg-gray-900 p-4 gap-6">
+      <div className="relative w-full max-w-md aspect-[4/3] rounded-2xl overflow-hidden bg-black">
+        <video ref={videoRef} className="w-full h-full object-cover scale-x-[-1]" muted playsInline />
+        <canvas ref={canvasRef} className="hidden" />
+      </div>
+
+      {result ? (
+        <p className={`text-xl font-semibold text-center ${result.ok ? 'text-green-400' : 'text-red-400'}`}>
+          {result.text}
+        </p>
+      ) : (
+        <p className="text-gray-300 text-center">{message}</p>
+      )}
+
+      <button
+        onClick={punchIn}
+        disabled={!cameraReady || busy}
+        className="px-10 py-4 rounded-2xl bg-green-500 hover:bg-green-600 disabled:opacity-50 text-white text-xl font-bold shadow-lg"
+      >
+        {busy ? 'Please wait...' : 'Punch In'}
+      </button>
+    </div>
+  );
+};
+
+export default Kiosk;
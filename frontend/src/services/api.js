@@ -2,6 +2,8 @@ import axios from 'axios';
 
 // Use environment variable for API URL, fallback to localhost for development
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000/api';
+// The live board stream is served by its own (ASGI) service
+const LIVE_URL = import.meta.env.VITE_LIVE_URL || API_URL;
 
 // Simple cache implementation
 const cache = new Map();
@@ -114,6 +116,7 @@ export const authAPI = {
   requestOTP: (data) => api.post('/auth/otp/request/', data),
   verifyOTP: (data) => api.post('/auth/otp/verify/', data),
   getProfile: () => api.get('/auth/profile/'),
+  getFaceDescriptor: () => api.get('/auth/profile/face-descriptor/'),
   updateProfile: (data) => {
     clearCache();
     return api.patch('/auth/profile/', data, {
@@ -121,7 +124,8 @@ export const authAPI = {
     });
   },
   changePassword: (data) => api.post('/auth/change-password/', data),
-  getEmployees: () => cachedGet('/auth/employees/', {}, 'employees'),
+  // List and board avatars are small; ?avatar= returns a pre-generated variant instead of the full photo
+  getEmployees: () => cachedGet('/auth/employees/', { avatar: 'md' }, 'employees'),
   createEmployee: (data) => {
     clearCache();
     return api.post('/auth/employees/', data);
@@ -136,9 +140,9 @@ export const authAPI = {
   },
   getEmployee: (id) => api.get(`/auth/employees/${id}/`),
   getDashboardStats: () => cachedGet('/auth/dashboard-stats/', {}, 'dashboard-stats'),
-  getTodayEmployeeStatus: () => api.get('/auth/today-employee-status/'),
+  getTodayEmployeeStatus: () => api.get('/auth/today-employee-status/', { params: { avatar: 'sm' } }),
   // Activity Log
-  getActivityLog: (params = {}) => api.get('/auth/activity-log/', { params }),
+  getActivityLog: (params = {}) => api.get('/auth/activity-log/', { params: { avatar: 'sm', ...params } }),
   // Notifications
   getNotifications: () => getArray('/auth/notifications/'),
   getUnreadCount: () => api.get('/auth/notifications/unread-count/'),
@@ -154,19 +158,46 @@ export const authAPI = {
   // Admin - Profile Update Requests
   getAllProfileRequests: (params) => getArray('/auth/profile/all-requests/', params),
   reviewProfileRequest: (id, data) => api.post(`/auth/profile/review/${id}/`, data),
+  // Duplicate faces (admin)
+  getFaceDuplicates: (params) => api.get('/auth/face-duplicates/', { params }),
+  reviewFaceDuplicate: (id, data) => api.post(`/auth/face-duplicates/${id}/review/`, data),
+};
+
+// One key per punch tap; retries of the same request (e.g. after a token
+// refresh) reuse it so the server replays the first response
+const newIdempotencyKey = () =>
+  (window.crypto?.randomUUID?.() || `${Date.now()}-${Math.random().toString(36).slice(2)}`);
+
+// Shared office kiosk (device key instead of a login)
+export const kioskAPI = {
+  punchIn: (kioskKey, data) => api.post('/attendance/kiosk/punch-in/', data, {
+    headers: { 'X-Kiosk-Key': kioskKey },
+  }),
 };
 
 // Attendance APIs
 export const attendanceAPI = {
   punchIn: (data) => {
     clearCache();
-    return api.post('/attendance/punch-in/', data);
+    return api.post('/attendance/punch-in/', data, {
+      headers: { 'Idempotency-Key': newIdempotencyKey() },
+    });
   },
   punchOut: (data) => {
     clearCache();
-    return api.post('/attendance/punch-out/', data);
+    return api.post('/attendance/punch-out/', data, {
+      headers: { 'Idempotency-Key': newIdempotencyKey() },
+    });
   },
   getToday: () => api.get('/attendance/today/'),
+  // Server-Sent Events stream of punch deltas for the admin live board,
+  // opened with a single-use ticket (EventSource can't send headers)
+  getLiveBoardTicket: () => api.post('/attendance/live-board/ticket/'),
+  liveBoardUrl: (ticket, lastEventId) => {
+    const params = new URLSearchParams({ ticket });
+    if (lastEventId) params.set('last_event_id', lastEventId);
+    return `${LIVE_URL}/attendance/live-board/?${params}`;
+  },
   getMyAttendance: (params) => cachedGet('/attendance/my-attendance/', params),
   getAllAttendance: (params) => getArray('/attendance/all/', params),
   getReport: (params) => api.get('/attendance/report/', { params }),
@@ -192,6 +223,7 @@ export const attendanceAPI = {
   getMyRegularizations: () => getArray('/attendance/regularization/my-requests/'),
   getAllRegularizations: (params) => getArray('/attendance/regularization/all/', params),
   reviewRegularization: (id, data) => api.post(`/attendance/regularization/review/${id}/`, data),
+  bulkReviewRegularizations: (data) => api.post('/attendance/regularization/bulk-review/', data),
   cancelRegularization: (id) => api.post(`/attendance/regularization/cancel/${id}/`),
   // WFH (Work From Home)
   applyWFH: (data) => api.post('/attendance/wfh/apply/', data),
@@ -292,6 +324,10 @@ export const leaveAPI = {
     clearCache();
     return api.post(`/leaves/review/${id}/`, data);
   },
+  bulkReviewRequests: (data) => {
+    clearCache();
+    return api.post('/leaves/bulk-review/', data);
+  },
   updateRequest: (id, data) => api.patch(`/leaves/update-request/${id}/`, data),
   getAllBalances: (params) => getArray('/leaves/all-balances/', params),
   updateBalance: (id, data) => api.patch(`/leaves/update-balance/${id}/`, data),